@@ -1,26 +1,37 @@
 from flask import Flask, jsonify, send_file, request
 
+from api.config.aws_config import AWSConfig
 from api.utils import ses_utils
 from services.anomaly_detector import generate_and_process_data
-from config.constatns import S3_BUCKET_NAME, PROCESSED_DATA_DIR, TABLE_ANOMALY_METRICS, INPUT_DATA_DIR
+from config.constatns import (S3_BUCKET_NAME, PROCESSED_DATA_DIR, TABLE_ANOMALY_METRICS, INPUT_DATA_DIR,
+                              BATCH_CONCURRENCY, QUARANTINE_DATA_DIR)
 from dynamodb.metric_data import MetricDataRepo
 from models.metric import Metric
 from utils.s3_utils import S3Utils
 from services.csv_generation import save_transactions_to_csv
 from services.anomaly_detector_read_s3 import process_csv_from_s3  # <-- adjust if needed
+from services.batch_processing import resolve_manifest, process_batch_from_s3
+from services.partitions import csv_rows, list_partitions
+from services.results_store import parse_query, query_results
+from services.drift_monitor import latest_drift
+from services.realtime_scoring import score_transactions, request_advisory, get_advisory, RESPONSE_COLUMNS
 from threading import Thread
+from werkzeug.exceptions import BadRequest
 
 
 app = Flask(__name__)
 
 OUTPUT_FOLDER = "output"
 OUTPUT_FILENAME = "transactions_with_anomalies.csv"
+# Prefixes written in date/hour partitions, listable through /partitions
+PARTITIONED_PREFIXES = (INPUT_DATA_DIR, PROCESSED_DATA_DIR, QUARANTINE_DATA_DIR)
 
 @app.route('/run-anomaly-detection', methods=['GET'])
 def run_detection():
     output_path = generate_and_process_data()
     s3_utils = S3Utils(bucket_name=S3_BUCKET_NAME)
-    filename = s3_utils.send_file_to_s3(output_path, PROCESSED_DATA_DIR)
+    filename = s3_utils.send_file_to_partition(output_path, PROCESSED_DATA_DIR, "advisory",
+                                               rows=csv_rows(output_path))
     ses_utils.process_and_send_file(output_path)
     return jsonify({
         "file_name": filename,
@@ -30,7 +41,7 @@ def run_detection():
 def uploadFile():
     output_path = save_transactions_to_csv()
     s3_utils = S3Utils(bucket_name=S3_BUCKET_NAME)
-    filename = s3_utils.send_file_to_s3(output_path, INPUT_DATA_DIR)
+    filename = s3_utils.send_file_to_partition(output_path, INPUT_DATA_DIR, "input", rows=csv_rows(output_path))
     return jsonify({
         "file_name": filename,
         "message": "Input file uploaded successfully."
@@ -39,8 +50,7 @@ def uploadFile():
 @app.route('/download/<file_name>', methods=['GET'])
 def download_file(file_name):
     s3_utils = S3Utils(bucket_name=S3_BUCKET_NAME)
-    s3_path = f"{PROCESSED_DATA_DIR}/{file_name}"
-    file_stream = s3_utils.download_file_data(s3_path)
+    file_stream = s3_utils.download_partitioned(PROCESSED_DATA_DIR, file_name)
     return send_file(
         file_stream,
         mimetype='application/octet-stream',
@@ -48,6 +58,46 @@ def download_file(file_name):
         download_name=file_name
     )
 
+@app.route('/results/<file_name>/query', methods=['GET'])
+def query_file_results(file_name):
+    """
+    Filtered, projected, sorted slice of a scored report, e.g.
+    /results/transactions_with_anomalies_<ts>.csv/query?rule=HIGH_AMOUNT&iso_score_gt=80&sort=-amount&limit=50
+    See results_store.parse_query for every parameter.
+    """
+    try:
+        return jsonify(query_results(file_name, parse_query(request.args))), 200
+    except FileNotFoundError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+@app.route('/partitions', methods=['GET'])
+def get_partitions():
+    """
+    Manifests (objects, row/anomaly counts, sizes, schema versions) of a day's partitions, one GET each, e.g.
+    /partitions?date=2025-06-01&hour=13&prefix=output. prefix defaults to output; hour to the whole day.
+    """
+    prefix = request.args.get('prefix', PROCESSED_DATA_DIR)
+    if prefix not in PARTITIONED_PREFIXES:
+        return jsonify({"status": "error", "message": f"prefix must be one of {', '.join(PARTITIONED_PREFIXES)}"}), 400
+    if 'date' not in request.args:
+        return jsonify({"status": "error", "message": "date (YYYY-MM-DD) is required"}), 400
+    try:
+        manifests = list_partitions(AWSConfig.get_s3_client(), S3_BUCKET_NAME, prefix, request.args['date'],
+                                    request.args.get('hour'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"prefix": prefix, "date": request.args['date'], "partitions": manifests}), 200
+
+@app.route('/drift', methods=['GET'])
+def get_drift():
+    """ Drift report of the last scored file or batch: per-feature PSI, drift_score, drifted, retrained and why """
+    drift = latest_drift()
+    if drift is None:
+        return jsonify({"status": "error", "message": "No file has been scored yet"}), 404
+    return jsonify(drift), 200
+
 @app.route('/metrics', methods=['GET'])
 def get_all_metrics():
     db_utils = MetricDataRepo(TABLE_ANOMALY_METRICS)
@@ -99,8 +149,60 @@ def process_anomaly_bg():
         print("Error:", str(e))
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route("/files/processAnomaly/batch", methods=["POST"])
+def process_anomaly_batch():
+    """
+    Score many S3 objects with one model fit: {"objects": [{"bucket": ..., "key": ...}, ...]} and/or
+    {"bucket": ..., "prefix": ...}. Optional "concurrency" overrides BATCH_CONCURRENCY for downloads/uploads.
+    Each file reports its own status; the response is the combined batch summary.
+    A malformed request or manifest is a 400; any failure while processing is a 500.
+    """
+    try:
+        data = request.get_json(force=True)
+        concurrency = int(data.get("concurrency", BATCH_CONCURRENCY))
+        objects = resolve_manifest(data, AWSConfig.get_s3_client())
+    except (BadRequest, ValueError, KeyError, TypeError, AttributeError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    try:
+        summary = process_batch_from_s3(objects, concurrency=concurrency)
+        return jsonify(summary), 500 if summary["status"] == "error" else 200
+    except Exception as e:
+        print("Error:", str(e))
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route("/score", methods=["POST"])
+def score():
+    """
+    Real-time verdicts for one transaction (JSON object) or many (JSON list, or {"transactions": [...]}).
+    Pass ?advise=true to queue the LLM advisory; poll /score/advisory/<advisory_id> for it.
+    """
+    try:
+        data = request.get_json(force=True)
+        records = data.get("transactions", data) if isinstance(data, dict) else data
+        if isinstance(records, dict):
+            records = [records]
+        scored = score_transactions(records)
+        response = {"results": scored[RESPONSE_COLUMNS].to_dict(orient="records")}
+        if request.args.get("advise", "false").lower() == "true":
+            response["advisory_id"] = request_advisory(scored)
+        return jsonify(response), 200
+    except FileNotFoundError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except (ValueError, KeyError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        print("Error:", str(e))
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route("/score/advisory/<advisory_id>", methods=["GET"])
+def score_advisory(advisory_id):
+    advisory = get_advisory(advisory_id)
+    if advisory is None:
+        return jsonify({"status": "error", "message": "Unknown advisory id"}), 404
+    return jsonify(advisory), 200
+
 if __name__ == '__main__':
     '''
     app.run(debug=True)
     '''
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=5000, debug=True, threaded=True)
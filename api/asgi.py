@@ -0,0 +1,251 @@
+"""
+Async serving mode: the routes of app.py on FastAPI, for uvicorn.
+
+    uvicorn api.asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+The event loop never blocks on I/O or CPU work:
+- LLM calls use the async OpenAI client.
+- Real-time scoring awaits the micro-batcher's Future.
+- The AWS SDK has no async client in our dependencies, so S3/DynamoDB/SES calls run on a dedicated thread
+  pool (ASGI_IO_THREADS). A slow call holds one cheap thread, not a request worker.
+- File scoring and training run in a process pool (ASGI_CPU_WORKERS).
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from botocore.exceptions import ClientError
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from api.config.aws_config import AWSConfig
+from api.utils import ses_utils
+from services.anomaly_detector import generate_and_process_data
+from config.constatns import (S3_BUCKET_NAME, PROCESSED_DATA_DIR, TABLE_ANOMALY_METRICS, INPUT_DATA_DIR,
+                              BATCH_CONCURRENCY, ASGI_IO_THREADS, ASGI_CPU_WORKERS, QUARANTINE_DATA_DIR)
+from dynamodb.metric_data import MetricDataRepo
+from models.metric import Metric
+from utils.s3_utils import S3Utils
+from services.csv_generation import save_transactions_to_csv
+from services.anomaly_detector_read_s3 import process_csv_from_s3
+from services.batch_processing import resolve_manifest, process_batch_from_s3
+from services.partitions import csv_rows, get_object, list_partitions
+from services.results_store import parse_query, query_results
+from services.drift_monitor import latest_drift
+from services.realtime_scoring import (score_transactions_async, request_advisory_async, get_advisory,
+                                       RESPONSE_COLUMNS)
+
+# Streamed /download responses are read from S3 in chunks of this size
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+# Prefixes written in date/hour partitions, listable through /partitions
+PARTITIONED_PREFIXES = (INPUT_DATA_DIR, PROCESSED_DATA_DIR, QUARANTINE_DATA_DIR)
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    """ Nothing to start; the executors are shut down when the server stops """
+    yield
+    _io_pool.shutdown(wait=False)
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(lifespan=_lifespan)
+
+_io_pool = ThreadPoolExecutor(max_workers=ASGI_IO_THREADS, thread_name_prefix="aws-io")
+_cpu_pool = None
+# Clients are created once per process; boto3 clients are thread-safe
+_s3 = AWSConfig.get_s3_client()
+_s3_utils = S3Utils(bucket_name=S3_BUCKET_NAME)
+_metrics_repo = MetricDataRepo(TABLE_ANOMALY_METRICS)
+# Fire-and-forget jobs from /files/processAnomaly/bg, kept referenced until done
+_background_jobs = set()
+
+
+def _get_cpu_pool():
+    """ Spawned (not forked) workers: the serving process already runs threads and an event loop """
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = ProcessPoolExecutor(max_workers=ASGI_CPU_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _cpu_pool
+
+
+async def _io(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(_io_pool, partial(fn, *args, **kwargs))
+
+
+async def _cpu(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(_get_cpu_pool(), partial(fn, *args, **kwargs))
+
+
+def _error(message, status_code):
+    return JSONResponse({"status": "error", "message": message}, status_code=status_code)
+
+
+@app.get("/run-anomaly-detection")
+async def run_detection():
+    output_path = await _cpu(generate_and_process_data)
+    filename = await _io(_s3_utils.send_file_to_partition, output_path, PROCESSED_DATA_DIR, "advisory",
+                         rows=csv_rows(output_path))
+    await _io(ses_utils.process_and_send_file, output_path)
+    return {
+        "file_name": filename,
+        "message": "Anomaly report generated successfully."
+    }
+
+
+@app.get("/files/upload")
+async def upload_file():
+    output_path = await _cpu(save_transactions_to_csv)
+    filename = await _io(_s3_utils.send_file_to_partition, output_path, INPUT_DATA_DIR, "input",
+                         rows=csv_rows(output_path))
+    return {
+        "file_name": filename,
+        "message": "Input file uploaded successfully."
+    }
+
+
+@app.get("/download/{file_name}")
+async def download_file(file_name: str):
+    try:
+        obj = await _io(get_object, _s3, S3_BUCKET_NAME, PROCESSED_DATA_DIR, file_name)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return _error(f"{file_name} not found", 404)
+        return _error(f"Failed to download {file_name} from S3: {e}", 500)
+    # Streamed chunk by chunk (Starlette iterates sync bodies in its thread pool) rather than buffered whole
+    return StreamingResponse(
+        obj["Body"].iter_chunks(DOWNLOAD_CHUNK_BYTES),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
+
+
+@app.get("/results/{file_name}/query")
+async def query_file_results(file_name: str, request: Request):
+    """ See app.query_file_results """
+    try:
+        return await _io(query_results, file_name, parse_query(dict(request.query_params)))
+    except FileNotFoundError as e:
+        return _error(str(e), 404)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+
+@app.get("/partitions")
+async def get_partitions(date: str = None, hour: str = None, prefix: str = PROCESSED_DATA_DIR):
+    """ See app.get_partitions """
+    if prefix not in PARTITIONED_PREFIXES:
+        return _error(f"prefix must be one of {', '.join(PARTITIONED_PREFIXES)}", 400)
+    if date is None:
+        return _error("date (YYYY-MM-DD) is required", 400)
+    try:
+        manifests = await _io(list_partitions, _s3, S3_BUCKET_NAME, prefix, date, hour)
+    except ValueError as e:
+        return _error(str(e), 400)
+    return {"prefix": prefix, "date": date, "partitions": manifests}
+
+
+@app.get("/drift")
+async def get_drift():
+    drift = await _io(latest_drift)
+    if drift is None:
+        return _error("No file has been scored yet", 404)
+    return drift
+
+
+@app.get("/metrics")
+async def get_all_metrics():
+    return jsonable_encoder(await _io(_metrics_repo.get_all_items))
+
+
+@app.get("/metrics/{metric_id}")
+async def get_metric_by_id(metric_id: str):
+    item = await _io(_metrics_repo.get_item, {"metric_id": metric_id})
+    if item is None:
+        return _error("Metric not found", 404)
+    return jsonable_encoder(item)
+
+
+@app.post("/metrics")
+async def create_metric(request: Request):
+    try:
+        metric = Metric.to_metric(await request.json())
+        await _io(_metrics_repo.insert_item, metric)
+        return JSONResponse(jsonable_encoder(metric), status_code=201)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+
+@app.post("/files/processAnomaly")
+async def process_anomaly(request: Request):
+    try:
+        data = await request.json()
+        result_key = await _cpu(process_csv_from_s3, data["bucket"], data["key"])
+        return {"status": "success", "processed_key": result_key}
+    except Exception as e:
+        print("Error:", str(e))
+        return _error(str(e), 500)
+
+
+@app.post("/files/processAnomaly/bg")
+async def process_anomaly_bg(request: Request):
+    try:
+        data = await request.json()
+        job = asyncio.ensure_future(_cpu(process_csv_from_s3, data["bucket"], data["key"]))
+        _background_jobs.add(job)
+        job.add_done_callback(_background_jobs.discard)
+        return PlainTextResponse("Task started", status_code=202)
+    except Exception as e:
+        print("Error:", str(e))
+        return _error(str(e), 500)
+
+
+@app.post("/files/processAnomaly/batch")
+async def process_anomaly_batch(request: Request):
+    """ See app.process_anomaly_batch """
+    try:
+        data = await request.json()
+        concurrency = int(data.get("concurrency", BATCH_CONCURRENCY))
+        objects = await _io(resolve_manifest, data, _s3)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return _error(str(e), 400)
+    try:
+        summary = await _cpu(process_batch_from_s3, objects, concurrency=concurrency)
+        return JSONResponse(summary, status_code=500 if summary["status"] == "error" else 200)
+    except Exception as e:
+        print("Error:", str(e))
+        return _error(str(e), 500)
+
+
+@app.post("/score")
+async def score(request: Request, advise: str = "false"):
+    """ See app.score """
+    try:
+        data = await request.json()
+        records = data.get("transactions", data) if isinstance(data, dict) else data
+        if isinstance(records, dict):
+            records = [records]
+        scored = await score_transactions_async(records)
+        response = {"results": jsonable_encoder(scored[RESPONSE_COLUMNS].to_dict(orient="records"))}
+        if advise.lower() == "true":
+            response["advisory_id"] = request_advisory_async(scored)
+        return response
+    except FileNotFoundError as e:
+        return _error(str(e), 503)
+    except (ValueError, KeyError) as e:
+        return _error(str(e), 400)
+    except Exception as e:
+        print("Error:", str(e))
+        return _error(str(e), 500)
+
+
+@app.get("/score/advisory/{advisory_id}")
+async def score_advisory(advisory_id: str):
+    advisory = get_advisory(advisory_id)
+    if advisory is None:
+        return _error("Unknown advisory id", 404)
+    return jsonable_encoder(advisory)
@@ -0,0 +1,104 @@
+"""
+Deterministic stand-in for the OpenAI chat completions parse() call used by the advisor.
+
+The verdict is derived from the encoded transaction itself (rules fired and model verdicts), so the same
+transaction always gets the same answer. LLM_STUB_LATENCY_MS adds a fixed delay per call and
+LLM_STUB_ERROR_RATE makes that fraction of calls fail, chosen by a seeded generator so runs are repeatable.
+Token counts are estimated at 4 characters per token; the system prompt counts as cached after the first call.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+# Rule name -> the catalog anomaly type the stub reports for it, in priority order
+RULE_TYPES = {
+    "DUPLICATE_TRANSACTION": "Duplicate Transactions",
+    "CARD_EXPIRY_SOON": "Card Type/Issuer Anomalies",
+    "GEO_TOO_FAR": "Terminal Location Inconsistency",
+    "DATACENTER_IP": "Terminal Location Inconsistency",
+    "STATUS_NOT_SUCCESS": "Decline Code Pattern Analysis",
+    "HIGH_AMOUNT": "Mismatch in Captured vs. Settled Amount",
+    "ODD_HOUR": "Operator-Level Fraud or Errors",
+}
+
+
+class InjectedLLMError(RuntimeError):
+    pass
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+class _Completions:
+    def __init__(self, stub):
+        self.stub = stub
+
+    def parse(self, model, messages, response_format, **kwargs):
+        self.stub.before_call()
+        time.sleep(self.stub.latency_ms / 1000)
+        return self.stub.respond(model, messages, response_format)
+
+
+class _AsyncCompletions(_Completions):
+    async def parse(self, model, messages, response_format, **kwargs):
+        self.stub.before_call()
+        await asyncio.sleep(self.stub.latency_ms / 1000)
+        return self.stub.respond(model, messages, response_format)
+
+
+class LLMStub:
+    def __init__(self, latency_ms=0.0, error_rate=0.0, seed=42, asynchronous=False):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._cached_prefixes = set()
+        completions = _AsyncCompletions(self) if asynchronous else _Completions(self)
+        self.chat = SimpleNamespace(completions=completions)
+
+    def before_call(self):
+        with self._lock:
+            fail = self._random.random() < self.error_rate
+        if fail:
+            raise InjectedLLMError("Injected LLM error (LLM_STUB_ERROR_RATE)")
+
+    def respond(self, model, messages, response_format):
+        system = "".join(m["content"] for m in messages if m["role"] == "system")
+        user = "".join(m["content"] for m in messages if m["role"] != "system")
+        verdict = response_format(**self.verdict(user))
+        content = verdict.model_dump_json()
+
+        with self._lock:
+            cached = _tokens(system) if system in self._cached_prefixes else 0
+            self._cached_prefixes.add(system)
+        usage = SimpleNamespace(prompt_tokens=_tokens(system) + _tokens(user), completion_tokens=_tokens(content),
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=cached))
+        message = SimpleNamespace(role="assistant", content=content, parsed=verdict, refusal=None)
+        return SimpleNamespace(model=f"{model}-stub", usage=usage,
+                               choices=[SimpleNamespace(index=0, finish_reason="stop", message=message)])
+
+    @staticmethod
+    def verdict(encoded):
+        try:
+            tx = json.loads(encoded)
+        except ValueError:
+            tx = {}
+        rules = [r for r in str(tx.get("rules", "")).split(",") if r]
+        models = [k for k in ("rules_flag", "rf_model") if tx.get(k) is True]
+        if tx.get("iso_flag") == -1:
+            models.append("iso_flag")
+        anomaly = bool(rules or models)
+        anomaly_type = next((RULE_TYPES[r] for r in RULE_TYPES if r in rules), "Other") if anomaly else "None"
+        return {
+            "anomaly": anomaly,
+            "anomaly_type": anomaly_type,
+            "classification": ", ".join(r.lower().replace("_", " ") for r in rules) or
+                              ("model flag" if anomaly else "normal"),
+            "explanation": f"Rules fired: {', '.join(rules) or 'none'}; model flags: {', '.join(models) or 'none'}.",
+            "suggested_action": "Review the transaction" if anomaly else "No action needed",
+            "anomaly_score": float(min(100, 20 * len(rules) + 20 * len(models))),
+        }
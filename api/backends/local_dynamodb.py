@@ -0,0 +1,82 @@
+"""
+Embedded key-value table with the subset of the boto3 DynamoDB resource/Table API this service calls.
+
+Every table is one SQLite table of (key, item JSON) in a single database file. SQLite runs in WAL mode with one
+connection per thread, so gunicorn workers and their threads can read and write concurrently.
+"""
+import json
+import os
+import sqlite3
+import threading
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+# Partition key attributes per table; tables not listed are keyed by "id"
+KEY_SCHEMA = {"anomaly_metrics": ["metric_id"]}
+SCAN_PAGE_SIZE = 1000
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class LocalDynamoDB:
+    def __init__(self, path, key_schema=None):
+        self.path = path
+        self.key_schema = {**KEY_SCHEMA, **(key_schema or {})}
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def Table(self, name):
+        return LocalTable(self, name, self.key_schema.get(name, ["id"]))
+
+
+class LocalTable:
+    def __init__(self, db, name, key_attributes):
+        self.db = db
+        self.name = name
+        self.key_attributes = key_attributes
+        self.db.connection().execute(f'CREATE TABLE IF NOT EXISTS "{name}" (key TEXT PRIMARY KEY, item TEXT NOT NULL)')
+
+    def _key(self, item, operation):
+        missing = [a for a in self.key_attributes if a not in item]
+        if missing:
+            raise ClientError({"Error": {"Code": "ValidationException",
+                                         "Message": f"Missing key attributes: {', '.join(missing)}"}}, operation)
+        return json.dumps([item[a] for a in self.key_attributes], default=_json_default)
+
+    def put_item(self, Item, **kwargs):
+        self.db.connection().execute(f'INSERT OR REPLACE INTO "{self.name}" (key, item) VALUES (?, ?)',
+                                     (self._key(Item, "PutItem"), json.dumps(Item, default=_json_default)))
+        return {}
+
+    def get_item(self, Key, **kwargs):
+        row = self.db.connection().execute(f'SELECT item FROM "{self.name}" WHERE key = ?',
+                                           (self._key(Key, "GetItem"),)).fetchone()
+        return {"Item": json.loads(row[0])} if row else {}
+
+    def delete_item(self, Key, **kwargs):
+        self.db.connection().execute(f'DELETE FROM "{self.name}" WHERE key = ?', (self._key(Key, "DeleteItem"),))
+        return {}
+
+    def scan(self, ExclusiveStartKey=None, Limit=SCAN_PAGE_SIZE, **kwargs):
+        start = self._key(ExclusiveStartKey, "Scan") if ExclusiveStartKey else ""
+        rows = self.db.connection().execute(f'SELECT key, item FROM "{self.name}" WHERE key > ? ORDER BY key LIMIT ?',
+                                            (start, Limit + 1)).fetchall()
+        items = [json.loads(item) for _, item in rows[:Limit]]
+        response = {"Items": items, "Count": len(items), "ScannedCount": len(items)}
+        if len(rows) > Limit:
+            response["LastEvaluatedKey"] = {a: items[-1][a] for a in self.key_attributes}
+        return response
@@ -0,0 +1,186 @@
+"""
+Filesystem object store with the subset of the boto3 S3 client API this service calls.
+
+Objects live at <root>/<bucket>/<key>. Writes go to a temp file and are renamed into place, so readers never
+see a partial object. Missing objects raise the same botocore ClientError codes as S3 (NoSuchKey, 404), and
+put_object honours IfMatch / IfNoneMatch="*" (PreconditionFailed, 412) as S3 conditional writes do.
+"""
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+LIST_PAGE_SIZE = 1000
+ETAG_CONTENT_MAX_BYTES = 1024 * 1024
+
+
+class LocalBody:
+    """ The parts of botocore's StreamingBody we use """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+
+    def read(self, amt=None):
+        return self._file.read() if amt is None else self._file.read(amt)
+
+    def iter_chunks(self, chunk_size=1024):
+        try:
+            while chunk := self._file.read(chunk_size):
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        self._file.close()
+
+
+class LocalObjectStore:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, bucket, key):
+        path = os.path.abspath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.join(self.root, bucket) + os.sep):
+            raise ClientError({"Error": {"Code": "InvalidObjectName", "Message": key}}, "PutObject")
+        return path
+
+    def _existing(self, bucket, key, operation):
+        path = self._path(bucket, key)
+        if not os.path.isfile(path):
+            code = "404" if operation == "HeadObject" else "NoSuchKey"
+            raise ClientError({"Error": {"Code": code, "Message": f"{bucket}/{key} not found"}}, operation)
+        return path
+
+    def _write(self, bucket, key, copy):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as sink:
+                copy(sink)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return {"ETag": f'"{_etag(path)}"'}
+
+    def _head(self, path):
+        stat = os.stat(path)
+        return {
+            "ContentLength": stat.st_size,
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            "ETag": f'"{_etag(path)}"',
+        }
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        with open(Filename, "rb") as source:
+            self._write(Bucket, Key, lambda sink: shutil.copyfileobj(source, sink, 1024 * 1024))
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        self._write(Bucket, Key, lambda sink: shutil.copyfileobj(Fileobj, sink, 1024 * 1024))
+
+    def put_object(self, Bucket, Key, Body=b"", IfMatch=None, IfNoneMatch=None, **kwargs):
+        if IfMatch is not None or IfNoneMatch is not None:
+            # Checked and written under one lock (across processes), so two conditional writes cannot both pass
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, ".conditional-writes.lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._check_precondition(Bucket, Key, IfMatch, IfNoneMatch)
+                return self.put_object(Bucket, Key, Body)
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        if isinstance(Body, (bytes, bytearray)):
+            return self._write(Bucket, Key, lambda sink: sink.write(Body))
+        return self._write(Bucket, Key, lambda sink: shutil.copyfileobj(Body, sink, 1024 * 1024))
+
+    def _check_precondition(self, bucket, key, if_match, if_none_match):
+        path = self._path(bucket, key)
+        exists = os.path.isfile(path)
+        if if_match is not None and not exists:
+            self._existing(bucket, key, "PutObject")
+        if (if_none_match == "*" and exists) or (if_match is not None and if_match.strip('"') != _etag(path)):
+            raise ClientError({"Error": {"Code": "PreconditionFailed",
+                                         "Message": "At least one of the pre-conditions you specified did not hold"},
+                               "ResponseMetadata": {"HTTPStatusCode": 412}}, "PutObject")
+
+    def download_file(self, Bucket, Key, Filename, ExtraArgs=None, Callback=None, Config=None):
+        # boto3 heads the object first, so a missing key surfaces as a 404 from HeadObject
+        shutil.copyfile(self._existing(Bucket, Key, "HeadObject"), Filename)
+
+    def download_fileobj(self, Bucket, Key, Fileobj, ExtraArgs=None, Callback=None, Config=None):
+        with open(self._existing(Bucket, Key, "HeadObject"), "rb") as source:
+            shutil.copyfileobj(source, Fileobj, 1024 * 1024)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        return self._head(self._existing(Bucket, Key, "HeadObject"))
+
+    def get_object(self, Bucket, Key, **kwargs):
+        path = self._existing(Bucket, Key, "GetObject")
+        return {**self._head(path), "Body": LocalBody(path)}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        path = self._path(Bucket, Key)
+        if os.path.isfile(path):
+            os.remove(path)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, StartAfter=None, MaxKeys=LIST_PAGE_SIZE,
+                        **kwargs):
+        bucket_root = os.path.join(self.root, Bucket)
+        keys = []
+        for directory, _, files in os.walk(bucket_root):
+            for name in files:
+                if not name.startswith(".upload-"):
+                    key = os.path.relpath(os.path.join(directory, name), bucket_root).replace(os.sep, "/")
+                    if key.startswith(Prefix):
+                        keys.append(key)
+        keys.sort()
+        after = ContinuationToken or StartAfter
+        if after:
+            keys = [k for k in keys if k > after]
+        page = keys[:MaxKeys]
+        response = {
+            "Name": Bucket,
+            "Prefix": Prefix,
+            "KeyCount": len(page),
+            "IsTruncated": len(keys) > MaxKeys,
+            "Contents": [{"Key": k, "Size": os.path.getsize(os.path.join(bucket_root, k))} for k in page],
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(f"No local paginator for {operation_name}")
+        return _ListPaginator(self)
+
+
+class _ListPaginator:
+    def __init__(self, store):
+        self.store = store
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            page = self.store.list_objects_v2(**kwargs, **({"ContinuationToken": token} if token else {}))
+            yield page
+            token = page.get("NextContinuationToken")
+            if not token:
+                return
+
+
+def _etag(path):
+    """
+    MD5 of the content, as S3 reports for single-part uploads, for objects up to ETAG_CONTENT_MAX_BYTES (manifests,
+    whose conditional writes must see every change); larger objects get a size/mtime digest instead of a full read
+    """
+    stat = os.stat(path)
+    if stat.st_size <= ETAG_CONTENT_MAX_BYTES:
+        with open(path, "rb") as source:
+            return hashlib.md5(source.read()).hexdigest()
+    return hashlib.md5(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
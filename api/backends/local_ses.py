@@ -0,0 +1,19 @@
+"""
+Mail sink with the send_raw_email call of the boto3 SES client: every message is written to
+<root>/<message id>.eml instead of being sent, so the report e-mail path runs offline and can be inspected.
+"""
+import os
+import uuid
+
+
+class LocalMailSink:
+    def __init__(self, root):
+        self.root = root
+
+    def send_raw_email(self, Source=None, Destinations=None, RawMessage=None, **kwargs):
+        message_id = f"local-{uuid.uuid4()}"
+        os.makedirs(self.root, exist_ok=True)
+        data = RawMessage["Data"]
+        with open(os.path.join(self.root, f"{message_id}.eml"), "wb") as sink:
+            sink.write(data.encode("utf-8") if isinstance(data, str) else data)
+        return {"MessageId": message_id}
@@ -0,0 +1,120 @@
+"""
+Compact forest artifacts (services.compact_forest) against the sklearn RandomForestClassifier they come from.
+
+Fits the supervised forest the way fit_models does (class weights, 200 trees, no time budget) on generated,
+featurized transactions. Then, for the sklearn object, for compact forests of the first --trees trees cut at
+each of --depths, and for the forest fit_models would pick (compact_within_tolerance with the configured
+depth and agreement), it reports: artifact size, load time (joblib.load; the compact tables memory-mapped),
+predictions/sec for each --batch-sizes (sklearn through forest_predict, the per-tree path the pipeline used),
+agreement with the sklearn predictions and accuracy against the rule label on the held-out split.
+
+Run from the api/ folder:
+    python -m benchmarks.forest_bench --rows 100000 --depths 0 12 --trees 0 25 --batch-sizes 1 64 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from benchmarks.parallel_scoring_bench import make_frame
+from config.constatns import RF_COMPACT_MAX_DEPTH, RF_COMPACT_MIN_AGREEMENT
+from services.anomaly_models import forest_predict
+from services.compact_forest import (CompactForest, agreement, compact_within_tolerance, load_compact,
+                                     save_compact)
+from services.feature_store import FeatureStore, join_behavior
+from services.features import FEATURES_SUP, build_features, add_supervised_label
+from services.fingerprint_index import apply_fingerprint_index
+from services.training import fit_forest_within_budget
+
+
+def featurized(rows, index_dir):
+    df = build_features(make_frame(rows))
+    df = join_behavior(df, FeatureStore().update_and_join(df))
+    df = apply_fingerprint_index(df, index_dir=index_dir)
+    return add_supervised_label(df)
+
+
+def _rate(predict, X, batch_size, min_seconds=1.0):
+    """ Rows/sec of predict over X in batches of batch_size, repeated for at least min_seconds """
+    batches = [X[i:i + batch_size] for i in range(0, len(X), batch_size)][:max(1, 20000 // batch_size)]
+    n_rows, start = 0, time.perf_counter()
+    while True:
+        for batch in batches:
+            predict(batch)
+            n_rows += len(batch)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return n_rows / elapsed
+
+
+def _load_time(load, path, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rows, depths, tree_counts, batch_sizes, output_dir="output"):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        df = featurized(rows, os.path.join(tmp_dir, "fingerprints"))
+        X = df[FEATURES_SUP].astype(float)
+        y = df['is_anomaly_suspected_supervised'].to_numpy()
+        X_train, X_test, y_train, y_test = train_test_split(X, y, stratify=y, test_size=0.3, random_state=42)
+        scaler = StandardScaler().fit(X_train)
+        X_train, X_test = scaler.transform(X_train), scaler.transform(X_test).astype(np.float32)
+
+        start = time.perf_counter()
+        rf_model = fit_forest_within_budget(X_train, y_train, None, random_state=42)
+        print(f"Fitted {len(rf_model.estimators_)} trees on {len(X_train)} rows in {time.perf_counter() - start:.1f}s")
+
+        sklearn_path = os.path.join(tmp_dir, "rf_sklearn.joblib")
+        joblib.dump(rf_model, sklearn_path)
+        variants = [("sklearn", os.path.getsize(sklearn_path), _load_time(joblib.load, sklearn_path), rf_model,
+                     lambda batch: forest_predict(rf_model, batch))]
+        compacts = [(f"compact t={n_trees or 'all'} d={depth or 'full'}",
+                     CompactForest.from_sklearn(rf_model, max_depth=depth or None, n_trees=n_trees or None))
+                    for n_trees in tree_counts for depth in depths]
+        selected, _ = compact_within_tolerance(rf_model, X_test, RF_COMPACT_MAX_DEPTH, RF_COMPACT_MIN_AGREEMENT)
+        compacts.append((f"fit_models pick (t={selected.n_trees} d={selected.depth})", selected))
+        for i, (name, compact) in enumerate(compacts):
+            path = os.path.join(tmp_dir, f"rf_compact_{i}.joblib")
+            size = save_compact(compact, path)
+            mapped = load_compact(path)
+            variants.append((name, size, _load_time(load_compact, path), mapped, mapped.predict))
+
+        results = []
+        for name, size, load_sec, model, predict in variants:
+            result = {"model": name, "size_mb": round(size / 1e6, 2), "load_ms": round(load_sec * 1000, 1),
+                      "nodes": model.n_nodes if isinstance(model, CompactForest) else
+                      sum(e.tree_.node_count for e in model.estimators_),
+                      "agreement": round(agreement(rf_model, model, X_test) if model is not rf_model else 1.0, 5),
+                      "accuracy": round(float(np.mean(predict(X_test) == y_test)), 5)}
+            for batch_size in batch_sizes:
+                result[f"rows_per_sec@{batch_size}"] = round(_rate(predict, X_test, batch_size))
+            results.append(result)
+
+    table = pd.DataFrame(results)
+    print(table.to_string(index=False))
+    os.makedirs(output_dir, exist_ok=True)
+    out_path = os.path.join(output_dir, "forest_bench.csv")
+    table.to_csv(out_path, index=False)
+    print(f"✅ Results saved to: {out_path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 12], help="0 = full depth")
+    parser.add_argument("--trees", type=int, nargs="+", default=[0, 25], help="first n trees; 0 = all")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 20000])
+    args = parser.parse_args()
+    run(args.rows, args.depths, args.trees, args.batch_sizes)
@@ -0,0 +1,52 @@
+"""
+IP classification throughput: per-row ipaddress (what the rule engine used to do) against
+services.ip_ranges.classify_ips, for all-distinct addresses and for a realistic repeat rate.
+
+Run from the api/ folder:
+    python -m benchmarks.ip_ranges_bench --rows 1000000
+"""
+import argparse
+import ipaddress
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.ip_ranges import IpRanges, classify_ips
+
+
+def _per_row(ips):
+    flags = []
+    for ip in ips:
+        try:
+            flags.append(ipaddress.ip_address(ip).is_private)
+        except ValueError:
+            flags.append(False)
+    return flags
+
+
+def _measure(label, rows, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed:8.2f}s  {rows / elapsed / 1e6:6.2f}M rows/s")
+    return elapsed
+
+
+def run(rows, distinct):
+    rng = np.random.default_rng(42)
+    all_distinct = pd.Series([str(ipaddress.IPv4Address(int(a))) for a in rng.integers(0, 2 ** 32, rows)])
+    repeated = pd.Series(rng.choice(all_distinct.to_numpy()[:distinct], rows))
+    ranges = IpRanges()
+    for name, ips in [("distinct", all_distinct), (f"{distinct} distinct", repeated)]:
+        base = _measure(f"ipaddress per row ({name})", rows, lambda: _per_row(ips))
+        new = _measure(f"classify_ips ({name})", rows, lambda: classify_ips(ips, ranges))
+        print(f"✅ {base / new:.1f}x faster")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--distinct", type=int, default=50000)
+    args = parser.parse_args()
+    run(args.rows, args.distinct)
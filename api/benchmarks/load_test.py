@@ -0,0 +1,296 @@
+"""
+Load generator for the API running fully offline on the local backends (BACKEND=local, LLM_BACKEND=stub).
+
+Seeds a local object store and metrics table, starts the server (gunicorn + Flask as in the Dockerfile, or
+uvicorn + FastAPI with --server asgi), then runs each scenario and reports requests, throughput, p50/p95/p99
+latency, error rate, and the server's peak RSS and thread count (all processes, sampled from /proc). Failed
+requests are listed under each scenario, grouped by cause (HTTP status and the server's message, or the client
+error).
+
+Scenarios:
+    dashboard   dashboard refresh storm: closed-loop clients on GET /metrics and GET /metrics/<id>
+    lambda      Lambda burst: every request at once, mixing POST /files/processAnomaly and /files/processAnomaly/bg;
+                sampling continues for --settle seconds so background jobs show up in RSS and threads. Every
+                request gets its own input file (distinct transactions), so none is served from the feature
+                cache or as a replay of another
+    downloads   large downloads: closed-loop clients on GET /download/<file> of a --download-mb object
+
+Run from the api/ folder:
+    python -m benchmarks.load_test --scenarios dashboard lambda downloads
+    python -m benchmarks.load_test --scenarios lambda --burst 32 --server asgi
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.parallel_scoring_bench import ID_COLUMNS, make_frame
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUCKET = "ipl-anomaly-detector"
+
+
+def seed_backends(local_dir, input_rows, n_inputs, download_mb, n_metrics):
+    """ Input CSVs, one large output object and metric items, written straight into the local backends """
+    from backends.local_dynamodb import LocalDynamoDB
+    from models.metric import Metric
+
+    bucket_dir = os.path.join(local_dir, "s3", BUCKET)
+    os.makedirs(os.path.join(bucket_dir, "input"), exist_ok=True)
+    os.makedirs(os.path.join(bucket_dir, "output"), exist_ok=True)
+    frame = make_frame(input_rows)
+    input_keys = []
+    for i in range(n_inputs):
+        key = f"input/load_{i}.csv"
+        # Distinct ids per file, so every file has its own content hash and its rows are not duplicates
+        distinct = frame.assign(**{col: frame[col] + f"-load{i}" for col in ID_COLUMNS})
+        distinct.to_csv(os.path.join(bucket_dir, key), index=False)
+        input_keys.append(key)
+
+    line = b"x" * 1023 + b"\n"
+    with open(os.path.join(bucket_dir, "output", "large.csv"), "wb") as sink:
+        for _ in range(download_mb * 1024):
+            sink.write(line)
+
+    table = LocalDynamoDB(os.path.join(local_dir, "dynamodb.sqlite")).Table("anomaly_metrics")
+    metric_ids = []
+    for i in range(n_metrics):
+        metric = Metric.to_metric({"file_name": f"transactions_with_anomalies_{i}.csv",
+                                   "metric_data": [{"anomaly_type": "Duplicate Transactions", "count": i % 7},
+                                                   {"anomaly_type": "None", "count": 2}]})
+        table.put_item(Item=Metric.to_dynamodb_item(metric))
+        metric_ids.append(metric.metric_id)
+    return input_keys, metric_ids
+
+
+def start_server(mode, port, workers, threads, env):
+    if mode == "flask":
+        cmd = [sys.executable, "-m", "gunicorn", "api.app:app", "-b", f"127.0.0.1:{port}",
+               f"--workers={workers}", f"--threads={threads}", "--backlog=2048", "--timeout=300"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "api.asgi:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--backlog", "2048", "--no-access-log"]
+    process = subprocess.Popen(cmd, cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/score/advisory/ready", timeout=1)
+        except urllib.error.HTTPError:
+            return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+def _process_tree(pid):
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as children:
+                    stack.extend(int(child) for child in children.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _status_field(pid, field):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class ServerSampler:
+    """ Peak RSS (MB) and thread count summed over the server's process tree, sampled every interval """
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        pids = _process_tree(self.pid)
+        rss_mb = sum(_status_field(p, "VmRSS:") for p in pids) / 1024
+        threads = sum(_status_field(p, "Threads:") for p in pids)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        self.peak_threads = max(self.peak_threads, threads)
+        return rss_mb, threads
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _error_cause(error):
+    """ HTTP status plus the server's error message, or the client-side exception """
+    if isinstance(error, urllib.error.HTTPError):
+        try:
+            body = json.loads(error.read() or b"{}")
+            message = body.get("message") or body.get("error") or body.get("detail") or ""
+        except (ValueError, OSError, AttributeError):
+            message = ""
+        return f"HTTP {error.code}: {message}"[:200].rstrip(": ")
+    return f"{type(error).__name__}: {getattr(error, 'reason', error)}"[:200]
+
+
+def _call(base_url, method, path, body, timeout):
+    """ (latency in seconds, None or the cause of the failure) """
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data else {})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            while response.read(1024 * 1024):
+                pass
+        return time.perf_counter() - start, None
+    except (urllib.error.URLError, OSError) as e:
+        return time.perf_counter() - start, _error_cause(e)
+
+
+def closed_loop(base_url, next_request, clients, duration, timeout):
+    """ clients that each send the next request as soon as the previous one returns, for duration seconds """
+    stop = time.perf_counter() + duration
+    latencies, errors, lock = [], Counter(), threading.Lock()
+
+    def client(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < stop:
+            latency, error = _call(base_url, *next_request(rng), timeout)
+            with lock:
+                if error is None:
+                    latencies.append(latency)
+                else:
+                    errors[error] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    return np.array(latencies), errors, time.perf_counter() - start
+
+
+def burst(base_url, requests, timeout):
+    """ Every request released at the same moment, one thread each """
+    gate = threading.Barrier(len(requests))
+
+    def fire(request):
+        gate.wait()
+        return _call(base_url, *request, timeout)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        results = list(pool.map(fire, requests))
+    latencies = np.array([latency for latency, error in results if error is None])
+    return latencies, Counter(error for _, error in results if error is not None), time.perf_counter() - start
+
+
+def scenario_requests(args, input_keys, metric_ids):
+    def dashboard(rng):
+        if rng.random() < 0.5:
+            return "GET", "/metrics", None
+        return "GET", f"/metrics/{rng.choice(metric_ids)}", None
+
+    def downloads(rng):
+        return "GET", "/download/large.csv", None
+
+    lambda_burst = [("POST", "/files/processAnomaly/bg" if i % 2 else "/files/processAnomaly",
+                     {"bucket": BUCKET, "key": input_keys[i % len(input_keys)]}) for i in range(args.burst)]
+    return {
+        "dashboard": ("loop", dashboard, args.clients),
+        "lambda": ("burst", lambda_burst, args.burst),
+        "downloads": ("loop", downloads, args.download_clients),
+    }
+
+
+def run(args):
+    local_dir = tempfile.mkdtemp(prefix="load-test-")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(API_DIR), BACKEND="local", LLM_BACKEND="stub",
+               STATE_DIR=os.path.join(local_dir, "state"), LOCAL_BACKEND_DIR=local_dir,
+               LLM_STUB_LATENCY_MS=str(args.llm_latency_ms), LLM_STUB_ERROR_RATE=str(args.llm_error_rate))
+    print(f"Seeding local backends in {local_dir}")
+    input_keys, metric_ids = seed_backends(local_dir, args.input_rows, max(args.burst, 1), args.download_mb,
+                                           args.metrics)
+    scenarios = scenario_requests(args, input_keys, metric_ids)
+
+    server = start_server(args.server, args.port, args.workers, args.threads, env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"{args.server} server, {args.workers} workers" + (f" x {args.threads} threads" if args.server == "flask"
+                                                            else ""))
+    print(f"{'scenario':<10} {'clients':>7} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'peak RSS MB':>11} {'peak thr':>8}")
+    try:
+        for name in args.scenarios:
+            kind, requests, clients = scenarios[name]
+            with ServerSampler(server.pid) as sampler:
+                if kind == "loop":
+                    latencies, errors, elapsed = closed_loop(base_url, requests, clients, args.duration, args.timeout)
+                else:
+                    latencies, errors, elapsed = burst(base_url, requests, args.timeout)
+                    time.sleep(args.settle)
+            n_errors = sum(errors.values())
+            total = len(latencies) + n_errors
+            p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000) if len(latencies) else (0, 0, 0)
+            print(f"{name:<10} {clients:>7} {total:>8} {len(latencies) / elapsed:8.1f} {p50:8.0f} {p95:8.0f} "
+                  f"{p99:8.0f} {n_errors / max(total, 1):7.1%} {sampler.peak_rss_mb:11.0f} {sampler.peak_threads:8d}")
+            for cause, count in errors.most_common():
+                print(f"{'':<10} {count:>7} x {cause}")
+    finally:
+        server.terminate()
+        server.wait()
+        if not args.keep:
+            shutil.rmtree(local_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=["dashboard", "lambda", "downloads"],
+                        default=["dashboard", "lambda", "downloads"])
+    parser.add_argument("--server", choices=["flask", "asgi"], default="flask")
+    parser.add_argument("--workers", type=int, default=4, help="server worker processes (Dockerfile: 4)")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker (Dockerfile: 8)")
+    parser.add_argument("--port", type=int, default=5201)
+    parser.add_argument("--duration", type=float, default=15, help="seconds per closed-loop scenario")
+    parser.add_argument("--clients", type=int, default=100, help="dashboard clients")
+    parser.add_argument("--metrics", type=int, default=2000, help="metric items seeded in the table")
+    parser.add_argument("--burst", type=int, default=16, help="simultaneous Lambda-style processing requests")
+    parser.add_argument("--input-rows", type=int, default=2000, help="rows per seeded input file")
+    parser.add_argument("--settle", type=float, default=20, help="seconds sampled after a burst for /bg jobs")
+    parser.add_argument("--download-clients", type=int, default=16)
+    parser.add_argument("--download-mb", type=int, default=64)
+    parser.add_argument("--llm-latency-ms", type=float, default=500, help="stub advisory latency per call")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded backends and server state afterwards")
+    run(parser.parse_args())
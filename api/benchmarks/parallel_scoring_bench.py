@@ -0,0 +1,99 @@
+"""
+Speedup curve for sharded scoring (services.parallel_scoring.featurize_and_score).
+
+Run from the api/ folder:
+    python -m benchmarks.parallel_scoring_bench --rows 200000 --workers 1 2 4 8 16
+
+For every worker count it prints wall time, rows/sec and speedup against workers=1,
+and writes the curve to output/parallel_scoring_speedup.csv.
+Every worker count runs in its own process against a fresh, temporary STATE_DIR, so each run folds the same
+rows into empty state and fits the models once: the curve measures sharding, not the state left by earlier
+runs (and the real state is never touched).
+
+Only featurization and scoring are sharded; the stateful stages (feature store, duplicate index, online detector)
+and model fitting run in the parent, so the curve flattens towards their time. On 20000 rows with workers=1,
+featurization takes about 60% of the run, the stateful stages and the fit about 15% each. A speedup curve only
+means something on a multi-core host: with one CPU, workers > 1 just adds process start-up and pickling
+(measured on a 1-CPU host: workers=1 6.5 s, 2 7.8 s, 4 8.4 s). The CSV is a local result, not a checked-in file.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from services.csv_generation import generate_transaction
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Suffixed per tile, so tiled rows are distinct transactions of distinct accounts rather than duplicates
+ID_COLUMNS = ['transaction_id', 'account_id', 'customer_id', 'device_id']
+
+
+def make_frame(rows, distinct=2000):
+    # Faker is slow; build a pool of distinct rows and tile it up to the requested size
+    base = pd.DataFrame([generate_transaction(i) for i in range(min(rows, distinct))])
+    repeats = -(-rows // len(base))
+    tiles = [base]
+    for tile in range(1, repeats):
+        tiles.append(base.assign(**{col: base[col] + f"-{tile}" for col in ID_COLUMNS}))
+    return pd.concat(tiles, ignore_index=True).head(rows)
+
+
+def _timed_run(frame_path, workers):
+    """ One featurize_and_score run in this process; STATE_DIR is set by the parent before the import """
+    from services.parallel_scoring import featurize_and_score
+
+    df = pd.read_pickle(frame_path)
+    start = time.perf_counter()
+    featurize_and_score(df, workers=workers)
+    return time.perf_counter() - start
+
+
+def run(rows, worker_counts, output_dir="output"):
+    results = []
+    baseline = None
+    with tempfile.TemporaryDirectory(prefix="parallel-scoring-bench-") as tmp_dir:
+        frame_path = os.path.join(tmp_dir, "frame.pkl")
+        make_frame(rows).to_pickle(frame_path)
+        for workers in worker_counts:
+            state_dir = tempfile.mkdtemp(prefix=f"state-{workers}-", dir=tmp_dir)
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join([API_DIR, os.path.dirname(API_DIR)]),
+                       STATE_DIR=state_dir)
+            child = subprocess.run([sys.executable, "-m", "benchmarks.parallel_scoring_bench", "--time-run",
+                                    frame_path, "--workers", str(workers)],
+                                   cwd=API_DIR, env=env, capture_output=True, text=True, check=True)
+            elapsed = json.loads(child.stdout.strip().splitlines()[-1])["seconds"]
+            shutil.rmtree(state_dir)
+            baseline = baseline or elapsed
+            results.append({
+                "rows": rows,
+                "workers": workers,
+                "seconds": round(elapsed, 3),
+                "rows_per_sec": round(rows / elapsed),
+                "speedup": round(baseline / elapsed, 2),
+            })
+            print(f"workers={workers:>3}  {elapsed:8.2f}s  {rows / elapsed:>10.0f} rows/s  x{baseline / elapsed:.2f}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    out_path = os.path.join(output_dir, "parallel_scoring_speedup.csv")
+    pd.DataFrame(results).to_csv(out_path, index=False)
+    print(f"✅ Speedup curve saved to: {out_path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    # Internal: time one run of a pickled frame (the parent starts one such process per worker count)
+    parser.add_argument("--time-run", metavar="FRAME", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.time_run:
+        print(json.dumps({"seconds": _timed_run(args.time_run, args.workers[0])}))
+    else:
+        run(args.rows, args.workers)
@@ -0,0 +1,140 @@
+"""
+Concurrent request capacity of the two serving modes on an I/O-bound route: GET /download/<file>
+against a local S3-compatible endpoint that answers after a fixed latency.
+
+Starts gunicorn (Flask, api.app) and uvicorn (FastAPI, api.asgi) with the same number of worker processes,
+drives each with the same number of concurrent clients, and reports throughput, latency percentiles and errors.
+
+Run from the api/ folder:
+    python -m benchmarks.serving_bench --clients 200 --duration 15 --s3-latency-ms 200
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_fake_s3(port, latency_ms, payload_bytes):
+    """ Answers every GET with payload_bytes after latency_ms, like a slow object store """
+    payload = b"x" * payload_bytes
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _headers(self):
+            time.sleep(latency_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("ETag", '"bench"')
+            self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+            self.end_headers()
+
+        # Both routes read with get_object (partitions.get_object), one GET per request for bench.csv (a name
+        # without a timestamp is only looked up flat), so the modes differ only in how they wait on it. HEAD is
+        # answered for clients that send one (boto3's download_fileobj did)
+        def do_HEAD(self):
+            self._headers()
+
+        def do_GET(self):
+            self._headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_server(mode, port, workers, threads, s3_port):
+    env = dict(os.environ,
+               PYTHONPATH=os.path.dirname(API_DIR),
+               AWS_ENDPOINT_URL_S3=f"http://127.0.0.1:{s3_port}",
+               AWS_ACCESS_KEY_ID="bench", AWS_SECRET_ACCESS_KEY="bench", AWS_DEFAULT_REGION="us-east-1")
+    if mode == "flask":
+        cmd = [sys.executable, "-m", "gunicorn", "api.app:app", "-b", f"127.0.0.1:{port}",
+               f"--workers={workers}", f"--threads={threads}", "--backlog=2048"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "api.asgi:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--backlog", "2048", "--no-access-log"]
+    process = subprocess.Popen(cmd, cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/score/advisory/ready", timeout=1)
+        except urllib.error.HTTPError:
+            return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+def drive(url, clients, duration, timeout):
+    """ clients closed-loop clients for duration seconds; returns (latencies of successes, n_errors) """
+    stop = time.perf_counter() + duration
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def client():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    response.read()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except (urllib.error.URLError, OSError):
+                with lock:
+                    errors[0] += 1
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client)
+    return np.array(latencies), errors[0]
+
+
+def run(clients, duration, s3_latency_ms, payload_kb, workers, threads, timeout):
+    s3 = start_fake_s3(9911, s3_latency_ms, payload_kb * 1024)
+    print(f"{clients} clients, {duration}s each, S3 latency {s3_latency_ms} ms, {payload_kb} KB objects, "
+          f"{workers} worker processes")
+    print(f"{'mode':<28} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    try:
+        for mode, port, label in [("flask", 5101, f"gunicorn+flask ({threads} thr/w)"),
+                                  ("asgi", 5102, "uvicorn+fastapi")]:
+            server = start_server(mode, port, workers, threads, 9911)
+            try:
+                latencies, errors = drive(f"http://127.0.0.1:{port}/download/bench.csv", clients, duration, timeout)
+            finally:
+                server.terminate()
+                server.wait()
+            p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000) if len(latencies) else (0, 0, 0)
+            print(f"{label:<28} {len(latencies) / duration:8.1f} {p50:8.0f} {p95:8.0f} {p99:8.0f} {errors:7d}")
+    finally:
+        s3.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--s3-latency-ms", type=float, default=200)
+    parser.add_argument("--payload-kb", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker (Dockerfile: 8)")
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+    run(args.clients, args.duration, args.s3_latency_ms, args.payload_kb, args.workers, args.threads, args.timeout)
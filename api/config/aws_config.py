@@ -2,10 +2,14 @@ import os
 import boto3
 from dotenv import load_dotenv
 
+from api.config.constatns import BACKEND, LOCAL_BACKEND_DIR
+
 load_dotenv()
 
 class AWSConfig:
     _session = None
+    # BACKEND=local: one instance of each stand-in per process (backends/)
+    _local = {}
 
     @staticmethod
     def _get_session():
@@ -17,15 +21,31 @@ class AWSConfig:
             )
         return AWSConfig._session
 
+    @staticmethod
+    def _get_local(name, factory):
+        if name not in AWSConfig._local:
+            AWSConfig._local[name] = factory()
+        return AWSConfig._local[name]
+
     @staticmethod
     def get_s3_client():
+        if BACKEND == "local":
+            from api.backends.local_s3 import LocalObjectStore
+            return AWSConfig._get_local("s3", lambda: LocalObjectStore(os.path.join(LOCAL_BACKEND_DIR, "s3")))
         return AWSConfig._get_session().client('s3')
 
     @staticmethod
     def get_dynamodb_resource():
+        if BACKEND == "local":
+            from api.backends.local_dynamodb import LocalDynamoDB
+            return AWSConfig._get_local("dynamodb", lambda: LocalDynamoDB(
+                os.path.join(LOCAL_BACKEND_DIR, "dynamodb.sqlite")))
         return AWSConfig._get_session().resource('dynamodb')
 
     #Simple Email Service (AWS SES) Client
     @staticmethod
     def get_ses_client():
-        return AWSConfig._get_session().client('ses')
\ No newline at end of file
+        if BACKEND == "local":
+            from api.backends.local_ses import LocalMailSink
+            return AWSConfig._get_local("ses", lambda: LocalMailSink(os.path.join(LOCAL_BACKEND_DIR, "mail")))
+        return AWSConfig._get_session().client('ses')
@@ -1,3 +1,5 @@
+import os
+
 # AWS Settings
 AWS_REGION = "us-east-1"
 S3_BUCKET_NAME = "ipl-anomaly-detector"
@@ -5,4 +7,101 @@ TABLE_ANOMALY_METRICS = "anomaly_metrics"
 
 # Data Paths
 INPUT_DATA_DIR = "input"
-PROCESSED_DATA_DIR = "output"
\ No newline at end of file
+PROCESSED_DATA_DIR = "output"
+# Local state persisted between invocations (online model, feature stores, indexes)
+STATE_DIR = os.getenv("STATE_DIR", "state")
+
+# Backends: "aws" (S3, DynamoDB, SES) or "local" (filesystem object store, SQLite table, mail captured to disk,
+# see backends/), so the whole pipeline can run and be load-tested offline
+BACKEND = os.getenv("BACKEND", "aws")
+LOCAL_BACKEND_DIR = os.getenv("LOCAL_BACKEND_DIR", os.path.join(STATE_DIR, "local"))
+# "openai" or "stub" (deterministic verdicts, backends/llm_stub.py); follows BACKEND unless set
+LLM_BACKEND = os.getenv("LLM_BACKEND", "stub" if BACKEND == "local" else "openai")
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+
+# Inputs, scored outputs, advisories and quarantined rows are keyed <dir>/dt=YYYY-MM-DD/hour=HH/<file> with a
+# _manifest.json per partition (services/partitions.py). Manifest updates are conditional PUTs retried on conflict;
+# local locks here also serialize the updates of one host
+PARTITION_LOCK_DIR = os.getenv("PARTITION_LOCK_DIR", os.path.join(STATE_DIR, "partition_locks"))
+
+# Columnar copies of the scored reports, queried by /results/<file_name>/query (s3://bucket/prefix or a local dir)
+RESULTS_URI = os.getenv("RESULTS_URI", os.path.join(LOCAL_BACKEND_DIR, "s3", S3_BUCKET_NAME, PROCESSED_DATA_DIR)
+                        if BACKEND == "local" else f"s3://{S3_BUCKET_NAME}/{PROCESSED_DATA_DIR}?region={AWS_REGION}")
+RESULTS_ROW_GROUP_ROWS = int(os.getenv("RESULTS_ROW_GROUP_ROWS", "100000"))
+QUERY_DEFAULT_LIMIT = 100
+QUERY_MAX_LIMIT = int(os.getenv("QUERY_MAX_LIMIT", "10000"))
+
+# Ingest
+# Input columns never loaded from S3 files (comma-separated); free text nothing downstream uses
+INGEST_DROP_COLUMNS = [c for c in os.getenv("INGEST_DROP_COLUMNS", "failure_description").split(",") if c]
+# Rows failing validation are written here (same bucket) with reason codes instead of failing the file
+QUARANTINE_DATA_DIR = "quarantine"
+VALIDATION_MAX_AMOUNT = float(os.getenv("VALIDATION_MAX_AMOUNT", "1e9"))
+VALIDATION_MAX_RETRIES = int(os.getenv("VALIDATION_MAX_RETRIES", "1000"))
+
+# Featurized frames (features, rule masks) of every processed input, keyed by content hash and feature version,
+# so re-running a file only pays for the model stage; least recently used entries are evicted past the budget
+FEATURE_CACHE_DIR = os.getenv("FEATURE_CACHE_DIR", os.path.join(STATE_DIR, "feature_cache"))
+FEATURE_CACHE_MAX_BYTES = int(float(os.getenv("FEATURE_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+# Outputs of the stateful stages (behavioral aggregates, duplicate flags, online scores) of every applied input,
+# keyed by content hash: a replayed file reads them back instead of being folded into the state again.
+# An input evicted past the budget is applied again if it is replayed later
+APPLIED_INPUTS_DIR = os.getenv("APPLIED_INPUTS_DIR", os.path.join(STATE_DIR, "applied_inputs"))
+APPLIED_INPUTS_MAX_BYTES = int(float(os.getenv("APPLIED_INPUTS_MAX_MB", "1024")) * 1024 * 1024)
+
+# Scoring
+# Process-pool size for sharded feature/rule/scoring stages (1 = single-process)
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "1"))
+# Batch endpoint: concurrent S3 downloads/uploads, and the most objects one request may expand to
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+
+# Training
+# Models are fitted on a stratified sample of at most this many rows (0 = whole file)
+TRAIN_MAX_ROWS = int(os.getenv("TRAIN_MAX_ROWS", "50000")) or None
+# The forest stops adding trees once this many seconds are spent (0 = no limit)
+TRAIN_TIME_BUDGET_SEC = float(os.getenv("TRAIN_TIME_BUDGET_SEC", "60"))
+# The saved forest is flattened into array node tables (services/compact_forest.py) and cut at this depth
+# (0 = full depth), unless that changes more than 1 - RF_COMPACT_MIN_AGREEMENT of the held-out predictions
+RF_COMPACT_MAX_DEPTH = int(os.getenv("RF_COMPACT_MAX_DEPTH", "12"))
+RF_COMPACT_MIN_AGREEMENT = float(os.getenv("RF_COMPACT_MIN_AGREEMENT", "0.999"))
+
+# Streaming Half-Space-Trees state, updated with every processed file
+ONLINE_MODEL_PATH = os.getenv("ONLINE_MODEL_PATH", os.path.join(STATE_DIR, "online_hst.joblib"))
+
+# Keyed account/device/customer velocity aggregates, updated with every processed file (SQLite, one row per key)
+FEATURE_STORE_PATH = os.getenv("FEATURE_STORE_PATH", os.path.join(STATE_DIR, "feature_store.sqlite"))
+
+# Cross-file duplicate detection: sorted fingerprint segments plus an in-memory Bloom filter
+FINGERPRINT_INDEX_DIR = os.getenv("FINGERPRINT_INDEX_DIR", os.path.join(STATE_DIR, "fingerprints"))
+FINGERPRINT_BLOOM_CAPACITY = int(os.getenv("FINGERPRINT_BLOOM_CAPACITY", "5000000"))
+
+# Models fitted by the last processed file, preloaded by the real-time /score endpoint
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(STATE_DIR, "models", "latest.joblib"))
+# Feature drift against the sketches of the data the current models were fitted on
+DRIFT_DIR = os.getenv("DRIFT_DIR", os.path.join(STATE_DIR, "drift"))
+# Models are refitted when any feature's PSI reaches this ("always" refits every file, as before)
+DRIFT_PSI_THRESHOLD = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.25"))
+DRIFT_RETRAIN = os.getenv("DRIFT_RETRAIN", "on_drift")
+DRIFT_BINS = 10
+DRIFT_SKETCH_ACCURACY = 0.01
+# Scoring runs whose sketches and drift report are kept for /drift (the newest run is always kept)
+DRIFT_KEEP_SKETCHES = int(os.getenv("DRIFT_KEEP_SKETCHES", "500"))
+# Micro-batching for /score: concurrent requests are coalesced for at most this long
+SCORE_MAX_WAIT_MS = float(os.getenv("SCORE_MAX_WAIT_MS", "2"))
+SCORE_MAX_BATCH_SIZE = int(os.getenv("SCORE_MAX_BATCH_SIZE", "512"))
+
+# Async (ASGI) serving mode: threads for the blocking AWS SDK calls, and processes for file scoring/training
+ASGI_IO_THREADS = int(os.getenv("ASGI_IO_THREADS", "64"))
+ASGI_CPU_WORKERS = int(os.getenv("ASGI_CPU_WORKERS", "2"))
+
+# Local CIDR enrichment table (network or start/end columns plus country, asn, datacenter)
+IP_RANGES_PATH = os.getenv("IP_RANGES_PATH", os.path.join("data", "ip_ranges.csv"))
+
+# LLM advisory
+ADVISOR_MODEL = os.getenv("ADVISOR_MODEL", "o4-mini")
+# Comma-separated transaction columns sent to the model (default: advisor_prompt.DEFAULT_FIELDS)
+ADVISOR_FIELDS = [f for f in os.getenv("ADVISOR_FIELDS", "").split(",") if f]
+# One JSON line per LLM call: prompt, cached and completion tokens, latency
+ADVISOR_USAGE_LOG = os.getenv("ADVISOR_USAGE_LOG", os.path.join(STATE_DIR, "advisor_usage.jsonl"))
@@ -2,10 +2,18 @@ import openai
 import pandas as pd
 import json
 import time
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 import os
 
-start_time = time.time()  # ⏱ Start timing
+from config.constatns import ADVISOR_MODEL, ADVISOR_USAGE_LOG, LLM_BACKEND, LLM_STUB_LATENCY_MS, LLM_STUB_ERROR_RATE
+from backends.llm_stub import LLMStub
+from services.advisor_prompt import AdvisorVerdict, build_messages
+from utils.state_utils import ensure_parent_dir
+
+# Bump with any change to advisor_prompt.SYSTEM_PROMPT
+PROMPT_CACHE_KEY = "anomaly-advisor-v2"
+
 load_dotenv()
 # Set your API key (recommended: use environment variables instead)
 openai.api_key = os.getenv("OPENAI_API_KEY")
@@ -17,91 +25,96 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 # input_path = "output\\transactions_with_anomalies.csv"  # adjust path if needed
 # df = pd.read_csv(input_path).head(1)
 
+_client = None
+_async_client = None
+
+
+def _get_client():
+    """ The openai module's default client, or the deterministic stub with LLM_BACKEND=stub """
+    global _client
+    if _client is None:
+        _client = LLMStub(LLM_STUB_LATENCY_MS, LLM_STUB_ERROR_RATE) if LLM_BACKEND == "stub" else openai
+    return _client
+
+
+def _get_async_client():
+    """ Created on first use so it binds to the running event loop of the serving process """
+    global _async_client
+    if _async_client is None:
+        if LLM_BACKEND == "stub":
+            _async_client = LLMStub(LLM_STUB_LATENCY_MS, LLM_STUB_ERROR_RATE, asynchronous=True)
+        else:
+            _async_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _async_client
+
+
+def _to_series(verdict):
+    return pd.Series([
+        verdict.anomaly,
+        verdict.anomaly_type,
+        verdict.classification,
+        verdict.explanation,
+        verdict.suggested_action,
+        verdict.anomaly_score
+    ])
+
+
+def _parsed(response):
+    message = response.choices[0].message
+    if message.parsed is None:
+        raise ValueError(f"No verdict returned: {message.refusal or response.choices[0].finish_reason}")
+    return message.parsed
+
+
+def _record_usage(row, response, elapsed):
+    """ Tokens and latency of one call, printed and appended to ADVISOR_USAGE_LOG """
+    usage = response.usage
+    cached = getattr(usage.prompt_tokens_details, "cached_tokens", None) or 0
+    record = {
+        "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "transaction_id": str(row.get("transaction_id")),
+        "model": response.model,
+        "prompt_tokens": usage.prompt_tokens,
+        "cached_tokens": cached,
+        "completion_tokens": usage.completion_tokens,
+        "latency_ms": round(elapsed * 1000),
+    }
+    print(f"🕒 Advisory in {elapsed:.2f}s: {usage.prompt_tokens} prompt ({cached} cached) + "
+          f"{usage.completion_tokens} completion tokens")
+    ensure_parent_dir(ADVISOR_USAGE_LOG)
+    with open(ADVISOR_USAGE_LOG, "a") as log:
+        log.write(json.dumps(record) + "\n")
+
+
+def _request(row):
+    return {
+        "model": ADVISOR_MODEL,
+        "messages": build_messages(row),
+        "response_format": AdvisorVerdict,
+        # Same key on every call so requests land where the static system prefix is already cached
+        "prompt_cache_key": PROMPT_CACHE_KEY,
+    }
+
+
 # Function to analyze transaction using OpenAI o4-mini or gpt-4o
 def analyze_transaction(row):
-    prompt = f"""
-    Analyze the following POS transaction and determine whether it exhibits any anomalies. If an anomaly is detected, classify it (e.g., high refund, unusual card usage, transaction mismatch) including from the below mentioned anomaly types accordingly, explain the reasoning behind the classification, and recommend an appropriate action. If the transaction appears normal, state that clearly.
-    Anomaly types:
-    Duplicate Transactions
-    Reversed/Voided Transactions Not Settled
-    Delayed Settlement
-    Mismatch in Captured vs. Settled Amount
-    Card Type/Issuer Anomalies
-    Terminal Location Inconsistency
-    Offline Transactions (Fallbacks)
-    Terminal Configuration Errors
-    Recurring Declines for Same Card
-    MDR (Merchant Discount Rate) Mismatches
-    Unusual Refund Frequency
-    Unbalanced Batch Totals
-    Operator-Level Fraud or Errors
-    Multiple Settlement Batches in a Day
-    Decline Code Pattern Analysis
-    
-    Please note that our internal LLM-based system, which uses an Isolation Forest algorithm, has already evaluated the transaction and produced the following fields:
-    is_anomaly_suspected_supervised: indicating the supervised model’s prediction
-    is_anomaly_suspected_unsupervised: indicating the unsupervised models's prediction
-
-
-    Use this information in conjunction with your analysis to generate a reliable fraud evaluation response suitable for downstream review or audit.
-    
-    Transaction:
-    - Transaction ID: {row['transaction_id']}
-    - Account ID: {row['account_id']}
-    - Customer ID: {row['customer_id']}
-    - Merchant: {row['merchant_name']}
-    - Store: {row['store_name']}
-    - Card Type: {row['card_type']}
-    - Card Expire Date: {row['card_expire_date']}
-    - Transaction Type: {row['transaction_type']}
-    - Transaction Status: {row['transaction_status']}
-    - Amount: {row['amount']}
-    - Currency: {row['currency']}
-    - Timestamp Initiated: {row['timestamp_initiated']}
-    - Timestamp Completed: {row['timestamp_completed']}
-    - Retry Count: {row['retry_count']}
-    - Device ID: {row['device_id']}
-    - IP ADDRESS: {row['ip_address']}
-    - Geo Location: {row['geo_location']}
-    - Created By: {row['created_by']}
-    - Created At: {row['created_at']}
-    - IS Anomaly suspected supervised: {row['is_anomaly_suspected_supervised']}
-    - IS Anomaly suspected Unsupervised: {row['is_anomaly_suspected_UnSupervised']}
-    - Geo Distance KM: {row['geo_distance_km']}
-    - Rule Anomalies: {row['rule_anomalies']}
-    
-    Respond in this JSON format:
-    {{
-      "anomaly": true/false,
-      "anomaly_type":"..",
-      "classification": "...",
-      "explanation": "...",
-      "suggested_action": "...",
-      "anomaly_score": float (between 0 and 100, where 100 = highly anomalous)
-    }}
-    """
+    try:
+        start = time.perf_counter()
+        response = _get_client().chat.completions.parse(**_request(row))
+        _record_usage(row, response, time.perf_counter() - start)
+        return _to_series(_parsed(response))
+    except Exception as e:
+        print(f"Error on {row['transaction_id']}: {e}")
+        return pd.Series([None, None, None, None, None, None])
+
 
+async def analyze_transaction_async(row):
+    """ analyze_transaction on the async client, for the ASGI app: waiting on the LLM holds no thread """
     try:
-        response = openai.chat.completions.create(
-            model="o4-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        content = response.choices[0].message.content
-        result = json.loads(content)
-        # ⏱ End timing and print elapsed time
-        end_time = time.time()
-        elapsed = end_time - start_time
-        # to: {output_path}
-        print(f"✅ Analysis complete. Results saved ")
-        print(f"🕒 Time taken: {elapsed:.2f} seconds")
-        return pd.Series([
-            result.get("anomaly"),
-            result.get("anomaly_type"),
-            result.get("classification"),
-            result.get("explanation"),
-            result.get("suggested_action"),
-            result.get("anomaly_score")
-        ])
+        start = time.perf_counter()
+        response = await _get_async_client().chat.completions.parse(**_request(row))
+        _record_usage(row, response, time.perf_counter() - start)
+        return _to_series(_parsed(response))
     except Exception as e:
         print(f"Error on {row['transaction_id']}: {e}")
         return pd.Series([None, None, None, None, None, None])
@@ -0,0 +1,121 @@
+import json
+import re
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+
+from config.constatns import ADVISOR_FIELDS
+
+ANOMALY_TYPES = (
+    "Duplicate Transactions",
+    "Reversed/Voided Transactions Not Settled",
+    "Delayed Settlement",
+    "Mismatch in Captured vs. Settled Amount",
+    "Card Type/Issuer Anomalies",
+    "Terminal Location Inconsistency",
+    "Offline Transactions (Fallbacks)",
+    "Terminal Configuration Errors",
+    "Recurring Declines for Same Card",
+    "MDR (Merchant Discount Rate) Mismatches",
+    "Unusual Refund Frequency",
+    "Unbalanced Batch Totals",
+    "Operator-Level Fraud or Errors",
+    "Multiple Settlement Batches in a Day",
+    "Decline Code Pattern Analysis",
+    "Other",
+    "None",
+)
+
+# Column -> short key in the encoded transaction. Identifiers (transaction/account/customer UUIDs) and
+# audit columns (created_by, created_at) carry no signal for the verdict and are left out by default.
+FIELD_KEYS = {
+    'merchant_name': 'merchant',
+    'store_name': 'store',
+    'card_type': 'card',
+    'card_expire_date': 'card_exp',
+    'transaction_type': 'type',
+    'transaction_status': 'status',
+    'amount': 'amount',
+    'currency': 'ccy',
+    'timestamp_initiated': 'initiated',
+    'timestamp_completed': 'completed',
+    'retry_count': 'retries',
+    'device_id': 'device',
+    'ip_address': 'ip',
+    'geo_location': 'geo',
+    'geo_distance_km': 'geo_km',
+    'rule_anomalies': 'rules',
+    # The rules label (3 or more rules fired) the forest is trained on, and the model verdicts
+    'is_anomaly_suspected_supervised': 'rules_flag',
+    'is_anomaly_suspected_UnSupervised': 'rf_model',
+    'iso_anomaly': 'iso_flag',
+    'iso_score': 'iso_score',
+}
+DEFAULT_FIELDS = list(FIELD_KEYS)
+
+_UUID = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+
+# Static, so it is byte-identical on every call and comes first: providers cache the longest shared prefix
+SYSTEM_PROMPT = f"""You review POS transactions for anomalies and write a verdict suitable for downstream review or audit.
+Decide whether the transaction is anomalous. If it is, pick the closest anomaly_type, classify it in a few words \
+(e.g. high refund, unusual card usage, transaction mismatch), explain the reasoning and recommend an action. \
+If it looks normal, say so and use anomaly_type "None". anomaly_score is 0-100, 100 = highly anomalous.
+
+Anomaly types: {"; ".join(ANOMALY_TYPES)}.
+
+The transaction comes as one JSON object. Keys: merchant, store, card (card type), card_exp (MM/YYYY), type, \
+status, amount, ccy, initiated/completed (timestamps), retries, device, ip, geo (lat,lon), \
+geo_km (km from the reference location), rules (rules our rule engine fired), \
+rules_flag (true when 3 or more rules fired), rf_model (random-forest verdict, trained to predict rules_flag), \
+iso_flag (Isolation Forest: -1 = outlier, 1 = inlier), iso_score (Isolation Forest normality 1-100, low = unusual). \
+Use the model verdicts and rules as evidence alongside your own analysis. Absent keys are unknown."""
+
+
+class AdvisorVerdict(BaseModel):
+    """ Structured-output schema: the API returns a parsed instance instead of free-form JSON text """
+    anomaly: bool
+    anomaly_type: Literal[ANOMALY_TYPES]
+    classification: str
+    explanation: str
+    suggested_action: str
+    anomaly_score: float = Field(description="0-100, 100 = highly anomalous")
+
+
+def _compact(value):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return ",".join(map(str, value)) or None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else round(float(value), 2)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat(timespec='seconds')
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    value = str(value)
+    return None if not value or _UUID.match(value) else value
+
+
+def encode_transaction(row, fields=ADVISOR_FIELDS or DEFAULT_FIELDS):
+    """
+    One-line JSON of the configured fields under short keys. Empty values and UUID-shaped values are dropped;
+    floats are rounded to cents and timestamps to seconds.
+    """
+    encoded = {}
+    for field in fields:
+        if field in row:
+            value = _compact(row[field])
+            if value is not None:
+                encoded[FIELD_KEYS.get(field, field)] = value
+    return json.dumps(encoded, separators=(",", ":"), ensure_ascii=False)
+
+
+def build_messages(row, fields=ADVISOR_FIELDS or DEFAULT_FIELDS):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": encode_transaction(row, fields)},
+    ]
@@ -4,7 +4,7 @@ import ipaddress
 from faker import Faker
 from datetime import timedelta
 from geopy.distance import geodesic
-from sklearn.ensemble import IsolationForest, RandomForestClassifier
+from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
@@ -14,10 +14,11 @@ from sklearn.preprocessing import MinMaxScaler
 from collections import Counter
 from datetime import datetime, timezone
 
-from api.config.constatns import TABLE_ANOMALY_METRICS
+from api.config.constatns import TABLE_ANOMALY_METRICS, TRAIN_MAX_ROWS, TRAIN_TIME_BUDGET_SEC
 from api.dynamodb.metric_data import MetricDataRepo
 from api.models.metric import Metric
 from api.services.OpenAIAdvisor import analyze_transaction
+from api.services.training import stratified_reservoir_sample, fit_forest_within_budget, can_stratify
 
 
 def generate_and_process_data():
@@ -110,13 +111,19 @@ def generate_and_process_data():
     # Supervised label
     df['is_anomaly_suspected_supervised'] = df['rule_anomalies'].apply(lambda x: len(x) >= 3)
 
+    # Both models fit on the same bounded stratified sample and score every row; class weights replace
+    # upsampling, so df keeps exactly the generated rows
+    sample_rows = stratified_reservoir_sample(df['is_anomaly_suspected_supervised'], TRAIN_MAX_ROWS)
+
     # Unsupervised Isolation Forest
     features_unsup = ['amount', 'duration_sec', 'hour', 'day_of_week', 'months_to_expiry', 'geo_distance_km']
     X_unsup = df[features_unsup].fillna(0)
-    X_unsup_scaled = StandardScaler().fit_transform(X_unsup)
+    unsup_scaler = StandardScaler().fit(X_unsup.iloc[sample_rows])
+    X_unsup_scaled = unsup_scaler.transform(X_unsup)
 
     iso_model = IsolationForest(contamination=0.02, random_state=42)
-    df['iso_anomaly'] = iso_model.fit_predict(X_unsup_scaled)
+    iso_model.fit(X_unsup_scaled[sample_rows])
+    df['iso_anomaly'] = iso_model.predict(X_unsup_scaled)
     df['iso_score'] = iso_model.decision_function(X_unsup_scaled)
     # Rescale iso_score to 1-100
     scaler_iso = MinMaxScaler(feature_range=(1, 100))
@@ -130,23 +137,16 @@ def generate_and_process_data():
     X = df[features_sup].astype(float)
     y = df['is_anomaly_suspected_supervised']
 
-    # Upsample if needed
-    if y.value_counts()[True] < 100:
-        from sklearn.utils import resample
-        df_majority = df[df['is_anomaly_suspected_supervised'] == False]
-        df_minority = df[df['is_anomaly_suspected_supervised'] == True]
-        df_minority_upsampled = resample(df_minority, replace=True, n_samples=150, random_state=42)
-        df = pd.concat([df_majority, df_minority_upsampled])
-        X = df[features_sup].astype(float)
-        y = df['is_anomaly_suspected_supervised']
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, stratify=y, test_size=0.3, random_state=42)
+    X_sample, y_sample = X.iloc[sample_rows], y.iloc[sample_rows]
+
+    X_train, X_test, y_train, y_test = train_test_split(X_sample, y_sample,
+                                                        stratify=y_sample if can_stratify(y_sample) else None,
+                                                        test_size=0.3, random_state=42)
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
 
-    rf_model = RandomForestClassifier(n_estimators=200, class_weight='balanced', random_state=42)
-    rf_model.fit(X_train_scaled, y_train)
+    rf_model = fit_forest_within_budget(X_train_scaled, y_train, TRAIN_TIME_BUDGET_SEC, random_state=42)
     df['is_anomaly_suspected_UnSupervised'] = rf_model.predict(scaler.transform(X))
 
     print("✅ Supervised Model Report:")
@@ -2,120 +2,50 @@ import os
 import tempfile
 from collections import Counter
 
-import pandas as pd
-import ipaddress
-from geopy.distance import geodesic
 from flask import Flask
-from sklearn.ensemble import IsolationForest, RandomForestClassifier
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
 from datetime import datetime, timezone
 
-import boto3
-
-from config.constatns import TABLE_ANOMALY_METRICS
+from api.config.aws_config import AWSConfig
+from config.constatns import TABLE_ANOMALY_METRICS, SCORING_WORKERS, PROCESSED_DATA_DIR
 from dynamodb.metric_data import MetricDataRepo
 from models.metric import Metric
 from services.OpenAIAdvisor import analyze_transaction
+from services.anomaly_models import save_models
+from services.feature_cache import content_hash, load_features
+from services.ingest import read_transactions_csv
+from services.parallel_scoring import featurize_and_score, score_featurized
+from services.partitions import partition_of, upload_partitioned
+from services.results_store import scored_summary, write_results
+from services.validation import validate_transactions, write_quarantine
 
 app = Flask(__name__)
 
-REFERENCE_GEO = (12.9716, 77.5946)
-
-def preprocess(df):
-    df['timestamp_initiated'] = pd.to_datetime(df['timestamp_initiated'])
-    df['timestamp_completed'] = pd.to_datetime(df['timestamp_completed'])
-    df['duration_sec'] = (df['timestamp_completed'] - df['timestamp_initiated']).dt.total_seconds()
-    df['hour'] = df['timestamp_initiated'].dt.hour
-    df['day_of_week'] = df['timestamp_initiated'].dt.dayofweek
-    df['months_to_expiry'] = df['card_expire_date'].apply(
-        lambda x: (pd.to_datetime(x, format='%m/%Y').year - pd.Timestamp.now().year) * 12 +
-                  (pd.to_datetime(x, format='%m/%Y').month - pd.Timestamp.now().month)
-    )
-    df['geo_distance_km'] = df['geo_location'].apply(
-        lambda loc: geodesic(REFERENCE_GEO, tuple(map(float, loc.split(',')))).km
-    )
-    return df
-
-def detect_rule_anomalies(row):
-    anomalies = []
-    if row['amount'] > 5000:
-        anomalies.append("HIGH_AMOUNT")
-    if row['duration_sec'] > 300:
-        anomalies.append("LONG_DURATION")
-    if row['hour'] in range(0, 5):
-        anomalies.append("ODD_HOUR")
-    if row['months_to_expiry'] < 1:
-        anomalies.append("CARD_EXPIRY_SOON")
-    if row['geo_distance_km'] > 1000:
-        anomalies.append("GEO_TOO_FAR")
-    try:
-        if ipaddress.ip_address(row['ip_address']).is_private:
-            anomalies.append("PRIVATE_IP")
-    except:
-        anomalies.append("IP_PARSE_ERROR")
-    if row['transaction_status'] != "SUCCESS":
-        anomalies.append("STATUS_NOT_SUCCESS")
-    return anomalies
-
-def process_csv_from_s3(bucket, key):
-    s3 = boto3.client("s3")
+
+def process_csv_from_s3(bucket, key, workers=SCORING_WORKERS):
+    s3 = AWSConfig.get_s3_client()
 
     # Download file from S3
     with tempfile.NamedTemporaryFile(delete=False) as tmp:
         temp_file_path = tmp.name
 
     s3.download_file(bucket, key, temp_file_path)
-    df = pd.read_csv(temp_file_path)
-
-    df = preprocess(df)
-    df['rule_anomalies'] = df.apply(lambda row: detect_rule_anomalies(row), axis=1)
-
-    df['has_high_amount'] = df['amount'] > 5000
-    df['has_long_duration'] = df['duration_sec'] > 300
-    df['has_odd_hour'] = df['hour'].isin(range(0, 5))
-    df['has_expiring_card'] = df['months_to_expiry'] < 1
-    df['has_geo_far'] = df['geo_distance_km'] > 1000
-    df['has_status_fail'] = df['transaction_status'] != 'SUCCESS'
-    df['is_anomaly_suspected_supervised'] = df['rule_anomalies'].apply(lambda x: len(x) >= 3)
-
-    features_unsup = ['amount', 'duration_sec', 'hour', 'day_of_week', 'months_to_expiry', 'geo_distance_km']
-    X_unsup = df[features_unsup].fillna(0)
-    X_unsup_scaled = StandardScaler().fit_transform(X_unsup)
-
-    iso_model = IsolationForest(contamination=0.02, random_state=42)
-    df['iso_anomaly'] = iso_model.fit_predict(X_unsup_scaled)
-    df['iso_score'] = iso_model.decision_function(X_unsup_scaled)
-    df['iso_score'] = MinMaxScaler(feature_range=(1, 100)).fit_transform(df[['iso_score']])
-
-    features_sup = features_unsup + [
-        'retry_count', 'has_high_amount', 'has_long_duration', 'has_odd_hour',
-        'has_expiring_card', 'has_geo_far', 'has_status_fail'
-    ]
-    X = df[features_sup].astype(float)
-    y = df['is_anomaly_suspected_supervised']
-
-    if y.value_counts().get(True, 0) < 100:
-        from sklearn.utils import resample
-        df_majority = df[df['is_anomaly_suspected_supervised'] == False]
-        df_minority = df[df['is_anomaly_suspected_supervised'] == True]
-        df_minority_upsampled = resample(df_minority, replace=True, n_samples=150, random_state=42)
-        df = pd.concat([df_majority, df_minority_upsampled])
-        X = df[features_sup].astype(float)
-        y = df['is_anomaly_suspected_supervised']
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, stratify=y, test_size=0.3, random_state=42)
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-
-    rf_model = RandomForestClassifier(n_estimators=200, class_weight='balanced', random_state=42)
-    rf_model.fit(X_train_scaled, y_train)
-    df['is_anomaly_suspected_UnSupervised'] = rf_model.predict(scaler.transform(X))
-
-    print("✅ Supervised Model Report:")
-    print(classification_report(y_test, rf_model.predict(X_test_scaled)))
+    # Same bytes as an earlier run: reuse its features and rule masks and only re-run the model stage
+    digest = content_hash(temp_file_path)
+    df = load_features(digest)
+    if df is not None:
+        df, models, _ = score_featurized(df, workers=workers, digest=digest)
+    else:
+        df = read_transactions_csv(temp_file_path)
+
+        # Malformed rows go to quarantine/ with reason codes; the rest of the file is still scored
+        df, quarantine = validate_transactions(df)
+        if len(quarantine):
+            write_quarantine(s3, bucket, key, quarantine, tempfile.gettempdir())
+        if df.empty:
+            raise ValueError(f"No valid rows in s3://{bucket}/{key}")
+
+        df, models, _ = featurize_and_score(df, workers=workers, digest=digest)
+    save_models(models)
 
     # Save and upload result
     output_file = os.path.join(tempfile.gettempdir(), "transactions_with_anomalies.csv")
@@ -131,7 +61,16 @@ def process_csv_from_s3(bucket, key):
     timestamp = datetime.now(timezone.utc).replace(microsecond=0).strftime("%Y-%m-%dT%H-%M-%S")
 
     filename = f"transactions_with_anomalies_{timestamp}.csv"
-    output_key = f"output/{filename}"
+    # Both uploads land in the output/ partition of the timestamp, recorded in its manifest
+    partition = partition_of(filename)
+    scored_counts = scored_summary(df)
+    scored_name = f"{os.path.splitext(os.path.basename(key))[0]}_scored_{timestamp}.csv"
+    scored_key = upload_partitioned(s3, bucket, PROCESSED_DATA_DIR, output_file, "scored", file_name=scored_name,
+                                    partition=partition, rows=scored_counts["rows"], columns=df.columns,
+                                    anomalies={name: n for name, n in scored_counts.items() if name != "rows"})
+    print(f"✅ Scored rows uploaded to s3://{bucket}/{scored_key}")
+    # Full scored rows, queryable through /results/<filename>/query
+    write_results(df, filename)
 
     advisory_output_file = os.path.join(tempfile.gettempdir(), filename)
     df_to_analyze.to_csv(advisory_output_file, index=False)
@@ -157,7 +96,9 @@ def process_csv_from_s3(bucket, key):
     db = MetricDataRepo(TABLE_ANOMALY_METRICS)
     db.insert_item(metric)
 
-    s3.upload_file(advisory_output_file, bucket, output_key)
+    output_key = upload_partitioned(s3, bucket, PROCESSED_DATA_DIR, advisory_output_file, "advisory",
+                                    partition=partition, rows=len(df_to_analyze), anomalies=counts,
+                                    columns=df_to_analyze.columns)
     print(f"✅ Uploaded to s3://{bucket}/{output_key}")
 
     return output_key
@@ -0,0 +1,151 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from sklearn.metrics import classification_report
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler, MinMaxScaler
+
+from config.constatns import (MODEL_PATH, TRAIN_MAX_ROWS, TRAIN_TIME_BUDGET_SEC, RF_COMPACT_MAX_DEPTH,
+                              RF_COMPACT_MIN_AGREEMENT)
+from services.compact_forest import CompactForest, compact_within_tolerance
+from services.features import FEATURES_UNSUP, FEATURES_SUP, FEATURE_VERSION
+from services.training import stratified_reservoir_sample, fit_forest_within_budget, can_stratify
+from utils.state_utils import locked_state, save_state
+
+SCORE_COLUMNS = ['iso_anomaly', 'iso_score', 'is_anomaly_suspected_UnSupervised']
+
+
+def fit_models(df, max_rows=TRAIN_MAX_ROWS, time_budget_sec=TRAIN_TIME_BUDGET_SEC):
+    """
+    Fit the unsupervised and supervised models on a featurized DataFrame.
+    Training uses a stratified sample of at most max_rows rows and the forest stops growing once
+    time_budget_sec is spent, so fit time stays bounded however large the file is. Class imbalance
+    is handled by class weights rather than duplicated rows, and the DataFrame itself is never modified.
+    Returns the fitted artifacts as a dict so they can be pickled and shipped to scoring workers.
+    """
+    sample = df.iloc[stratified_reservoir_sample(df['is_anomaly_suspected_supervised'], max_rows)]
+    if len(sample) < len(df):
+        print(f"✅ Training on a stratified sample of {len(sample)} of {len(df)} rows")
+
+    X_unsup = sample[FEATURES_UNSUP].fillna(0)
+    unsup_scaler = StandardScaler().fit(X_unsup)
+    iso_model = IsolationForest(contamination=0.02, random_state=42)
+    iso_model.fit(unsup_scaler.transform(X_unsup))
+
+    X = sample[FEATURES_SUP].astype(float)
+    y = sample['is_anomaly_suspected_supervised']
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, stratify=y if can_stratify(y) else None,
+                                                        test_size=0.3, random_state=42)
+    sup_scaler = StandardScaler()
+    X_train_scaled = sup_scaler.fit_transform(X_train)
+    X_test_scaled = sup_scaler.transform(X_test)
+
+    rf_model = fit_forest_within_budget(X_train_scaled, y_train, time_budget_sec, random_state=42)
+
+    print("✅ Supervised Model Report:")
+    print(classification_report(y_test, rf_model.predict(X_test_scaled)))
+
+    # Only the flattened node tables are kept: smaller to store, memory-mapped on load, vectorized to predict
+    rf_compact, rf_agreement = compact_within_tolerance(rf_model, X_test_scaled, RF_COMPACT_MAX_DEPTH,
+                                                        RF_COMPACT_MIN_AGREEMENT)
+    print(f"✅ Compact forest: {rf_compact.n_nodes} nodes, depth {rf_compact.depth}, "
+          f"same prediction as the fitted forest on {rf_agreement:.2%} of held-out rows")
+
+    return {
+        "unsup_scaler": unsup_scaler,
+        "iso_model": iso_model,
+        "sup_scaler": sup_scaler,
+        "rf_model": rf_compact,
+        "rf_agreement": rf_agreement,
+        # The feature set the models were fitted on, checked by schema_mismatch before they are reused
+        "feature_version": FEATURE_VERSION,
+        "features_unsup": list(FEATURES_UNSUP),
+        "features_sup": list(FEATURES_SUP),
+    }
+
+
+def schema_mismatch(models):
+    """
+    Why saved models cannot score the current feature set, or None when they can. Artifacts from before the
+    feature set was stored are checked through the feature names their scalers were fitted on.
+    """
+    version = models.get("feature_version")
+    if version != FEATURE_VERSION:
+        return f"models were fitted on feature version {version}, the current one is {FEATURE_VERSION}"
+    for key, scaler, features in (("features_unsup", "unsup_scaler", FEATURES_UNSUP),
+                                  ("features_sup", "sup_scaler", FEATURES_SUP)):
+        fitted = models.get(key)
+        if fitted is None:
+            fitted = getattr(models[scaler], "feature_names_in_", None)
+        if fitted is None or list(fitted) != list(features):
+            return f"models were fitted on different {key} columns than the current feature set"
+    return None
+
+
+def score_features(df, models):
+    """
+    Score a featurized DataFrame (or a shard of one) with fitted models.
+    iso_score is the raw decision_function value; call rescale_iso_score once on the merged result.
+    """
+    X_unsup_scaled = models["unsup_scaler"].transform(df[FEATURES_UNSUP].fillna(0))
+    X = df[FEATURES_SUP].astype(float)
+
+    scores = pd.DataFrame(index=df.index)
+    # Same as iso_model.predict, without scoring the trees a second time
+    scores['iso_score'] = models["iso_model"].decision_function(X_unsup_scaled)
+    scores['iso_anomaly'] = np.where(scores['iso_score'] < 0, -1, 1)
+    scores['is_anomaly_suspected_UnSupervised'] = forest_predict(models["rf_model"], models["sup_scaler"].transform(X))
+    return scores
+
+
+def forest_predict(rf_model, X):
+    """
+    Same result as rf_model.predict, calling each tree directly: RandomForestClassifier.predict dispatches
+    one joblib task per tree, which dominates the cost for the small batches of the real-time path.
+    Artifacts saved before the compact format hold the sklearn forest; newer ones a CompactForest.
+    """
+    if isinstance(rf_model, CompactForest):
+        return rf_model.predict(X)
+    X = np.asarray(X, dtype=np.float32)
+    n_classes = len(rf_model.classes_)
+    proba = np.zeros((len(X), n_classes))
+    for estimator in rf_model.estimators_:
+        tree_proba = estimator.tree_.predict(X)[:, :n_classes]
+        normalizer = tree_proba.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0] = 1
+        proba += tree_proba / normalizer
+    return rf_model.classes_[np.argmax(proba, axis=1)]
+
+
+def iso_score_range(scores):
+    """ (min, max) of raw iso scores; stored with the models so single transactions can be rescaled later """
+    return float(scores['iso_score'].min()), float(scores['iso_score'].max())
+
+
+def rescale_iso_score(df, score_range=None):
+    """ Rescale raw iso_score to 1-100, across the whole file or with a stored (min, max) """
+    if score_range is None:
+        df['iso_score'] = MinMaxScaler(feature_range=(1, 100)).fit_transform(df[['iso_score']])
+        return df
+    lo, hi = score_range
+    scaled = (df['iso_score'] - lo) / (hi - lo) if hi > lo else df['iso_score'] * 0
+    df['iso_score'] = 1 + 99 * scaled.clip(0, 1)
+    return df
+
+
+def save_models(models, path=MODEL_PATH):
+    """ Replace the saved models; concurrent requests save one after the other """
+    with locked_state(path):
+        save_state(models, path)
+    print(f"✅ Models saved to: {path}")
+
+
+def load_models(path=MODEL_PATH, mmap_mode='r'):
+    """ Fitted models; numpy arrays (the compact forest's node tables) are memory-mapped, not read """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No trained models at {path}; process a file first")
+    return joblib.load(path, mmap_mode=mmap_mode)
@@ -0,0 +1,70 @@
+import os
+import tempfile
+from contextlib import ExitStack
+
+import pandas as pd
+import pyarrow as pa
+
+from config.constatns import APPLIED_INPUTS_DIR, APPLIED_INPUTS_MAX_BYTES
+from services.feature_cache import evict
+from services.feature_store import BEHAVIOR_COLUMNS, join_behavior
+from services.fingerprint_index import flag_duplicates
+from utils.state_utils import locked_state
+
+# Every column the stateful stages add; add_supervised_label is derived from them and is not recorded
+STATEFUL_COLUMNS = BEHAVIOR_COLUMNS + ['has_duplicate', 'online_anomaly', 'online_score']
+
+
+def applied_path(digest, applied_dir=APPLIED_INPUTS_DIR):
+    return os.path.join(applied_dir, f"{digest}.parquet")
+
+
+def locked_inputs(digests, applied_dir=APPLIED_INPUTS_DIR):
+    """ Lock every digest (in sorted order, so two batches never wait on each other) for a check-apply-record cycle """
+    stack = ExitStack()
+    for digest in sorted(set(digests)):
+        stack.enter_context(locked_state(applied_path(digest, applied_dir)))
+    return stack
+
+
+def load_applied(digest, rows, applied_dir=APPLIED_INPUTS_DIR):
+    """ Stateful outputs recorded for the input with this content hash, or None if it was never applied """
+    path = applied_path(digest, applied_dir)
+    try:
+        df = pd.read_parquet(path)
+        # Mark as recently used, as the feature cache does
+        os.utime(path)
+    except (OSError, pa.ArrowInvalid):
+        return None
+    # A digest collision or a truncated record is treated as a new input
+    return df if len(df) == rows else None
+
+
+def record_applied(digest, df, applied_dir=APPLIED_INPUTS_DIR, max_bytes=APPLIED_INPUTS_MAX_BYTES):
+    """
+    Record the stateful outputs of an input's rows, then evict least recently used records past max_bytes.
+    Failures are reported, never raised: the state itself is already updated.
+    """
+    if not max_bytes:
+        return
+    tmp_path = None
+    try:
+        os.makedirs(applied_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=applied_dir, suffix=".tmp")
+        os.close(fd)
+        df[STATEFUL_COLUMNS].reset_index(drop=True).to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, applied_path(digest, applied_dir))
+        evict(applied_dir, max_bytes)
+    except Exception as e:
+        print(f"Applied input record failed for {digest}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def restore_applied(df, applied):
+    """ Put the recorded stateful outputs back on a replayed input's featurized rows """
+    df = join_behavior(df, applied[BEHAVIOR_COLUMNS].set_axis(df.index))
+    df = flag_duplicates(df, applied['has_duplicate'].to_numpy())
+    df['online_anomaly'] = applied['online_anomaly'].to_numpy()
+    df['online_score'] = applied['online_score'].to_numpy()
+    return df
@@ -0,0 +1,223 @@
+import json
+import os
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from api.config.aws_config import AWSConfig
+from config.constatns import (TABLE_ANOMALY_METRICS, PROCESSED_DATA_DIR, SCORING_WORKERS, BATCH_CONCURRENCY,
+                              BATCH_MAX_FILES)
+from dynamodb.metric_data import MetricDataRepo
+from models.metric import Metric
+from services.OpenAIAdvisor import analyze_transaction
+from services.anomaly_models import save_models
+from services.feature_cache import content_hash, load_features, store_features
+from services.features import build_features
+from services.ingest import read_transactions_csv
+from services.parallel_scoring import scoring_pool, fit_and_score
+from services.partitions import MANIFEST_NAME, partitioned_key, put_partitioned, record_object, upload_partitioned
+from services.realtime_scoring import ADVISORY_OUTPUT_COLS
+from services.results_store import scored_summary, write_results
+from services.validation import validate_transactions, write_quarantine
+
+# Rows of the combined batch sent to the LLM advisory, as the single-file path does per file
+ADVISORY_ROWS = 2
+# Prefix listings only pick up transaction files: not folder markers, partition manifests or other outputs
+INPUT_SUFFIXES = ('.csv',)
+
+
+def resolve_manifest(manifest, s3, max_files=BATCH_MAX_FILES):
+    """
+    (bucket, key) pairs from a manifest: {"objects": [{"bucket": ..., "key": ...}, ...]} and/or
+    {"bucket": ..., "prefix": ...} for every CSV object under a prefix. Raises ValueError on a bad manifest.
+    """
+    objects = []
+    for entry in manifest.get("objects", []):
+        if not isinstance(entry, dict) or "bucket" not in entry or "key" not in entry:
+            raise ValueError("Each manifest object needs a bucket and a key")
+        objects.append((entry["bucket"], entry["key"]))
+    if "prefix" in manifest:
+        if "bucket" not in manifest:
+            raise ValueError("A prefix listing needs a bucket")
+        paginator = s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=manifest["bucket"], Prefix=manifest["prefix"]):
+            objects.extend((manifest["bucket"], obj["Key"]) for obj in page.get("Contents", [])
+                           if _is_input_key(obj["Key"]))
+    if not objects:
+        raise ValueError("The manifest lists no objects")
+    if len(objects) > max_files:
+        raise ValueError(f"The manifest expands to {len(objects)} objects; the limit is {max_files}")
+    return objects
+
+
+def _is_input_key(key):
+    name = os.path.basename(key)
+    return name != MANIFEST_NAME and name.lower().endswith(INPUT_SUFFIXES)
+
+
+def _download_and_read(s3, tmp_dir, index, result):
+    path = os.path.join(tmp_dir, f"input_{index}.csv")
+    stage = "download"
+    try:
+        s3.download_file(result["bucket"], result["key"], path)
+        stage = "cache"
+        result["content_hash"] = content_hash(path)
+        df = load_features(result["content_hash"])
+        if df is not None:
+            result.update({"feature_cache": "hit", "rows": len(df)})
+            return df
+        result["feature_cache"] = "miss"
+        stage = "read"
+        df = read_transactions_csv(path)
+        stage = "validate"
+        df, quarantine = validate_transactions(df)
+        if len(quarantine):
+            result["quarantined_rows"] = len(quarantine)
+            result["quarantine_key"] = write_quarantine(s3, result["bucket"], result["key"], quarantine, tmp_dir)
+        if df.empty:
+            raise ValueError("No valid rows")
+        result["rows"] = len(df)
+        return df
+    except Exception as e:
+        _fail(result, stage, e)
+        return None
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _fail(result, stage, error):
+    result.update({"status": "error", "stage": stage, "message": str(error)})
+    print(f"Error in {stage} for s3://{result['bucket']}/{result['key']}: {error}")
+
+
+def _output_key(key, timestamp):
+    stem = os.path.splitext(os.path.basename(key))[0]
+    return partitioned_key(PROCESSED_DATA_DIR, f"{stem}_with_anomalies_{timestamp}.csv")
+
+
+def process_batch_from_s3(objects, concurrency=BATCH_CONCURRENCY, workers=SCORING_WORKERS):
+    """
+    Score many S3 objects in one pass: concurrent downloads, per-file feature/rule stages, then one
+    stateful pass, one model fit and one scoring run over the combined rows. Each file gets its own
+    scored output under its output/ date/hour partition, and the batch gets one advisory, one metric item and one
+    summary JSON in the same partition; every object is recorded in the partition manifest.
+
+    A file that fails to download, parse or featurize is reported and left out; the rest still run.
+    Returns the summary dict (also uploaded as output/<partition>/batch_summary_<timestamp>.json).
+    """
+    # One client for every thread: boto3 clients are thread-safe, sessions and resources are not
+    s3 = AWSConfig.get_s3_client()
+    timestamp = datetime.now(timezone.utc).replace(microsecond=0).strftime("%Y-%m-%dT%H-%M-%S")
+    results = [{"bucket": bucket, "key": key, "status": "pending"} for bucket, key in objects]
+    summary = {"batch_id": timestamp, "files": results}
+
+    with tempfile.TemporaryDirectory() as tmp_dir, ThreadPoolExecutor(max_workers=max(concurrency, 1)) as io_pool:
+        frames = list(io_pool.map(lambda i: _download_and_read(s3, tmp_dir, i, results[i]), range(len(results))))
+        n_rows = sum(len(df) for df in frames if df is not None)
+        print(f"✅ Downloaded {sum(df is not None for df in frames)} of {len(results)} files ({n_rows} rows)")
+
+        with scoring_pool(workers, n_rows) as pool:
+            # Files are natural shards for the row-local stage; frames from the feature cache skip it
+            pending = [(result, pool.submit(build_features, df) if pool and result["feature_cache"] == "miss"
+                        else df) for result, df in zip(results, frames) if df is not None]
+            featurized = []
+            for result, job in pending:
+                if result["feature_cache"] == "hit":
+                    featurized.append((result, job))
+                    continue
+                try:
+                    df = job.result() if pool else build_features(job)
+                except Exception as e:
+                    _fail(result, "features", e)
+                    continue
+                store_features(result["content_hash"], df)
+                featurized.append((result, df))
+
+            if not featurized:
+                return _finish(summary, s3, None, tmp_dir, timestamp)
+            try:
+                combined = pd.concat([f for _, f in featurized], ignore_index=True)
+                sources = [(result["content_hash"], len(f)) for result, f in featurized]
+                df, models, summary["drift"] = fit_and_score(combined, workers, pool, sources)
+                save_models(models)
+            except Exception as e:
+                for result, _ in featurized:
+                    _fail(result, "scoring", e)
+                return _finish(summary, s3, None, tmp_dir, timestamp)
+
+        bounds = np.cumsum([0] + [len(f) for _, f in featurized])
+        uploads = [(result, df.iloc[start:end]) for (result, _), start, end in
+                   zip(featurized, bounds[:-1], bounds[1:])]
+        list(io_pool.map(lambda item: _write_output(s3, tmp_dir, timestamp, *item), uploads))
+        return _finish(summary, s3, df, tmp_dir, timestamp)
+
+
+def _write_output(s3, tmp_dir, timestamp, result, df):
+    try:
+        output_key = _output_key(result["key"], timestamp)
+        path = os.path.join(tmp_dir, os.path.basename(output_key))
+        df.to_csv(path, index=False)
+        s3.upload_file(path, result["bucket"], output_key)
+        counts = scored_summary(df)
+        record_object(s3, result["bucket"], output_key, "scored", rows=counts["rows"],
+                      anomalies={name: count for name, count in counts.items() if name != "rows"},
+                      size=os.path.getsize(path), columns=df.columns)
+        results_key = write_results(df, output_key)
+        result.update({"status": "success", "output_key": output_key, "results_key": results_key, **counts})
+    except Exception as e:
+        _fail(result, "upload", e)
+
+
+def _finish(summary, s3, df, tmp_dir, timestamp):
+    results = summary["files"]
+    succeeded = [r for r in results if r["status"] == "success"]
+    summary.update({
+        "status": "success" if len(succeeded) == len(results) else "partial" if succeeded else "error",
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "rows": sum(r["rows"] for r in succeeded),
+        "rule_anomaly_counts": dict(Counter(rule for rules in df['rule_anomalies'] for rule in rules))
+        if df is not None else {},
+    })
+    if not succeeded:
+        return summary
+
+    # One advisory and one metric item for the whole batch rather than one per file
+    bucket = succeeded[0]["bucket"]
+    try:
+        summary["advisory_key"] = _write_advisory(s3, bucket, df, tmp_dir, timestamp)
+    except Exception as e:
+        # The scored files are already uploaded; report the advisory failure instead of failing the batch
+        summary["advisory_error"] = str(e)
+        print(f"Error in advisory for batch {timestamp}: {e}")
+
+    summary["summary_key"] = partitioned_key(PROCESSED_DATA_DIR, f"batch_summary_{timestamp}.json")
+    put_partitioned(s3, bucket, PROCESSED_DATA_DIR, os.path.basename(summary["summary_key"]),
+                    json.dumps(summary, indent=2).encode("utf-8"), "batch_summary", rows=summary["rows"],
+                    anomalies=summary["rule_anomaly_counts"])
+    print(f"✅ Batch {timestamp}: {summary['succeeded']} files scored, {summary['failed']} failed, "
+          f"summary at s3://{bucket}/{summary['summary_key']}")
+    return summary
+
+
+def _write_advisory(s3, bucket, df, tmp_dir, timestamp):
+    df_to_analyze = df.head(ADVISORY_ROWS).copy()
+    df_to_analyze[ADVISORY_OUTPUT_COLS] = df_to_analyze.apply(analyze_transaction, axis=1)
+    filename = f"transactions_with_anomalies_{timestamp}.csv"
+    advisory_output_file = os.path.join(tmp_dir, filename)
+    df_to_analyze.to_csv(advisory_output_file, index=False)
+
+    counts = Counter(df_to_analyze['anomaly_type'])
+    metric = Metric.to_metric({
+        "file_name": filename,
+        "metric_data": [{"anomaly_type": k, "count": v} for k, v in counts.items()]
+    })
+    MetricDataRepo(TABLE_ANOMALY_METRICS).insert_item(metric)
+
+    return upload_partitioned(s3, bucket, PROCESSED_DATA_DIR, advisory_output_file, "advisory",
+                              rows=len(df_to_analyze), anomalies=counts, columns=df_to_analyze.columns)
@@ -0,0 +1,167 @@
+import os
+
+import joblib
+import numpy as np
+
+from utils.state_utils import ensure_parent_dir
+
+_LEAF = -1
+# Rows x trees node cursors advanced per block; bounds the working set to a few MB
+_BLOCK_CELLS = 1 << 18
+# Ensemble sizes tried when pruning, smallest first; the trees of a random forest are exchangeable,
+# so the first k trees are themselves a k-tree random forest
+TREE_COUNTS = (10, 25, 50, 100)
+
+
+class CompactForest:
+    """
+    A fitted RandomForestClassifier flattened into a handful of numpy arrays, one node table for every tree.
+
+    Node i tests X[:, feature[i]] <= threshold[i] and moves to children[i, 0] or children[i, 1]; leaves point
+    back at themselves, so every row is advanced through every tree in lock-step, with no per-row branching,
+    until none moves. Thresholds are float32 rounded down, which gives the same comparisons as sklearn (it casts
+    X to float32 and compares against float64 thresholds). leaf_proba holds each node's normalized class
+    distribution; trees cut at max_depth vote with the distribution of the cut node.
+
+    Only plain arrays are stored, so joblib.load(path, mmap_mode='r') maps the tables instead of reading them.
+    """
+
+    def __init__(self, feature, threshold, children, leaf_proba, roots, classes, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.classes_ = classes
+        self.depth = depth
+
+    @classmethod
+    def from_sklearn(cls, rf_model, max_depth=None, n_trees=None):
+        """ Flatten the first n_trees (None = all) trees of rf_model, turning nodes at max_depth into leaves """
+        n_classes = len(rf_model.classes_)
+        tables, roots, offset, depth = [], [], 0, 0
+        for estimator in rf_model.estimators_[:n_trees]:
+            table, tree_depth = _flatten_tree(estimator.tree_, n_classes, max_depth, offset)
+            tables.append(table)
+            roots.append(offset)
+            offset += len(table[0])
+            depth = max(depth, tree_depth)
+        feature, threshold, left, right, proba = (np.concatenate(column) for column in zip(*tables))
+        index_type = np.int32 if 2 * offset < np.iinfo(np.int32).max else np.int64
+        return cls(feature=feature.astype(np.int16 if feature.max() < np.iinfo(np.int16).max else np.int32),
+                   threshold=threshold, children=np.stack([left, right], axis=1).astype(index_type),
+                   leaf_proba=proba.astype(np.float32), roots=np.array(roots, dtype=index_type),
+                   classes=rf_model.classes_, depth=depth)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """ Leaf node index of every row in every tree, shape (rows, trees) """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        values = X.ravel()
+        children = self.children.ravel()
+        row_offsets = (np.arange(len(X), dtype=np.int64) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        for _ in range(self.depth):
+            goes_right = values.take(row_offsets + self.feature.take(nodes)) > self.threshold.take(nodes)
+            moved = children.take(2 * nodes + goes_right)
+            if np.array_equal(moved, nodes):
+                break
+            nodes = moved
+        return nodes
+
+    def predict_proba(self, X):
+        """ Mean of the per-tree class distributions, as RandomForestClassifier.predict_proba """
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.empty((len(X), len(self.classes_)))
+        block = max(1, _BLOCK_CELLS // self.n_trees)
+        for start in range(0, len(X), block):
+            leaves = self.apply(X[start:start + block])
+            proba[start:start + block] = self.leaf_proba.take(leaves, axis=0).sum(axis=1, dtype=np.float64)
+        return proba / self.n_trees
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def _flatten_tree(tree, n_classes, max_depth, offset):
+    """ Node table of one sklearn tree in (feature, threshold, left, right, proba) arrays, indices shifted """
+    left = tree.children_left.astype(np.int64)
+    right = tree.children_right.astype(np.int64)
+    node_depth = np.zeros(tree.node_count, dtype=np.int64)
+    # sklearn numbers children after their parent, so one forward pass fills every depth
+    for node in range(tree.node_count):
+        if left[node] != _LEAF:
+            node_depth[left[node]] = node_depth[right[node]] = node_depth[node] + 1
+    is_leaf = left == _LEAF
+    if max_depth is not None:
+        is_leaf |= node_depth >= max_depth
+
+    # Keep only the nodes still reachable, renumbered in order
+    keep = node_depth <= (max_depth if max_depth is not None else node_depth.max())
+    new_index = np.cumsum(keep) - 1 + offset
+    nodes = np.flatnonzero(keep)
+    leaf = is_leaf[nodes]
+
+    feature = np.where(leaf, 0, tree.feature[nodes])
+    threshold = _round_down_float32(np.where(leaf, 0.0, tree.threshold[nodes]))
+    left_out = np.where(leaf, new_index[nodes], new_index[np.where(leaf, nodes, left[nodes])])
+    right_out = np.where(leaf, new_index[nodes], new_index[np.where(leaf, nodes, right[nodes])])
+
+    value = tree.value[nodes, 0, :n_classes].astype(np.float64)
+    total = value.sum(axis=1, keepdims=True)
+    total[total == 0] = 1
+    depth = int(node_depth[nodes].max())
+    return (feature, threshold, left_out, right_out, value / total), depth
+
+
+def _round_down_float32(values):
+    """ Largest float32 <= each value, so x32 <= t32 holds exactly when x32 <= t64 does """
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def agreement(rf_model, compact, X):
+    """ Fraction of rows where the compact forest predicts the same class as rf_model """
+    X = np.asarray(X, dtype=np.float32)
+    return float(np.mean(rf_model.predict(X) == compact.predict(X))) if len(X) else 1.0
+
+
+def compact_within_tolerance(rf_model, X_check, max_depth, min_agreement, tree_counts=TREE_COUNTS):
+    """
+    The smallest compact forest - the first k trees of rf_model for k in tree_counts, cut at max_depth
+    (0/None = full depth) - whose predictions agree with rf_model on at least min_agreement of X_check.
+    Falls back to every tree at full depth, which is exact. Returns (compact forest, agreement).
+    """
+    X_check = np.asarray(X_check, dtype=np.float32)
+    n_trees = len(rf_model.estimators_)
+    if len(X_check):
+        reference = rf_model.predict(X_check)
+        capped = CompactForest.from_sklearn(rf_model, max_depth=max_depth or None)
+        # Votes of every tree prefix from a single traversal
+        votes = np.cumsum(capped.leaf_proba.take(capped.apply(X_check), axis=0), axis=1, dtype=np.float64)
+        for k in sorted({k for k in tree_counts if k < n_trees} | {n_trees}):
+            if np.mean(rf_model.classes_[np.argmax(votes[:, k - 1], axis=1)] == reference) >= min_agreement:
+                compact = CompactForest.from_sklearn(rf_model, max_depth=max_depth or None, n_trees=k)
+                return compact, agreement(rf_model, compact, X_check)
+        print(f"🔍 No pruned forest agrees on {min_agreement:.2%} of held-out rows; keeping every tree at full depth")
+    compact = CompactForest.from_sklearn(rf_model)
+    return compact, agreement(rf_model, compact, X_check)
+
+
+def save_compact(compact, path):
+    ensure_parent_dir(path)
+    joblib.dump(compact, path)
+    return os.path.getsize(path)
+
+
+def load_compact(path, mmap_mode='r'):
+    return joblib.load(path, mmap_mode=mmap_mode)
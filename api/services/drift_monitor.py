@@ -0,0 +1,217 @@
+import glob
+import math
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from config.constatns import (DRIFT_DIR, DRIFT_PSI_THRESHOLD, DRIFT_BINS, DRIFT_SKETCH_ACCURACY, DRIFT_RETRAIN,
+                              DRIFT_KEEP_SKETCHES)
+from services.features import FEATURES_SUP
+from utils.state_utils import load_state, save_state
+
+# Features summarized by value frequencies rather than a quantile digest
+CATEGORICAL_FEATURES = [f for f in FEATURES_SUP if f.startswith('has_')] + ['hour', 'day_of_week', 'retry_count']
+
+REFERENCE_PATH = os.path.join(DRIFT_DIR, "reference.joblib")
+SKETCH_DIR = os.path.join(DRIFT_DIR, "sketches")
+
+# Keeps empty buckets from making PSI infinite
+PSI_EPSILON = 1e-4
+MISSING = "<missing>"
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile digest (DDSketch, Masson et al. 2019).
+
+    Value x > 0 lands in bucket ceil(log_gamma(x)), so every quantile is returned within the relative accuracy
+    and two sketches with the same accuracy merge by adding bucket counts. The buckets double as the histogram
+    PSI is computed on. Size grows with the log of the value range, not with the number of rows.
+    """
+
+    def __init__(self, relative_accuracy=DRIFT_SKETCH_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.missing = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        finite = np.isfinite(values)
+        self.missing += int(len(values) - finite.sum())
+        values = values[finite]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        tiny = np.finfo(float).tiny
+        self.zeros += int((np.abs(values) < tiny).sum())
+        for store, part in ((self.positive, values[values >= tiny]), (self.negative, -values[values <= -tiny])):
+            if len(part):
+                keys = np.ceil(np.log(part) / math.log(self.gamma)).astype(np.int64)
+                offset = keys.min()
+                counts = np.bincount(keys - offset)
+                for key in np.flatnonzero(counts):
+                    store[int(key + offset)] = store.get(int(key + offset), 0) + int(counts[key])
+        return self
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge quantile sketches with different accuracies")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.missing += other.missing
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def buckets(self):
+        """ (bucket values ascending, counts) """
+        negative = sorted(self.negative, reverse=True)
+        positive = sorted(self.positive)
+        values = [-self._value(k) for k in negative] + ([0.0] if self.zeros else []) + [self._value(k) for k in positive]
+        counts = [self.negative[k] for k in negative] + ([self.zeros] if self.zeros else []) + \
+                 [self.positive[k] for k in positive]
+        return np.array(values, dtype=float), np.array(counts, dtype=np.int64)
+
+    def quantile(self, q):
+        if not self.count:
+            return np.full(np.shape(q), np.nan)
+        values, counts = self.buckets()
+        ranks = np.asarray(q, dtype=float) * (self.count - 1)
+        found = values[np.minimum(np.searchsorted(np.cumsum(counts), ranks, side='right'), len(values) - 1)]
+        return np.clip(found, self.min, self.max)
+
+    def cdf(self, x):
+        """ Fraction of the non-missing values at or below each x """
+        if not self.count:
+            return np.zeros(np.shape(x))
+        values, counts = self.buckets()
+        cumulative = np.concatenate([[0], np.cumsum(counts)])
+        return cumulative[np.searchsorted(values, x, side='right')] / self.count
+
+
+class CategorySketch:
+    """ Exact value frequencies, for booleans and small integer ranges; merges by adding counts """
+
+    def __init__(self):
+        self.counts = {}
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def update(self, values):
+        for value, count in pd.Series(values).value_counts(dropna=False).items():
+            key = MISSING if pd.isna(value) else str(int(value)) if isinstance(value, (bool, np.bool_)) else str(value)
+            self.counts[key] = self.counts.get(key, 0) + int(count)
+        return self
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        return self
+
+
+def build_sketches(df, features=FEATURES_SUP):
+    """ {feature: sketch} for one DataFrame or shard; shards merge with merge_sketches """
+    return {f: (CategorySketch() if f in CATEGORICAL_FEATURES else QuantileSketch()).update(df[f].to_numpy())
+            for f in features}
+
+
+def merge_sketches(sketches, other):
+    for feature, sketch in other.items():
+        if feature in sketches:
+            sketches[feature].merge(sketch)
+        else:
+            sketches[feature] = sketch
+    return sketches
+
+
+def _psi(expected, actual):
+    expected = np.clip(expected, PSI_EPSILON, None)
+    actual = np.clip(actual, PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def feature_psi(current, reference):
+    """
+    Population stability index of one feature. Numeric features are bucketed at the reference deciles
+    (DRIFT_BINS) plus a missing-value bucket; categorical features compare value frequencies.
+    """
+    if isinstance(reference, CategorySketch):
+        keys = sorted(set(reference.counts) | set(current.counts))
+        expected = np.array([reference.counts.get(k, 0) for k in keys]) / max(reference.count, 1)
+        actual = np.array([current.counts.get(k, 0) for k in keys]) / max(current.count, 1)
+        return _psi(expected, actual)
+
+    edges = np.unique(reference.quantile(np.linspace(0, 1, DRIFT_BINS + 1)[1:-1]))
+
+    def fractions(sketch):
+        total = max(sketch.count + sketch.missing, 1)
+        cdf = np.concatenate([[0], sketch.cdf(edges), [1]])
+        return np.append(np.diff(cdf) * sketch.count / total, sketch.missing / total)
+
+    return _psi(fractions(reference), fractions(current))
+
+
+def drift_report(current, reference, threshold=DRIFT_PSI_THRESHOLD):
+    """
+    Per-feature PSI of the current sketches against the reference. drift_score is the largest PSI;
+    features at or above threshold are listed as drifted (0.1-0.25 is usually read as moderate, >0.25 as major).
+    """
+    if reference is None:
+        return {"drift_score": None, "features": {}, "drifted": [], "has_reference": False}
+    psi = {f: round(feature_psi(current[f], reference[f]), 4) for f in current if f in reference}
+    return {
+        "drift_score": max(psi.values(), default=0.0),
+        "features": psi,
+        "drifted": sorted((f for f, v in psi.items() if v >= threshold), key=lambda f: -psi[f]),
+        "has_reference": True,
+    }
+
+
+def load_reference(path=REFERENCE_PATH):
+    return load_state(path, lambda: None)
+
+
+def save_reference(sketches, path=REFERENCE_PATH):
+    """ The sketches of the data the current models were fitted on """
+    save_state(sketches, path)
+
+
+def should_retrain(report, mode=DRIFT_RETRAIN):
+    return mode == "always" or not report["has_reference"] or bool(report["drifted"])
+
+
+def record_sketches(sketches, report, rows, sketch_dir=SKETCH_DIR, keep=DRIFT_KEEP_SKETCHES):
+    """ Persist one scoring run's sketches and drift report, keeping the newest `keep` runs (at least this one) """
+    keep = max(keep, 1)
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H-%M-%S.%f")
+    save_state({"created_at": timestamp, "rows": rows, "report": report, "sketches": sketches},
+               os.path.join(sketch_dir, f"{timestamp}.joblib"))
+    for stale in sorted(glob.glob(os.path.join(sketch_dir, "*.joblib")))[:-keep]:
+        os.remove(stale)
+
+
+def latest_drift(sketch_dir=SKETCH_DIR):
+    """ created_at, rows and drift report of the newest recorded run, or None """
+    paths = sorted(glob.glob(os.path.join(sketch_dir, "*.joblib")))
+    if not paths:
+        return None
+    run = load_state(paths[-1], dict)
+    return {k: run[k] for k in ("created_at", "rows", "report")}
@@ -0,0 +1,116 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config.constatns import FEATURE_CACHE_DIR, FEATURE_CACHE_MAX_BYTES, IP_RANGES_PATH
+from services.features import FEATURE_VERSION, rule_masks, rule_lists
+
+# Rule masks are stored as one bool column each; rule_anomalies is rebuilt from them on load
+MASK_PREFIX = 'mask__'
+# Schema metadata entry holding the original column order
+COLUMNS_KEY = b'feature_cache.columns'
+_HASH_BLOCK = 1 << 20
+
+
+def content_hash(path):
+    """ Digest of the input file's bytes, so the same data under another key or name hits the same entry """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def feature_version():
+    """
+    Everything besides the input that the feature frame depends on: the feature code version, the month
+    (months_to_expiry is relative to now) and the IP ranges table used for enrichment.
+    """
+    try:
+        stat = os.stat(IP_RANGES_PATH)
+        ip_ranges = f"{stat.st_size}-{stat.st_mtime_ns}"
+    except OSError:
+        ip_ranges = "none"
+    parts = f"{FEATURE_VERSION}|{pd.Timestamp.now():%Y-%m}|{ip_ranges}"
+    return hashlib.blake2b(parts.encode(), digest_size=6).hexdigest()
+
+
+def cache_path(digest, cache_dir=FEATURE_CACHE_DIR):
+    return os.path.join(cache_dir, f"{digest}-{feature_version()}.parquet")
+
+
+def load_features(digest, cache_dir=FEATURE_CACHE_DIR):
+    """ The featurized frame cached for digest, or None on a miss (or when the cache is disabled) """
+    if not FEATURE_CACHE_MAX_BYTES:
+        return None
+    path = cache_path(digest, cache_dir)
+    try:
+        table = pq.read_table(path)
+        # Mark as recently used; mtime rather than atime, which noatime mounts never update
+        os.utime(path)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    # The stored pandas metadata would turn strings back into python-backed StringDtype; read them as ingest does
+    strings = pd.StringDtype("pyarrow")
+    df = table.to_pandas(types_mapper={pa.string(): strings, pa.large_string(): strings}.get, ignore_metadata=True)
+    mask_columns = [col for col in df.columns if col.startswith(MASK_PREFIX)]
+    masks = df[mask_columns].rename(columns=lambda col: col[len(MASK_PREFIX):])
+    df['rule_anomalies'] = rule_lists(masks)
+    df = df[json.loads(table.schema.metadata[COLUMNS_KEY])]
+    print(f"✅ Features for {digest} loaded from the cache ({len(df)} rows)")
+    return df
+
+
+def store_features(digest, df, cache_dir=FEATURE_CACHE_DIR, max_bytes=FEATURE_CACHE_MAX_BYTES):
+    """
+    Cache the output of build_features for digest as zstd Parquet, then evict least recently used entries
+    until the cache fits in max_bytes. Failures are reported, never raised: the cache is only an accelerator.
+    """
+    if not max_bytes:
+        return
+    tmp_path = None
+    try:
+        masks = rule_masks(df).add_prefix(MASK_PREFIX)
+        frame = pd.concat([df.drop(columns=['rule_anomalies']), masks], axis=1)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        os.close(fd)
+        path = cache_path(digest, cache_dir)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({**table.schema.metadata, COLUMNS_KEY: json.dumps(list(df.columns))})
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+        evict(cache_dir, max_bytes)
+    except Exception as e:
+        print(f"Feature cache write failed for {digest}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def evict(cache_dir=FEATURE_CACHE_DIR, max_bytes=FEATURE_CACHE_MAX_BYTES):
+    """ Delete the least recently used entries until the cache fits in max_bytes; returns the bytes freed """
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, "*.parquet")):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    for _, size, path in sorted(entries):
+        if total - freed <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        freed += size
+    return freed
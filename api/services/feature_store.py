@@ -0,0 +1,266 @@
+import math
+import sqlite3
+from collections import deque
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from config.constatns import FEATURE_STORE_PATH
+from services.features import FEATURES_BEHAVIOR
+from utils.state_utils import locked_state, ensure_parent_dir
+
+KEY_COLUMNS = {'account_id': 'account', 'device_id': 'device', 'customer_id': 'customer'}
+WINDOWS = {'1h': 3600, '24h': 24 * 3600, '7d': 7 * 24 * 3600}
+AGGREGATES = ['count', 'amount_sum', 'distinct_geo', 'fail_ratio', 'retry_sum']
+
+# Geo cells are 0.1 degree squares (~11 km at the equator)
+GEO_CELL_DEGREES = 0.1
+
+# The behavioral columns the store emits, named <key>_<aggregate>_<window> (e.g. device_count_24h): only those
+# the models use, so only their windows are kept
+BEHAVIOR_COLUMNS = list(FEATURES_BEHAVIOR)
+
+# A stored event: (timestamp, amount, failed, retries, geo cell)
+EVENT_DTYPE = np.dtype([('ts', '<i8'), ('amount', '<f8'), ('failed', '?'), ('retries', '<i8'), ('cell', '<i8')])
+
+# Keys looked up per SQLite statement (below the default host-parameter limit)
+LOOKUP_CHUNK = 900
+
+
+def _column_spec(column):
+    prefix, rest = column.split('_', 1)
+    agg, window = rest.rsplit('_', 1)
+    return prefix, agg, window
+
+
+# Per key type with emitted columns, the windows kept (shortest first) and, per column, (position, window index,
+# aggregate index)
+KEY_WINDOWS = {prefix: sorted({window for p, _, window in map(_column_spec, BEHAVIOR_COLUMNS) if p == prefix},
+                              key=WINDOWS.get)
+               for prefix in KEY_COLUMNS.values() if any(_column_spec(c)[0] == prefix for c in BEHAVIOR_COLUMNS)}
+KEY_OUTPUTS = {prefix: [(i, windows.index(window), AGGREGATES.index(agg))
+                        for i, (p, agg, window) in enumerate(map(_column_spec, BEHAVIOR_COLUMNS)) if p == prefix]
+               for prefix, windows in KEY_WINDOWS.items()}
+
+
+class _Window:
+    """ Running aggregates over the events of one key that fall inside one time span """
+    __slots__ = ('span', 'events', 'amount_sum', 'fails', 'retry_sum', 'geo_counts')
+
+    def __init__(self, span):
+        self.span = span
+        self.events = deque()
+        self.amount_sum = 0.0
+        self.fails = 0
+        self.retry_sum = 0
+        self.geo_counts = {}
+
+    def add(self, event):
+        ts, amount, failed, retries, cell = event
+        # Every event is appended and evicted once, so the cost is O(1) amortized per transaction
+        self.events.append(event)
+        self.amount_sum += amount
+        self.fails += failed
+        self.retry_sum += retries
+        self.geo_counts[cell] = self.geo_counts.get(cell, 0) + 1
+
+        while self.events and self.events[0][0] <= ts - self.span:
+            _, old_amount, old_failed, old_retries, old_cell = self.events.popleft()
+            self.amount_sum -= old_amount
+            self.fails -= old_failed
+            self.retry_sum -= old_retries
+            remaining = self.geo_counts[old_cell] - 1
+            if remaining:
+                self.geo_counts[old_cell] = remaining
+            else:
+                del self.geo_counts[old_cell]
+
+    def copy(self):
+        window = _Window(self.span)
+        window.events = deque(self.events)
+        window.amount_sum, window.fails, window.retry_sum = self.amount_sum, self.fails, self.retry_sum
+        window.geo_counts = dict(self.geo_counts)
+        return window
+
+    def values(self):
+        count = len(self.events)
+        return (count, self.amount_sum, len(self.geo_counts), self.fails / count if count else 0.0, self.retry_sum)
+
+
+class FeatureStore:
+    """
+    Windowed behavioral aggregates keyed by account, device and customer, kept across files.
+
+    Windows are in event time (timestamp_initiated). Within a batch, rows are applied in timestamp order
+    and every row sees the aggregates including itself. Events older than a key's newest event
+    (late files) are counted as if they arrived now.
+
+    With a path, keys live in a SQLite table (one row per key) and only the keys a batch touches are read
+    (on first use) and written back by save(), so a batch costs the same however many keys are stored.
+    Without one the store is in memory only.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.keys = {prefix: {} for prefix in KEY_WINDOWS}
+        self.touched = {prefix: set() for prefix in KEY_WINDOWS}
+        self.watermark = -math.inf
+        if path:
+            with closing(_connect(path)) as conn:
+                row = conn.execute("SELECT value FROM meta WHERE name = 'watermark'").fetchone()
+            if row:
+                self.watermark = row[0]
+
+    def _windows_for(self, prefix, key):
+        windows = self.keys[prefix].get(key)
+        if windows is None:
+            windows = [_Window(WINDOWS[window]) for window in KEY_WINDOWS[prefix]]
+            self.keys[prefix][key] = windows
+        return windows
+
+    def _load(self, key_values):
+        """ Read the stored windows of the batch's keys that are not in memory yet """
+        with closing(_connect(self.path)) as conn:
+            for prefix, values in key_values.items():
+                missing = [key for key in pd.unique(values) if key not in self.keys[prefix]]
+                for start in range(0, len(missing), LOOKUP_CHUNK):
+                    chunk = missing[start:start + LOOKUP_CHUNK]
+                    rows = conn.execute(f"SELECT key, state FROM windows WHERE prefix = ? AND key IN "
+                                        f"({','.join('?' * len(chunk))})", [prefix] + chunk)
+                    for key, state in rows:
+                        self.keys[prefix][key] = _restore(prefix, state)
+
+    def update_and_join(self, df):
+        """ Apply every row of the batch and return the behavioral columns aligned to df.index """
+        ts = pd.to_datetime(df['timestamp_initiated']).astype('int64').to_numpy() // 10 ** 9
+        valid_ts = df['timestamp_initiated'].notna().to_numpy()
+        amount = df['amount'].fillna(0).astype(float).to_numpy()
+        failed = (df['transaction_status'] != 'SUCCESS').to_numpy()
+        retries = df['retry_count'].fillna(0).astype(int).to_numpy()
+        cells = _geo_cells(df['geo_location'])
+        key_values = {prefix: df[col].astype(str).to_numpy() for col, prefix in KEY_COLUMNS.items()
+                      if prefix in KEY_WINDOWS}
+        if self.path:
+            self._load(key_values)
+
+        out = np.zeros((len(df), len(BEHAVIOR_COLUMNS)))
+        for i in np.argsort(ts, kind='stable'):
+            if not valid_ts[i]:
+                continue
+            event = (int(ts[i]), amount[i], bool(failed[i]), int(retries[i]), cells[i])
+            self.watermark = max(self.watermark, event[0])
+            for prefix, outputs in KEY_OUTPUTS.items():
+                key = key_values[prefix][i]
+                windows = self._windows_for(prefix, key)
+                self.touched[prefix].add(key)
+                values = []
+                for window in windows:
+                    window.add(event)
+                    values.append(window.values())
+                for column, w, agg in outputs:
+                    out[i, column] = values[w][agg]
+
+        return pd.DataFrame(out, index=df.index, columns=BEHAVIOR_COLUMNS)
+
+    def checkpoint(self, df):
+        """
+        Copies of the in-memory windows of the batch's keys, for rollback() if the batch fails. Keys not in memory
+        are recorded as None and dropped on rollback (a persisted one is read again on next use).
+        """
+        keys = {}
+        for col, prefix in KEY_COLUMNS.items():
+            if prefix in KEY_WINDOWS:
+                stored = self.keys[prefix]
+                keys[prefix] = {key: [window.copy() for window in stored[key]] if key in stored else None
+                                for key in pd.unique(df[col].astype(str))}
+        return self.watermark, keys
+
+    def rollback(self, checkpoint):
+        """ Put the windows of a checkpoint back, undoing every update_and_join since """
+        self.watermark, keys = checkpoint
+        for prefix, windows_by_key in keys.items():
+            for key, windows in windows_by_key.items():
+                if windows is None:
+                    self.keys[prefix].pop(key, None)
+                    self.touched[prefix].discard(key)
+                else:
+                    self.keys[prefix][key] = windows
+
+    def _horizons(self):
+        """ Per key type, the newest event time with nothing left inside the key type's longest window """
+        return {prefix: self.watermark - WINDOWS[windows[-1]] for prefix, windows in KEY_WINDOWS.items()}
+
+    def prune(self):
+        """ Drop in-memory keys with no event inside their longest window, so memory stays bounded by active keys """
+        for prefix, horizon in self._horizons().items():
+            keys = self.keys[prefix]
+            stale = [key for key, windows in keys.items() if not windows[-1].events
+                     or windows[-1].events[-1][0] <= horizon]
+            for key in stale:
+                del keys[key]
+            # Stored copies of stale keys are deleted by save() anyway
+            self.touched[prefix].difference_update(stale)
+
+    def save(self):
+        """
+        Write back the keys touched since the last save and the watermark in one transaction, and delete
+        stored keys with no event inside their longest window
+        """
+        rows = [(prefix, key, events[-1][0], np.array(events, dtype=EVENT_DTYPE).tobytes())
+                for prefix, keys in self.touched.items() for key in keys
+                for events in [list(self.keys[prefix][key][-1].events)]]
+        with closing(_connect(self.path)) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO windows (prefix, key, last_ts, state) VALUES (?, ?, ?, ?)",
+                             rows)
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('watermark', ?)", (self.watermark,))
+            conn.executemany("DELETE FROM windows WHERE prefix = ? AND last_ts <= ?", self._horizons().items())
+        self.touched = {prefix: set() for prefix in KEY_WINDOWS}
+
+
+def _restore(prefix, state):
+    """
+    Rebuild a key's windows from the stored events of its longest window: every shorter window holds a suffix
+    of them, so adding them in order evicts exactly what the live windows had evicted
+    """
+    windows = [_Window(WINDOWS[window]) for window in KEY_WINDOWS[prefix]]
+    for event in np.frombuffer(state, dtype=EVENT_DTYPE).tolist():
+        for window in windows:
+            window.add(event)
+    return windows
+
+
+def _connect(path):
+    ensure_parent_dir(path)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS windows (prefix TEXT NOT NULL, key TEXT NOT NULL, "
+                 "last_ts INTEGER NOT NULL, state BLOB NOT NULL, PRIMARY KEY (prefix, key)) WITHOUT ROWID")
+    conn.execute("CREATE INDEX IF NOT EXISTS windows_last_ts ON windows (prefix, last_ts)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL)")
+    return conn
+
+
+def _geo_cells(geo_location):
+    """ One integer per 0.1 degree cell (only told apart, never decoded) """
+    parts = geo_location.astype(str).str.split(',', n=1, expand=True).reindex(columns=[0, 1])
+    lat = pd.to_numeric(parts[0], errors='coerce')
+    lon = pd.to_numeric(parts[1], errors='coerce')
+    lat_cell = np.floor(lat / GEO_CELL_DEGREES).fillna(-9999).astype(int)
+    lon_cell = np.floor(lon / GEO_CELL_DEGREES).fillna(-9999).astype(int)
+    return (lat_cell * 100000 + lon_cell).tolist()
+
+
+def apply_feature_store(df, path=FEATURE_STORE_PATH):
+    """ Fold a featurized batch into the persisted store and join the behavioral columns onto it """
+    with locked_state(path):
+        store = FeatureStore(path)
+        behavior = store.update_and_join(df)
+        store.save()
+    return join_behavior(df, behavior)
+
+
+def join_behavior(df, behavior):
+    """ Attach (or replace) the behavioral columns in one concat rather than a column insert per feature """
+    return pd.concat([df.drop(columns=BEHAVIOR_COLUMNS, errors='ignore'), behavior], axis=1)
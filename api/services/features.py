@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from geopy.distance import geodesic
+
+from services.fingerprint_index import transaction_fingerprint
+from services.ip_ranges import classify_ips
+
+REFERENCE_GEO = (12.9716, 77.5946)
+
+# Bump whenever preprocess, rule_masks or build_features change what they compute: cached feature frames
+# (services/feature_cache.py) are keyed by it
+FEATURE_VERSION = 1
+
+# Velocity features joined from the keyed feature store (services/feature_store.py)
+FEATURES_BEHAVIOR = [
+    'account_count_1h', 'account_count_24h', 'account_amount_sum_24h',
+    'device_count_24h', 'device_distinct_geo_24h', 'device_fail_ratio_24h', 'device_retry_sum_24h',
+    'customer_count_7d', 'customer_distinct_geo_7d'
+]
+
+FEATURES_UNSUP = ['amount', 'duration_sec', 'hour', 'day_of_week', 'months_to_expiry',
+                  'geo_distance_km'] + FEATURES_BEHAVIOR
+FEATURES_SUP = FEATURES_UNSUP + [
+    'retry_count', 'has_high_amount', 'has_long_duration', 'has_odd_hour',
+    'has_expiring_card', 'has_geo_far', 'has_status_fail', 'has_datacenter_ip', 'has_duplicate'
+]
+
+
+def preprocess(df):
+    df['timestamp_initiated'] = pd.to_datetime(df['timestamp_initiated'])
+    df['timestamp_completed'] = pd.to_datetime(df['timestamp_completed'])
+    df['duration_sec'] = (df['timestamp_completed'] - df['timestamp_initiated']).dt.total_seconds()
+    df['hour'] = df['timestamp_initiated'].dt.hour
+    df['day_of_week'] = df['timestamp_initiated'].dt.dayofweek
+    expiry = pd.to_datetime(df['card_expire_date'], format='%m/%Y')
+    now = pd.Timestamp.now()
+    df['months_to_expiry'] = (expiry.dt.year - now.year) * 12 + (expiry.dt.month - now.month)
+    df['geo_distance_km'] = df['geo_location'].apply(
+        lambda loc: geodesic(REFERENCE_GEO, tuple(map(float, loc.split(',')))).km
+    )
+    # ip_version, ip_parse_error, ip_is_private, ip_country, ip_asn, ip_datacenter
+    ip = classify_ips(df['ip_address'])
+    df[ip.columns] = ip
+    return df
+
+
+def rule_masks(df):
+    """ Vectorized rule engine: one boolean column per rule, in reporting order """
+    return pd.DataFrame({
+        "HIGH_AMOUNT": df['amount'] > 5000,
+        "LONG_DURATION": df['duration_sec'] > 300,
+        "ODD_HOUR": df['hour'].isin(range(0, 5)),
+        "CARD_EXPIRY_SOON": df['months_to_expiry'] < 1,
+        "GEO_TOO_FAR": df['geo_distance_km'] > 1000,
+        "PRIVATE_IP": df['ip_is_private'],
+        "IP_PARSE_ERROR": df['ip_parse_error'],
+        "DATACENTER_IP": df['ip_datacenter'] != '',
+        "STATUS_NOT_SUCCESS": df['transaction_status'] != "SUCCESS",
+    }, index=df.index)
+
+
+def rule_lists(masks):
+    """ Per-row list of triggered rule names, the rule_anomalies column format """
+    names = np.array(masks.columns)
+    return [list(names[row]) for row in masks.to_numpy()]
+
+
+def build_features(df):
+    """ Row-local feature and rule stage; safe to run on independent shards """
+    df = preprocess(df)
+    masks = rule_masks(df)
+    df['rule_anomalies'] = rule_lists(masks)
+
+    df['has_high_amount'] = masks['HIGH_AMOUNT']
+    df['has_long_duration'] = masks['LONG_DURATION']
+    df['has_odd_hour'] = masks['ODD_HOUR']
+    df['has_expiring_card'] = masks['CARD_EXPIRY_SOON']
+    df['has_geo_far'] = masks['GEO_TOO_FAR']
+    df['has_status_fail'] = masks['STATUS_NOT_SUCCESS']
+    df['has_datacenter_ip'] = masks['DATACENTER_IP']
+    df['fingerprint'] = transaction_fingerprint(df)
+    return df
+
+
+def add_supervised_label(df):
+    """ Rule-derived training label; set once the stateful stages have added their rules too """
+    df['is_anomaly_suspected_supervised'] = df['rule_anomalies'].apply(lambda x: len(x) >= 3)
+    return df
@@ -0,0 +1,256 @@
+import glob
+import math
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from config.constatns import FINGERPRINT_INDEX_DIR, FINGERPRINT_BLOOM_CAPACITY
+from utils.state_utils import locked_state, load_state, save_state
+
+# Business fields that identify a payment; transaction_id is deliberately left out
+FINGERPRINT_FIELDS = ['account_id', 'merchant_name', 'amount', 'currency',
+                      'timestamp_initiated', 'timestamp_completed', 'device_id']
+
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+# Segments are merged into one once there are more than this many
+MAX_SEGMENTS = 8
+# Rows read from each segment per merge step, so compaction holds at most MAX_SEGMENTS x this many pairs
+MERGE_CHUNK_ROWS = 1 << 20
+
+
+def transaction_fingerprint(df):
+    """ Vectorized 64-bit hash of the business fields (timestamps parsed, amounts rounded to cents) """
+    fields = df[FINGERPRINT_FIELDS].copy()
+    fields['amount'] = pd.to_numeric(fields['amount'], errors='coerce').round(2)
+    for col in ['timestamp_initiated', 'timestamp_completed']:
+        fields[col] = pd.to_datetime(fields[col], errors='coerce')
+    return pd.util.hash_pandas_object(fields, index=False).to_numpy()
+
+
+def transaction_id_hash(transaction_ids):
+    return pd.util.hash_pandas_object(transaction_ids.astype(str), index=False).to_numpy()
+
+
+class BloomFilter:
+    """ Bit-array Bloom filter over uint64 fingerprints, k positions by double hashing """
+
+    def __init__(self, capacity, error_rate=BLOOM_FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        self.n_bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, fingerprints):
+        h1 = fingerprints & np.uint64(0xFFFFFFFF)
+        h2 = (fingerprints >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(self.n_hashes, dtype=np.uint64)
+        return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(self.n_bits)
+
+    def add(self, fingerprints):
+        pos = self._positions(fingerprints).ravel()
+        np.bitwise_or.at(self.bits, pos >> np.uint64(3), np.left_shift(1, pos & np.uint64(7)).astype(np.uint8))
+        self.count += len(fingerprints)
+
+    def might_contain(self, fingerprints):
+        pos = self._positions(fingerprints)
+        return ((self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+
+def _lock_path(index_dir):
+    return os.path.join(index_dir, "index")
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+class FingerprintIndex:
+    """
+    Persistent index of (fingerprint, transaction id hash) pairs seen in earlier files.
+
+    Pairs live in sorted .npy segments on disk that are memory-mapped and binary searched, so only
+    the Bloom filter is held in memory. Most fingerprints are new and are rejected by the filter
+    without touching the segments.
+
+    The segments are mapped when the index is opened. A mapping stays readable after a compaction deletes
+    its file, so an index opened under the lock (snapshot) is a consistent view of filter and segments.
+    """
+
+    def __init__(self, index_dir=FINGERPRINT_INDEX_DIR, capacity=FINGERPRINT_BLOOM_CAPACITY):
+        self.index_dir = index_dir
+        self.bloom_path = os.path.join(index_dir, "bloom.joblib")
+        self.bloom = load_state(self.bloom_path, lambda: BloomFilter(capacity))
+        self.segments = [np.load(path, mmap_mode='r') for path in self._segment_paths()]
+        self.version = _mtime(self.bloom_path)
+
+    @classmethod
+    def snapshot(cls, index_dir=FINGERPRINT_INDEX_DIR, capacity=FINGERPRINT_BLOOM_CAPACITY):
+        """ Open the index under its lock, so a concurrent add or compaction cannot change it mid-load """
+        with locked_state(_lock_path(index_dir)):
+            return cls(index_dir, capacity)
+
+    def is_stale(self):
+        """ True once the persisted index changed (new segment or compaction) after this one was opened """
+        return _mtime(self.bloom_path) != self.version
+
+    def _segment_paths(self):
+        return sorted(glob.glob(os.path.join(self.index_dir, "segment_*.npy")))
+
+    def find_previous(self, fingerprints, id_hashes):
+        """
+        True where the fingerprint was stored before under a different transaction id.
+        Rows whose own (fingerprint, id) pair is already stored are replays of an earlier file, not duplicates.
+        All Bloom candidates are binary searched at once in every segment; only the stored pairs under a
+        candidate's fingerprint are then compared by id.
+        """
+        other_id = np.zeros(len(fingerprints), dtype=bool)
+        candidates = np.flatnonzero(self.bloom.might_contain(fingerprints)) if len(fingerprints) else []
+        if len(candidates) == 0:
+            return other_id
+        keys, ids = fingerprints[candidates], id_hashes[candidates]
+        stored = np.zeros(len(candidates), dtype=np.int64)
+        same = np.zeros(len(candidates), dtype=np.int64)
+        for segment in self.segments:
+            lo = np.searchsorted(segment[:, 0], keys, side='left')
+            counts = np.searchsorted(segment[:, 0], keys, side='right') - lo
+            hits = np.flatnonzero(counts)
+            if not len(hits):
+                continue
+            # One entry per stored pair under a hit: its candidate and its row in the segment
+            owner = np.repeat(hits, counts[hits])
+            starts = np.repeat(lo[hits] - (np.cumsum(counts[hits]) - counts[hits]), counts[hits])
+            rows = starts + np.arange(len(owner))
+            stored += counts
+            same += np.bincount(owner, weights=segment[rows, 1] == ids[owner], minlength=len(candidates)).astype(
+                np.int64)
+        other_id[candidates] = (stored > same) & (same == 0)
+        return other_id
+
+    def add(self, fingerprints, id_hashes):
+        pairs = np.unique(np.column_stack([fingerprints, id_hashes]).astype(np.uint64), axis=0)
+        if len(pairs) == 0:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        paths = self._segment_paths()
+        next_id = int(os.path.basename(paths[-1])[8:-4]) + 1 if paths else 1
+        path = os.path.join(self.index_dir, f"segment_{next_id:06d}.npy")
+        # Column-major, so the fingerprint column is contiguous in the mapping and searched without a copy
+        np.save(path, np.asfortranarray(pairs))
+        self.segments.append(np.load(path, mmap_mode='r'))
+        self.bloom.add(pairs[:, 0])
+
+        if len(paths) + 1 > MAX_SEGMENTS or self.bloom.count > self.bloom.capacity:
+            self._compact(next_id + 1)
+        save_state(self.bloom, self.bloom_path)
+        self.version = _mtime(self.bloom_path)
+
+    def _compact(self, next_id):
+        """
+        Merge all segments into one, streamed (see _merge_sorted) so memory stays bounded by MERGE_CHUNK_ROWS
+        per segment whatever the index size. If the filter is over capacity it is rebuilt twice as large
+        from the same stream.
+        """
+        paths = self._segment_paths()
+        segments = [np.load(path, mmap_mode='r') for path in paths]
+        bloom = None
+        if self.bloom.count > self.bloom.capacity:
+            bloom = BloomFilter(max(self.bloom.capacity * 2, sum(len(segment) for segment in segments) * 2))
+
+        merged_path = os.path.join(self.index_dir, f"segment_{next_id:06d}.npy")
+        column_paths = [f"{merged_path}.fingerprints", f"{merged_path}.ids"]
+        n_rows = 0
+        with open(column_paths[0], "wb") as fingerprint_sink, open(column_paths[1], "wb") as id_sink:
+            for block_fingerprints, block_ids in _merge_sorted(segments):
+                fingerprint_sink.write(block_fingerprints.tobytes())
+                id_sink.write(block_ids.tobytes())
+                n_rows += len(block_fingerprints)
+                if bloom is not None:
+                    bloom.add(block_fingerprints)
+        _write_columns_npy(column_paths, merged_path, n_rows)
+        # Snapshots keep their mappings of the removed files
+        for path in paths:
+            os.remove(path)
+        self.segments = [np.load(merged_path, mmap_mode='r')]
+        if bloom is not None:
+            self.bloom = bloom
+        print(f"✅ Fingerprint index compacted to {n_rows} entries")
+
+
+def _merge_sorted(segments, chunk_rows=MERGE_CHUNK_ROWS):
+    """
+    k-way merge of segments sorted by (fingerprint, id) into sorted, de-duplicated (fingerprints, ids) blocks,
+    reading chunk_rows of each segment per step. Rows up to the smallest last pair of the current chunks are
+    final (every unread row of a segment is larger than its chunk's last pair), so they are sorted and
+    emitted; the segment that set that bound advances a whole chunk.
+    """
+    cursors = [0] * len(segments)
+    while True:
+        chunks = [(i, segment[cursor:cursor + chunk_rows])
+                  for i, (segment, cursor) in enumerate(zip(segments, cursors)) if cursor < len(segment)]
+        if not chunks:
+            return
+        bound_fingerprint, bound_id = min((int(chunk[-1, 0]), int(chunk[-1, 1])) for _, chunk in chunks)
+        fingerprint_parts, id_parts = [], []
+        for i, chunk in chunks:
+            chunk_fingerprints, chunk_ids = np.asarray(chunk[:, 0]), np.asarray(chunk[:, 1])
+            lo = np.searchsorted(chunk_fingerprints, np.uint64(bound_fingerprint), side='left')
+            hi = np.searchsorted(chunk_fingerprints, np.uint64(bound_fingerprint), side='right')
+            n = int(lo + np.searchsorted(chunk_ids[lo:hi], np.uint64(bound_id), side='right'))
+            fingerprint_parts.append(chunk_fingerprints[:n])
+            id_parts.append(chunk_ids[:n])
+            cursors[i] += n
+        block_fingerprints, block_ids = np.concatenate(fingerprint_parts), np.concatenate(id_parts)
+        order = np.lexsort((block_ids, block_fingerprints))
+        block_fingerprints, block_ids = block_fingerprints[order], block_ids[order]
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = (block_fingerprints[1:] != block_fingerprints[:-1]) | (block_ids[1:] != block_ids[:-1])
+        yield block_fingerprints[keep], block_ids[keep]
+
+
+def _write_columns_npy(column_paths, path, n_rows):
+    """
+    Write streamed fingerprint and id columns as one column-major (n_rows, 2) uint64 .npy, then move it into
+    place atomically
+    """
+    tmp_path = f"{path}.tmp"
+    header = {'descr': np.lib.format.dtype_to_descr(np.dtype(np.uint64)), 'fortran_order': True,
+              'shape': (n_rows, 2)}
+    with open(tmp_path, "wb") as sink:
+        np.lib.format.write_array_header_1_0(sink, header)
+        for column_path in column_paths:
+            with open(column_path, "rb") as source:
+                shutil.copyfileobj(source, sink, 1 << 20)
+            os.remove(column_path)
+    os.replace(tmp_path, path)
+
+
+def apply_fingerprint_index(df, index_dir=FINGERPRINT_INDEX_DIR):
+    """
+    Flag duplicate transactions: a later row in the same batch with the same fingerprint, or a row whose
+    fingerprint was seen in an earlier file under another transaction_id. Re-processing the same file
+    therefore does not flag every row. Adds has_duplicate and the DUPLICATE_TRANSACTION rule.
+    """
+    fingerprints = df['fingerprint'].to_numpy(dtype=np.uint64)
+    id_hashes = transaction_id_hash(df['transaction_id'])
+
+    with locked_state(_lock_path(index_dir)):
+        index = FingerprintIndex(index_dir)
+        previous = index.find_previous(fingerprints, id_hashes)
+        index.add(fingerprints, id_hashes)
+
+    df = flag_duplicates(df, previous)
+    print(f"🔍 {int(df['has_duplicate'].sum())} duplicate transactions flagged")
+    return df
+
+
+def flag_duplicates(df, previous):
+    """ Combine in-batch repeats with index hits into has_duplicate and the DUPLICATE_TRANSACTION rule """
+    df['has_duplicate'] = df['fingerprint'].duplicated(keep='first').to_numpy() | previous
+    df['rule_anomalies'] = [
+        anomalies + ["DUPLICATE_TRANSACTION"] if dup else anomalies
+        for anomalies, dup in zip(df['rule_anomalies'], df['has_duplicate'])
+    ]
+    return df
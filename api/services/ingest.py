@@ -0,0 +1,82 @@
+import pandas as pd
+
+from config.constatns import INGEST_DROP_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - pandas' C parser is used instead
+    pa = None
+
+# Declared schema of the transaction CSV (see services/csv_generation.py).
+# Low-cardinality fields are read as categoricals, timestamps are parsed while reading.
+STRING_COLUMNS = ['transaction_id', 'account_id', 'customer_id', 'merchant_name', 'failure_reason_code',
+                  'failure_description', 'device_id', 'ip_address', 'geo_location', 'created_by']
+CATEGORY_COLUMNS = ['store_name', 'card_type', 'card_expire_date', 'transaction_type', 'transaction_status',
+                    'currency']
+TIMESTAMP_COLUMNS = ['timestamp_initiated', 'timestamp_completed', 'created_at']
+FLOAT_COLUMNS = ['amount']
+INT_COLUMNS = ['retry_count']
+
+TRANSACTION_COLUMNS = STRING_COLUMNS + CATEGORY_COLUMNS + TIMESTAMP_COLUMNS + FLOAT_COLUMNS + INT_COLUMNS
+
+
+def _arrow_types():
+    types = {col: pa.string() for col in STRING_COLUMNS}
+    types.update({col: pa.dictionary(pa.int32(), pa.string()) for col in CATEGORY_COLUMNS})
+    types.update({col: pa.timestamp('us') for col in TIMESTAMP_COLUMNS})
+    types.update({col: pa.float64() for col in FLOAT_COLUMNS})
+    types.update({col: pa.int64() for col in INT_COLUMNS})
+    return types
+
+
+def _pandas_dtypes():
+    # Numeric columns are inferred, so a malformed value reaches validation (services/validation.py)
+    # instead of failing the whole read
+    dtypes = {col: 'object' for col in STRING_COLUMNS}
+    dtypes.update({col: 'category' for col in CATEGORY_COLUMNS})
+    return dtypes
+
+
+def read_transactions_csv(path, drop_columns=INGEST_DROP_COLUMNS):
+    """
+    Read a transaction CSV with the declared schema.
+    Uses pyarrow's multithreaded parser when available and falls back to pandas' C parser otherwise
+    (or when a value does not fit the schema, e.g. a malformed timestamp; such columns come back unparsed
+    for validate_transactions to quarantine). Columns not in the schema are kept with inferred types;
+    drop_columns are never loaded.
+    """
+    drop_columns = set(drop_columns or [])
+    if pa is not None:
+        try:
+            return _read_with_arrow(path, drop_columns)
+        except pa.ArrowInvalid as e:
+            print(f"Arrow ingest failed, falling back to pandas: {e}")
+    return _read_with_pandas(path, drop_columns)
+
+
+def _read_with_arrow(path, drop_columns):
+    header = pa_csv.open_csv(path).schema.names
+    convert_options = pa_csv.ConvertOptions(
+        column_types={col: t for col, t in _arrow_types().items() if col in header},
+        include_columns=[col for col in header if col not in drop_columns],
+        strings_can_be_null=True,
+    )
+    table = pa_csv.read_csv(path, read_options=pa_csv.ReadOptions(use_threads=True),
+                            convert_options=convert_options)
+    # Arrow-backed strings keep the UUID-heavy columns compact instead of one Python object per cell
+    df = table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+    for col in TIMESTAMP_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('datetime64[ns]')
+    return df
+
+
+def _read_with_pandas(path, drop_columns):
+    header = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(
+        path,
+        usecols=[col for col in header if col not in drop_columns],
+        dtype={col: t for col, t in _pandas_dtypes().items() if col in header},
+        parse_dates=[col for col in TIMESTAMP_COLUMNS if col in header],
+    )
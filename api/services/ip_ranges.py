@@ -0,0 +1,361 @@
+import ipaddress
+import os
+
+import numpy as np
+import pandas as pd
+
+from config.constatns import IP_RANGES_PATH
+
+# Every address is compared as a 16-byte big-endian key (numpy 'S16' sorts like the 128-bit integer).
+# IPv4 is mapped into ::ffff:0:0/96, so one sorted index covers both families.
+_V4_MAPPED = np.array([0] * 10 + [0xff, 0xff], dtype=np.uint8)
+
+# Longest textual address handled without ipaddress: 'ffff:' * 7 + 'ffff' (39) / '255.255.255.255' (15)
+_V6_TEXT_MAX = 39
+_V4_TEXT_MAX = 15
+# One column wider than the longest valid address (45, IPv6 with an embedded IPv4 tail) to spot longer strings
+_TEXT_WIDTH = 46
+# Distinct addresses parsed per block, bounding the character matrices to a few MB
+_PARSE_BLOCK = 1 << 16
+
+# IANA special-purpose ranges that are not globally reachable (the ipaddress is_private table, Python 3.13).
+# Exceptions are nested inside their parent range and win over it, as in the registry.
+PRIVATE_NETWORKS = [
+    '0.0.0.0/8', '10.0.0.0/8', '127.0.0.0/8', '169.254.0.0/16', '172.16.0.0/12', '192.0.0.0/24',
+    '192.0.2.0/24', '192.168.0.0/16', '198.18.0.0/15', '198.51.100.0/24', '203.0.113.0/24', '240.0.0.0/4',
+    '255.255.255.255/32',
+    '::1/128', '::/128', '64:ff9b:1::/48', '100::/64', '2001::/23', '2001:db8::/32', '2002::/16',
+    '3fff::/20', 'fc00::/7', 'fe80::/10',
+]
+PRIVATE_NETWORK_EXCEPTIONS = [
+    '192.0.0.9/32', '192.0.0.10/32',
+    '2001:1::1/128', '2001:1::2/128', '2001:3::/32', '2001:4:112::/48', '2001:20::/28', '2001:30::/28',
+]
+
+
+def _key(address_int, version):
+    if version == 4:
+        address_int |= 0xffff << 32
+    return address_int.to_bytes(16, 'big')
+
+
+def _network_bounds(network):
+    network = ipaddress.ip_network(network, strict=False)
+    return (int(network.network_address), int(network.broadcast_address), network.version)
+
+
+class IntervalIndex:
+    """
+    Disjoint address ranges sorted by start, each with a label; a lookup is one np.searchsorted over the starts.
+
+    Ranges may be nested (a /24 inside a /16, an exception inside a reserved block): they are flattened at
+    build time so the most specific range wins. Partially overlapping ranges are not supported.
+    """
+
+    def __init__(self, starts, ends, labels):
+        self.starts = np.array(starts, dtype='S16')
+        self.ends = np.array(ends, dtype='S16')
+        self.labels = np.array(labels)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        """ ranges: iterable of (first_int, last_int, version, label), inclusive """
+        # Sorted by start, widest first, so a range is always pushed after the ranges containing it
+        ranges = sorted(((_key(first, version), _key(last, version), label)
+                         for first, last, version, label in ranges), key=lambda r: (r[0], _negate(r[1])))
+        flat, stack, cursor = [], [], None
+
+        def emit(start, end, label):
+            if start <= end:
+                flat.append((start, end, label))
+
+        for start, end, label in ranges:
+            while stack and stack[-1][1] < start:
+                _, top_end, top_label = stack.pop()
+                emit(cursor, top_end, top_label)
+                cursor = _successor(top_end)
+            if stack:
+                emit(cursor, _predecessor(start), stack[-1][2])
+            stack.append((start, end, label))
+            cursor = start
+        while stack:
+            _, top_end, top_label = stack.pop()
+            emit(cursor, top_end, top_label)
+            cursor = _successor(top_end)
+
+        starts, ends, labels = zip(*flat) if flat else ((), (), ())
+        return cls(starts, ends, labels)
+
+    @classmethod
+    def from_networks(cls, networks, labels):
+        return cls.from_ranges((*_network_bounds(network), label) for network, label in zip(networks, labels))
+
+    def find(self, keys):
+        """ Position of the range containing each key, -1 where none does """
+        if not len(self):
+            return np.full(len(keys), -1)
+        pos = np.searchsorted(self.starts, keys, side='right') - 1
+        hit = (pos >= 0) & (keys <= self.ends[np.maximum(pos, 0)])
+        return np.where(hit, pos, -1)
+
+    def lookup(self, keys, default):
+        """ Label of the range containing each key, default where none does """
+        pos = self.find(keys)
+        if not len(self):
+            return np.full(len(keys), default)
+        return np.where(pos >= 0, self.labels[pos], default)
+
+
+def _negate(key):
+    return bytes(255 - b for b in key)
+
+
+def _successor(key):
+    value = int.from_bytes(key, 'big') + 1
+    return value.to_bytes(16, 'big') if value < 1 << 128 else key
+
+
+def _predecessor(key):
+    return (int.from_bytes(key, 'big') - 1).to_bytes(16, 'big')
+
+
+_PRIVATE_INDEX = IntervalIndex.from_ranges(
+    [(*_network_bounds(n), True) for n in PRIVATE_NETWORKS]
+    + [(*_network_bounds(n), False) for n in PRIVATE_NETWORK_EXCEPTIONS]
+)
+
+
+def parse_ips(values):
+    """
+    Parse addresses into 16-byte keys with numpy, once per distinct value.
+    Returns (keys, version): version is 4, 6 or 0 for unparseable values (whose key is all zeros).
+    IPv4-mapped IPv6 literals (::ffff:a.b.c.d) share the key of the IPv4 address they carry.
+    """
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    keys = np.zeros(len(uniques) + 1, dtype='S16')
+    version = np.zeros(len(uniques) + 1, dtype=np.int8)
+    for start in range(0, len(uniques), _PARSE_BLOCK):
+        block = np.asarray(uniques[start:start + _PARSE_BLOCK], dtype=object)
+        keys[start:start + len(block)], version[start:start + len(block)] = _parse_block(block)
+    # Missing values (code -1) land on the trailing invalid slot
+    codes = np.where(codes < 0, len(uniques), codes)
+    return keys[codes], version[codes]
+
+
+def _parse_block(strings):
+    text = np.array([s if isinstance(s, str) else '' for s in strings], dtype=f'U{_TEXT_WIDTH}')
+    chars = text.view(np.uint32).reshape(len(text), _TEXT_WIDTH)
+    # ipaddress only accepts ASCII digits, so anything else can go straight to the invalid bucket
+    ascii_ = (chars < 128).all(axis=1)
+    colon = (chars == ord(':')).any(axis=1)
+
+    key_bytes = np.zeros((len(text), 16), dtype=np.uint8)
+    version = np.zeros(len(text), dtype=np.int8)
+
+    v4_rows = np.flatnonzero(ascii_ & ~colon)
+    v4_ok, v4 = _parse_v4(chars[v4_rows, :_V4_TEXT_MAX + 1].astype(np.int32))
+    v4_rows = v4_rows[v4_ok]
+    key_bytes[v4_rows, :12] = _V4_MAPPED
+    key_bytes[v4_rows, 12:] = v4[v4_ok, None] >> np.array([24, 16, 8, 0]) & 0xff
+    version[v4_rows] = 4
+
+    v6_rows = np.flatnonzero(ascii_ & colon)
+    v6_ok, groups = _parse_v6(chars[v6_rows, :_V6_TEXT_MAX + 1].astype(np.int32))
+    v6_rows = v6_rows[v6_ok]
+    key_bytes[v6_rows] = groups[v6_ok].astype('>u2').view(np.uint8)
+    version[v6_rows] = 6
+
+    # Left to ipaddress: IPv6 with an embedded IPv4 tail or a zone id; anything else the fast paths
+    # reject is not a valid address either
+    dot_or_zone = ((chars == ord('.')) | (chars == ord('%'))).any(axis=1)
+    for i in np.flatnonzero((version == 0) & colon & dot_or_zone):
+        try:
+            address = ipaddress.ip_address(strings[i])
+        except ValueError:
+            continue
+        key_bytes[i] = np.frombuffer(address.packed, dtype=np.uint8)
+        version[i] = address.version
+
+    # IPv4-mapped IPv6 already carries the IPv4 key; version says how it was written
+    return key_bytes.view('S16').ravel(), version
+
+
+def _parse_v4(chars):
+    """
+    Dotted-quad parse over the character matrix, one column at a time (ipaddress rules: one to three
+    digits per octet, no leading zeros). The address is accumulated as each dot or the end is reached.
+    """
+    n = len(chars)
+    value = np.zeros(n, dtype=np.int64)
+    octet = np.zeros(n, dtype=np.int64)
+    digits = np.zeros(n, dtype=np.int64)
+    dots = np.zeros(n, dtype=np.int64)
+    ended = np.zeros(n, dtype=bool)
+    # The last column is one past the longest dotted quad: it must be the end of the string
+    ok = chars[:, _V4_TEXT_MAX] == 0
+    for j in range(_V4_TEXT_MAX + 1):
+        c = chars[:, j]
+        live = ~ended
+        is_digit = live & (c >= ord('0')) & (c <= ord('9'))
+        close = live & ((c == ord('.')) | (c == 0))
+        ok &= ~live | is_digit | close
+        ok &= ~(is_digit & (digits >= 1) & (octet == 0))
+        octet = np.where(is_digit, octet * 10 + c - ord('0'), octet)
+        digits += is_digit
+        ok &= ~(close & ((digits == 0) | (digits > 3) | (octet > 255)))
+        value = np.where(close, value * 256 + octet, value)
+        octet = np.where(close, 0, octet)
+        digits = np.where(close, 0, digits)
+        dots += live & (c == ord('.'))
+        ended |= live & (c == 0)
+    return ok & (dots == 3), value
+
+
+def _parse_v6(chars):
+    """
+    Colon-hex parse with at most one '::', one column at a time. Groups after the '::' are shifted
+    to the end of the address once the whole string has been read.
+    """
+    n = len(chars)
+    rows = np.arange(n)
+    groups = np.zeros((n, 8), dtype=np.int64)
+    k = np.zeros(n, dtype=np.int64)           # groups completed
+    digits = np.zeros(n, dtype=np.int64)      # hex digits in the current group
+    gap = np.full(n, -1, dtype=np.int64)      # groups completed before the '::'
+    prev_colon = np.zeros(n, dtype=bool)
+    prev_double = np.zeros(n, dtype=bool)
+    leading = np.zeros(n, dtype=bool)
+    ended = np.zeros(n, dtype=bool)
+    # The last column is one past the longest colon-hex form: it must be the end of the string
+    ok = chars[:, _V6_TEXT_MAX] == 0
+
+    for j in range(_V6_TEXT_MAX + 1):
+        c = chars[:, j]
+        nibble = np.select([(c >= ord('0')) & (c <= ord('9')), (c >= ord('a')) & (c <= ord('f')),
+                            (c >= ord('A')) & (c <= ord('F'))], [c - ord('0'), c - ord('a') + 10, c - ord('A') + 10], -1)
+        live = ~ended
+        hexdigit = live & (nibble >= 0)
+        colon = live & (c == ord(':'))
+        end = live & (c == 0)
+        ok &= ~live | hexdigit | colon | end
+
+        ok &= ~(hexdigit & ((digits == 4) | (k >= 8)))
+        slot = np.minimum(k, 7)
+        current = groups[rows, slot]
+        groups[rows, slot] = np.where(hexdigit, current * 16 + nibble, current)
+        digits += hexdigit
+
+        double = colon & prev_colon
+        ok &= ~(double & (gap >= 0))
+        gap = np.where(double, k, gap)
+        close = colon & ~prev_colon & (digits > 0)
+        k += close
+        digits = np.where(close, 0, digits)
+        if j == 0:
+            leading = colon
+        elif j == 1:
+            ok &= ~(leading & ~colon)
+
+        ok &= ~(end & prev_colon & ~prev_double)
+        k += end & (digits > 0)
+        ended |= end
+        prev_colon, prev_double = colon, double
+
+    ok &= np.where(gap >= 0, k <= 7, k == 8)
+    gap = np.where(gap >= 0, gap, 8)
+    shift = 8 - k
+    out = np.zeros_like(groups)
+    for j in range(8):
+        src = np.where(j < gap, j, j - shift)
+        keep = (j < gap) | (src >= gap)
+        out[:, j] = np.where(keep, groups[rows, np.clip(src, 0, 7)], 0)
+    return ok, out
+
+
+class IpRanges:
+    """
+    Local CIDR enrichment table: one interval index per attribute (country, asn, datacenter).
+
+    The CSV has a network column (CIDR) or start/end address columns, plus any of the attribute columns.
+    Rows may leave attributes empty, so country, ASN and datacenter lists can be concatenated into one file.
+    """
+    ATTRIBUTES = {'country': '', 'asn': 0, 'datacenter': ''}
+
+    def __init__(self, table=None):
+        self.indexes = {}
+        if table is None or table.empty:
+            return
+        if 'network' in table:
+            bounds = [_network_bounds(n) for n in table['network']]
+        else:
+            bounds = []
+            for first, last in zip(table['start'], table['end']):
+                first, last = ipaddress.ip_address(first), ipaddress.ip_address(last)
+                bounds.append((int(first), int(last), first.version))
+        for attribute, default in self.ATTRIBUTES.items():
+            if attribute not in table:
+                continue
+            values = table[attribute]
+            ranges = [(*b, type(default)(v)) for b, v in zip(bounds, values) if pd.notna(v) and v != '']
+            self.indexes[attribute] = IntervalIndex.from_ranges(ranges)
+
+    @classmethod
+    def load(cls, path=IP_RANGES_PATH):
+        if not path or not os.path.exists(path):
+            print(f"IP ranges table not found at {path}; country/ASN/datacenter enrichment disabled")
+            return cls()
+        table = pd.read_csv(path, dtype=str, keep_default_na=False)
+        ranges = cls(table)
+        print(f"✅ Loaded {len(table)} IP ranges from: {path}")
+        return ranges
+
+    def lookup(self, keys):
+        """ Attribute arrays for the keys; text attributes come back as categoricals, '' where no range matches """
+        result = {}
+        for attribute, default in self.ATTRIBUTES.items():
+            index = self.indexes.get(attribute, IntervalIndex((), (), ()))
+            if isinstance(default, str):
+                categories, label_codes = np.unique(index.labels.astype(str), return_inverse=True)
+                pos = index.find(keys)
+                codes = np.where(pos >= 0, np.append(label_codes, -1)[pos] + 1, 0)
+                result[attribute] = pd.Categorical.from_codes(codes, categories=[default, *categories.tolist()])
+            else:
+                result[attribute] = index.lookup(keys, default)
+        return result
+
+
+# Per-process cache: the table is loaded once per path, not once per batch
+_ip_ranges = {}
+
+
+def get_ip_ranges(path=IP_RANGES_PATH):
+    ranges = _ip_ranges.get(path)
+    if ranges is None:
+        ranges = IpRanges.load(path)
+        _ip_ranges[path] = ranges
+    return ranges
+
+
+def classify_ips(values, ranges=None):
+    """
+    Vectorized IP features: version, parse error, private/reserved, and the enrichment attributes.
+    Returns a DataFrame aligned with values (ip_version, ip_parse_error, ip_is_private, ip_country,
+    ip_asn, ip_datacenter).
+    """
+    ranges = get_ip_ranges() if ranges is None else ranges
+    keys, version = parse_ips(values)
+    valid = version > 0
+    # Invalid values have an all-zero key, which no enrichment range covers
+    enrichment = ranges.lookup(keys)
+    index = values.index if isinstance(values, pd.Series) else None
+    return pd.DataFrame({
+        'ip_version': version,
+        'ip_parse_error': ~valid,
+        'ip_is_private': valid & _PRIVATE_INDEX.lookup(keys, False).astype(bool),
+        'ip_country': enrichment['country'],
+        'ip_asn': enrichment['asn'].astype(np.int64),
+        'ip_datacenter': enrichment['datacenter'],
+    }, index=index)
@@ -0,0 +1,158 @@
+import numpy as np
+
+from config.constatns import ONLINE_MODEL_PATH
+from utils.state_utils import locked_state, load_state, save_state
+
+# Fixed feature ranges, so the same transaction maps to the same point in every file
+# (no per-file scaling). Values outside the range are clipped.
+FEATURE_BOUNDS = {
+    'amount': (0.0, 10000.0),
+    'duration_sec': (0.0, 600.0),
+    'hour': (0.0, 23.0),
+    'day_of_week': (0.0, 6.0),
+    'months_to_expiry': (-12.0, 72.0),
+    'geo_distance_km': (0.0, 20040.0),
+}
+
+
+class HalfSpaceTrees:
+    """
+    Streaming Half-Space Trees (Tan, Ting & Liu, 2011).
+
+    Trees are random and data-independent, so they are built once and only node masses change.
+    Masses are counted in tumbling windows: the latest window fills up while points are scored
+    against the previous (reference) window, then the two swap. Updating a batch costs
+    O(batch * trees * depth) and the state size is fixed, whatever the number of files seen.
+    """
+
+    def __init__(self, features=None, n_trees=25, depth=10, window_size=2000, size_limit=20,
+                 contamination=0.02, random_state=42):
+        self.features = list(features or FEATURE_BOUNDS)
+        self.n_trees = n_trees
+        self.depth = depth
+        self.window_size = window_size
+        self.size_limit = size_limit
+        self.contamination = contamination
+
+        self.lower = np.array([FEATURE_BOUNDS[f][0] for f in self.features])
+        self.upper = np.array([FEATURE_BOUNDS[f][1] for f in self.features])
+
+        n_nodes = 2 ** (depth + 1) - 1
+        self.split_dim, self.split_val = self._build(np.random.default_rng(random_state))
+        self.ref_mass = np.zeros((n_trees, n_nodes), dtype=np.int64)
+        self.latest_mass = np.zeros((n_trees, n_nodes), dtype=np.int64)
+        self.ref_total = 0
+        self.window_count = 0
+        self.window_scores = []
+        self.threshold = None
+        self.n_seen = 0
+
+    def _build(self, rng):
+        n_dims = len(self.features)
+        n_internal = 2 ** self.depth - 1
+        split_dim = np.empty((self.n_trees, n_internal), dtype=np.int64)
+        split_val = np.empty((self.n_trees, n_internal))
+        for t in range(self.n_trees):
+            s = rng.uniform(size=n_dims)
+            r = 2 * np.maximum(s, 1 - s)
+            mins = np.empty((2 * n_internal + 1, n_dims))
+            maxs = np.empty((2 * n_internal + 1, n_dims))
+            mins[0], maxs[0] = s - r, s + r
+            for i in range(n_internal):
+                q = rng.integers(n_dims)
+                mid = (mins[i, q] + maxs[i, q]) / 2
+                split_dim[t, i], split_val[t, i] = q, mid
+                left, right = 2 * i + 1, 2 * i + 2
+                mins[left], maxs[left] = mins[i], maxs[i]
+                mins[right], maxs[right] = mins[i], maxs[i]
+                maxs[left, q] = mid
+                mins[right, q] = mid
+        return split_dim, split_val
+
+    def _normalize(self, df):
+        X = df[self.features].fillna(0).to_numpy(dtype=float)
+        return np.clip((X - self.lower) / (self.upper - self.lower), 0.0, 1.0)
+
+    def _paths(self, X):
+        """ Node index visited at every level, shape (trees, depth + 1, rows) """
+        trees = np.arange(self.n_trees)[:, None]
+        rows = np.arange(len(X))[None, :]
+        node = np.zeros((self.n_trees, len(X)), dtype=np.int64)
+        paths = np.empty((self.n_trees, self.depth + 1, len(X)), dtype=np.int64)
+        paths[:, 0] = node
+        for level in range(self.depth):
+            x = X[rows, self.split_dim[trees, node]]
+            node = 2 * node + 1 + (x >= self.split_val[trees, node])
+            paths[:, level + 1] = node
+        return paths
+
+    def _score_paths(self, paths, mass, total):
+        """ Normalised mass score: ~1 for typical points, towards 0 for isolated ones """
+        node_mass = np.take_along_axis(mass, paths.reshape(self.n_trees, -1), axis=1).reshape(paths.shape)
+        below = node_mass < self.size_limit
+        stop = np.where(below.any(axis=1), below.argmax(axis=1), self.depth)
+        terminal = np.take_along_axis(node_mass, stop[:, None, :], axis=1)[:, 0, :]
+        raw = (terminal * (2.0 ** stop)).sum(axis=0)
+        return raw / (self.n_trees * max(total, 1))
+
+    def _add_mass(self, paths):
+        for t in range(self.n_trees):
+            self.latest_mass[t] += np.bincount(paths[t].ravel(), minlength=self.latest_mass.shape[1])
+
+    def _close_window(self):
+        self.ref_mass, self.latest_mass = self.latest_mass, np.zeros_like(self.latest_mass)
+        self.ref_total = self.window_count
+        self.threshold = float(np.quantile(np.concatenate(self.window_scores), self.contamination))
+        self.window_scores = []
+        self.window_count = 0
+
+    def score_and_update(self, df):
+        """
+        Score every row against the reference window, then absorb the rows into the latest window.
+        Until the first window has been filled the batch is scored against itself.
+        Returns the normalised mass score per row (higher = more normal).
+        """
+        X = self._normalize(df)
+        scores = np.empty(len(X))
+        pos = 0
+        while pos < len(X):
+            take = min(len(X) - pos, self.window_size - self.window_count)
+            paths = self._paths(X[pos:pos + take])
+            if self.ref_total == 0:
+                self._add_mass(paths)
+                chunk_scores = self._score_paths(paths, self.latest_mass, self.window_count + take)
+            else:
+                chunk_scores = self._score_paths(paths, self.ref_mass, self.ref_total)
+                self._add_mass(paths)
+            scores[pos:pos + take] = chunk_scores
+            self.window_scores.append(chunk_scores)
+            self.window_count += take
+            self.n_seen += take
+            pos += take
+            if self.window_count == self.window_size:
+                self._close_window()
+        return scores
+
+    def is_anomaly(self, scores):
+        threshold = self.threshold
+        if threshold is None:
+            threshold = np.quantile(scores, self.contamination) if len(scores) else 0.0
+        return np.where(scores <= threshold, -1, 1)
+
+
+def apply_online_detector(df, path=ONLINE_MODEL_PATH):
+    """
+    Score a featurized DataFrame with the persisted streaming model and fold the batch into it.
+    Adds online_score (1-100, higher = more normal, like iso_score) and online_anomaly (-1/1, like iso_anomaly).
+    The state file is locked for the whole load-update-save cycle so concurrent requests do not lose updates.
+    """
+    with locked_state(path):
+        model = load_state(path, HalfSpaceTrees)
+        scores = model.score_and_update(df)
+        df['online_anomaly'] = model.is_anomaly(scores)
+        # Fixed (not per-file) mapping to 1-100, so scores are comparable across files.
+        # A point alone in a leaf of every tree scores 2^depth, so log2 spans [0, depth].
+        df['online_score'] = 1 + 99 * np.clip(np.log2(1 + scores) / model.depth, 0.0, 1.0)
+        save_state(model, path)
+        print(f"✅ Online model updated with {len(df)} rows ({model.n_seen} seen in total)")
+    return df
@@ -0,0 +1,196 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from services.applied_inputs import load_applied, locked_inputs, record_applied, restore_applied
+from services.anomaly_models import (SCORE_COLUMNS, fit_models, load_models, score_features, iso_score_range,
+                                     rescale_iso_score, schema_mismatch)
+from services.drift_monitor import (build_sketches, merge_sketches, drift_report, load_reference, save_reference,
+                                    should_retrain, record_sketches)
+from services.feature_cache import store_features
+from services.feature_store import apply_feature_store
+from services.features import FEATURES_SUP, build_features, add_supervised_label
+from services.fingerprint_index import apply_fingerprint_index
+from services.online_detector import apply_online_detector
+
+# More shards than workers so a slow shard does not leave the rest of the pool idle
+SHARDS_PER_WORKER = 4
+
+# Per-process cache: each worker loads (memory-maps) the model artifact once, not once per shard
+_worker_models = {}
+
+
+def _load_models(artifact_path):
+    models = _worker_models.get(artifact_path)
+    if models is None:
+        models = joblib.load(artifact_path, mmap_mode='r')
+        _worker_models[artifact_path] = models
+    return models
+
+
+def _featurize_shard(shard):
+    return build_features(shard)
+
+
+def _score_shard(task):
+    artifact_path, shard = task
+    return score_features(shard, _load_models(artifact_path))
+
+
+def _apply_state(df):
+    df = apply_feature_store(df)
+    df = apply_fingerprint_index(df)
+    return apply_online_detector(df)
+
+
+def apply_stateful_stages(df, sources=None):
+    """
+    Stages that read and update state persisted across files (feature store, duplicate index, streaming
+    detector); order-dependent, so never sharded.
+
+    sources lists the input files the rows come from, in row order, as (content hash, rows). An input that
+    was already applied gets its recorded outputs back instead of being folded into the state again, so
+    replaying a file changes no state and scores it as the first run did; new inputs are recorded.
+    Returns (DataFrame, replayed rows).
+    """
+    sources = [(digest, rows) for digest, rows in (sources or [(None, len(df))])]
+    bounds = np.cumsum([0] + [rows for _, rows in sources])
+    with locked_inputs(digest for digest, _ in sources if digest):
+        parts, fresh = [], []
+        for (digest, _), start, end in zip(sources, bounds[:-1], bounds[1:]):
+            applied = load_applied(digest, end - start) if digest else None
+            if applied is None:
+                fresh.append((len(parts), digest, start, end))
+                parts.append(None)
+            else:
+                parts.append(restore_applied(df.iloc[start:end].copy(), applied))
+        replayed = int(sum(len(part) for part in parts if part is not None))
+        if fresh:
+            if len(fresh) == len(parts):
+                applied_df = _apply_state(df)
+            else:
+                applied_df = _apply_state(pd.concat([df.iloc[start:end] for _, _, start, end in fresh]))
+                print(f"✅ {replayed} rows are replays of applied inputs; their recorded state outputs are reused")
+            offset = 0
+            for i, digest, start, end in fresh:
+                parts[i] = applied_df if len(parts) == 1 else applied_df.iloc[offset:offset + end - start]
+                offset += end - start
+                if digest:
+                    record_applied(digest, parts[i])
+        else:
+            print(f"✅ Every input was applied before; state left unchanged for {replayed} replayed rows")
+    df = parts[0] if len(parts) == 1 else pd.concat(parts)
+    return add_supervised_label(df), replayed
+
+
+def split_frame(df, n_shards):
+    """ Split a DataFrame into at most n_shards contiguous, order-preserving slices """
+    bounds = np.linspace(0, len(df), max(n_shards, 1) + 1, dtype=int)
+    return [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+@contextmanager
+def scoring_pool(workers, n_rows):
+    """ Process pool for the sharded stages, or None when the batch is small enough to run in-process """
+    if workers <= 1 or n_rows < workers:
+        yield None
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield pool
+
+
+def featurize_and_score(df, workers=1, digest=None):
+    """
+    Run the feature/rule, stateful (feature store, duplicates, online detector), fit and scoring stages over a
+    raw transaction DataFrame.
+    With workers > 1 the feature/rule stage and the scoring stage are sharded across a process pool;
+    models are fitted once in the parent, dumped with joblib and memory-mapped by each worker.
+    Results are merged back in the original row order.
+    With digest (content_hash of the input file) the featurized frame is kept in the feature cache,
+    so a re-run can go straight to score_featurized, and a replay leaves the stateful stages unchanged.
+    Returns (scored DataFrame, models, drift report).
+    """
+    with scoring_pool(workers, len(df)) as pool:
+        if pool is None:
+            df = build_features(df)
+        else:
+            df = pd.concat(pool.map(_featurize_shard, split_frame(df, workers * SHARDS_PER_WORKER)))
+        if digest:
+            store_features(digest, df)
+        return fit_and_score(df, workers, pool, [(digest, len(df))])
+
+
+def score_featurized(df, workers=1, digest=None):
+    """ fit_and_score for a frame that is already featurized (from the feature cache), with its own pool """
+    with scoring_pool(workers, len(df)) as pool:
+        return fit_and_score(df, workers, pool, [(digest, len(df))])
+
+
+def _sketch(df, workers, pool):
+    if pool is None:
+        return build_sketches(df)
+    sketches = {}
+    for shard in pool.map(build_sketches, split_frame(df[FEATURES_SUP], workers * SHARDS_PER_WORKER)):
+        merge_sketches(sketches, shard)
+    return sketches
+
+
+def _fit_if_drifted(df, sketches, report):
+    """ Reuse the saved models unless the features drifted or the models were fitted on another feature set """
+    if not should_retrain(report):
+        try:
+            models = load_models()
+        except FileNotFoundError:
+            report["retrain_reason"] = "no saved models"
+        else:
+            report["retrain_reason"] = schema_mismatch(models)
+            if report["retrain_reason"] is None:
+                print(f"✅ No feature drift (max PSI {report['drift_score']:.3f}); reusing the current models")
+                return models, False
+            print(f"🔍 {report['retrain_reason'].capitalize()}; refitting")
+    elif report["drifted"]:
+        report["retrain_reason"] = f"feature drift in {', '.join(report['drifted'])}"
+        print(f"🔍 Feature drift (max PSI {report['drift_score']:.3f}) in {', '.join(report['drifted'])}; refitting")
+    else:
+        report["retrain_reason"] = "no drift reference" if not report["has_reference"] else "DRIFT_RETRAIN=always"
+    models = fit_models(df)
+    save_reference(sketches)
+    return models, True
+
+
+def fit_and_score(df, workers=1, pool=None, sources=None):
+    """
+    Stateful, drift check, fit and scoring stages over an already featurized DataFrame (see featurize_and_score).
+    Models are refitted only when the features drifted from the data the current models were fitted on
+    (services/drift_monitor.py). Scoring is sharded over pool when one is given. sources: see
+    apply_stateful_stages; a run made only of replays records no new sketches.
+    Returns (scored DataFrame, models, drift report).
+    """
+    df, replayed = apply_stateful_stages(df, sources)
+    sketches = _sketch(df, workers, pool)
+    report = drift_report(sketches, load_reference())
+    report["replayed_rows"] = replayed
+    models, report["retrained"] = _fit_if_drifted(df, sketches, report)
+    if replayed < len(df):
+        record_sketches(sketches, report, len(df))
+    if pool is None:
+        scores = score_features(df, models)
+    else:
+        n_shards = workers * SHARDS_PER_WORKER
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            artifact_path = os.path.join(tmp_dir, "models.joblib")
+            joblib.dump(models, artifact_path)
+            # Only the model inputs cross the process boundary, not the full row
+            tasks = [(artifact_path, shard) for shard in split_frame(df[FEATURES_SUP], n_shards)]
+            scores = pd.concat(pool.map(_score_shard, tasks))
+
+    for col in SCORE_COLUMNS:
+        df[col] = scores[col]
+    models['iso_score_range'] = iso_score_range(scores)
+    df = rescale_iso_score(df)
+    return df, models, report
@@ -0,0 +1,208 @@
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from config.constatns import PARTITION_LOCK_DIR
+from utils.state_utils import locked_state
+
+# Objects are written to <prefix>/dt=YYYY-MM-DD/hour=HH/<file name>; each partition keeps a _manifest.json with
+# one entry per object and per-kind totals, so a day or an hour is listed with one GET per partition instead of
+# a listing of the whole prefix
+PARTITION_FORMAT = "dt=%Y-%m-%d/hour=%H"
+MANIFEST_NAME = "_manifest.json"
+MANIFEST_VERSION = 1
+# A manifest update whose conditional PUT lost to another writer is re-read and retried up to this many times
+MANIFEST_MAX_ATTEMPTS = 8
+# S3 error codes of a conditional write that lost a race (the ETag moved on, or another conditional write was
+# in flight); the local object store raises the same
+_CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict")
+# Bump a kind's version whenever the columns of the objects of that kind change
+SCHEMA_VERSIONS = {"input": 1, "scored": 1, "advisory": 1, "quarantine": 1, "batch_summary": 1}
+
+# Output names end in the _<%Y-%m-%dT%H-%M-%S> timestamp they were written at, which is also their partition
+_NAME_TIMESTAMP = re.compile(r"(\d{4}-\d{2}-\d{2})T(\d{2})-\d{2}-\d{2}")
+_PARTITION = re.compile(r"^dt=\d{4}-\d{2}-\d{2}/hour=\d{2}$")
+
+
+def partition_at(when=None):
+    """ Partition of a datetime (now, UTC, by default) """
+    return (when or datetime.now(timezone.utc)).strftime(PARTITION_FORMAT)
+
+
+def partition_of(file_name):
+    """ Partition of an output name from its trailing timestamp, or None when it has none """
+    matches = _NAME_TIMESTAMP.findall(os.path.basename(file_name))
+    if not matches:
+        return None
+    day, hour = matches[-1]
+    return f"dt={day}/hour={hour}"
+
+
+def partition_for_day(day, hour=None):
+    """ Partitions of a YYYY-MM-DD day (every hour, or one); raises ValueError on a malformed day or hour """
+    datetime.strptime(day, "%Y-%m-%d")
+    hours = range(24) if hour is None else [int(hour)]
+    if any(not 0 <= h < 24 for h in hours):
+        raise ValueError(f"hour must be 0-23, got {hour}")
+    return [f"dt={day}/hour={h:02d}" for h in hours]
+
+
+def partitioned_key(prefix, file_name, partition=None):
+    """ <prefix>/<partition>/<file name>; the partition defaults to the name's timestamp, then to now """
+    partition = partition or partition_of(file_name) or partition_at()
+    return f"{prefix}/{partition}/{os.path.basename(file_name)}"
+
+
+def candidate_keys(prefix, file_name):
+    """ Keys an object addressed by its name alone may have: its partition (if the name has a timestamp), then flat """
+    flat = f"{prefix}/{file_name}"
+    return [partitioned_key(prefix, file_name), flat] if partition_of(file_name) else [flat]
+
+
+def _missing(error):
+    return error.response.get("Error", {}).get("Code") in ("NoSuchKey", "404")
+
+
+def get_object(s3, bucket, prefix, file_name):
+    """ s3.get_object of an object addressed by its name; objects written before partitioning are found flat """
+    keys = candidate_keys(prefix, file_name)
+    for key in keys[:-1]:
+        try:
+            return s3.get_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if not _missing(e):
+                raise
+    return s3.get_object(Bucket=bucket, Key=keys[-1])
+
+
+def manifest_key(prefix, partition):
+    return f"{prefix}/{partition}/{MANIFEST_NAME}"
+
+
+def schema_fingerprint(columns):
+    """ Short digest of a column list, to tell objects of the same schema version apart if one drifts """
+    return hashlib.blake2b(",".join(map(str, columns)).encode("utf-8"), digest_size=4).hexdigest()
+
+
+def read_manifest(s3, bucket, prefix, partition):
+    """ The partition's manifest, or None when nothing has been written to it """
+    return _read_manifest(s3, bucket, prefix, partition)[0]
+
+
+def _read_manifest(s3, bucket, prefix, partition):
+    """ (manifest, ETag), or (None, None) when nothing has been written to the partition """
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=manifest_key(prefix, partition))
+    except ClientError as e:
+        if _missing(e):
+            return None, None
+        raise
+    try:
+        return json.loads(obj["Body"].read()), obj["ETag"]
+    finally:
+        obj["Body"].close()
+
+
+def _totals(files):
+    totals = {}
+    for entry in files.values():
+        kind = totals.setdefault(entry["kind"], {"files": 0, "rows": 0, "bytes": 0, "anomalies": Counter()})
+        kind["files"] += 1
+        kind["rows"] += entry.get("rows") or 0
+        kind["bytes"] += entry.get("bytes") or 0
+        kind["anomalies"].update(entry.get("anomalies") or {})
+    return {kind: {**values, "anomalies": dict(values["anomalies"])} for kind, values in totals.items()}
+
+
+def record_object(s3, bucket, key, kind, rows=None, anomalies=None, size=None, columns=None):
+    """
+    Add (or replace) the entry of an already written object in its partition's manifest.
+
+    The manifest is replaced by a single conditional PUT: If-Match on the ETag it was read at (If-None-Match for
+    a new partition), so a writer on another host that updated it in between makes the PUT fail, and the update
+    is re-applied to a fresh read, with jittered backoff, up to MANIFEST_MAX_ATTEMPTS times. Readers see the
+    previous or the new manifest, never a partial one. A local per-partition lock also serializes the writers
+    of one host (gunicorn workers, batch threads), so they do not race each other into retries.
+    Returns the updated manifest.
+    """
+    parts = key.split("/")
+    prefix, partition, file_name = "/".join(parts[:-3]), "/".join(parts[-3:-1]), parts[-1]
+    if not prefix or not _PARTITION.match(partition):
+        raise ValueError(f"{key} is not a partitioned key")
+    entry = {
+        "key": key,
+        "kind": kind,
+        "rows": rows,
+        "anomalies": {name: int(count) for name, count in (anomalies or {}).items()},
+        "bytes": size,
+        "schema_version": SCHEMA_VERSIONS.get(kind, 1),
+        "written_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    if columns is not None:
+        entry["schema"] = schema_fingerprint(columns)
+
+    lock_name = hashlib.blake2b(f"{bucket}/{prefix}/{partition}".encode("utf-8"), digest_size=8).hexdigest()
+    with locked_state(os.path.join(PARTITION_LOCK_DIR, lock_name)):
+        for attempt in range(MANIFEST_MAX_ATTEMPTS):
+            manifest, etag = _read_manifest(s3, bucket, prefix, partition)
+            manifest = manifest or {"files": {}}
+            manifest["files"][file_name] = entry
+            manifest.update({
+                "manifest_version": MANIFEST_VERSION,
+                "prefix": prefix,
+                "partition": partition,
+                "updated_at": entry["written_at"],
+                "totals": _totals(manifest["files"]),
+            })
+            condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+            try:
+                s3.put_object(Bucket=bucket, Key=manifest_key(prefix, partition),
+                              Body=json.dumps(manifest, indent=2).encode("utf-8"), ContentType="application/json",
+                              **condition)
+                return manifest
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in _CONFLICT_CODES \
+                        or attempt == MANIFEST_MAX_ATTEMPTS - 1:
+                    raise
+            print(f"🔁 Manifest of {prefix}/{partition} changed while updating it; retrying")
+            time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+
+def upload_partitioned(s3, bucket, prefix, path, kind, file_name=None, partition=None, **entry):
+    """
+    Upload a local file to its partition, then record it in the manifest (the object before its entry, so the
+    manifest never lists a missing object). entry takes record_object's rows, anomalies and columns.
+    Returns the object key.
+    """
+    key = partitioned_key(prefix, file_name or os.path.basename(path), partition)
+    s3.upload_file(path, bucket, key)
+    record_object(s3, bucket, key, kind, size=os.path.getsize(path), **entry)
+    return key
+
+
+def put_partitioned(s3, bucket, prefix, file_name, body, kind, content_type="application/json", **entry):
+    """ put_object counterpart of upload_partitioned for in-memory bodies; returns the object key """
+    key = partitioned_key(prefix, file_name)
+    s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type)
+    record_object(s3, bucket, key, kind, size=len(body), **entry)
+    return key
+
+
+def csv_rows(path):
+    """ Data rows of a CSV file (quoted newlines included), for uploads nothing has parsed yet """
+    with open(path, newline="") as source:
+        return max(sum(1 for _ in csv.reader(source)) - 1, 0)
+
+
+def list_partitions(s3, bucket, prefix, day, hour=None):
+    """ Manifests of a day's (or one hour's) partitions that have any objects, oldest first """
+    manifests = (read_manifest(s3, bucket, prefix, partition) for partition in partition_for_day(day, hour))
+    return [manifest for manifest in manifests if manifest is not None]
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Queue, Empty
+
+import numpy as np
+import pandas as pd
+
+from config.constatns import (MODEL_PATH, FEATURE_STORE_PATH, FINGERPRINT_INDEX_DIR,
+                              SCORE_MAX_WAIT_MS, SCORE_MAX_BATCH_SIZE)
+from services.OpenAIAdvisor import analyze_transaction, analyze_transaction_async
+from services.anomaly_models import SCORE_COLUMNS, load_models, score_features, rescale_iso_score
+from services.feature_store import FeatureStore, join_behavior
+from services.features import build_features, add_supervised_label
+from services.fingerprint_index import FingerprintIndex, flag_duplicates, transaction_id_hash
+
+REQUIRED_FIELDS = [
+    'transaction_id', 'account_id', 'customer_id', 'merchant_name', 'card_type', 'card_expire_date',
+    'transaction_status', 'amount', 'currency', 'timestamp_initiated', 'timestamp_completed',
+    'retry_count', 'device_id', 'ip_address', 'geo_location'
+]
+
+RESPONSE_COLUMNS = ['transaction_id', 'rule_anomalies', 'has_duplicate', 'is_anomaly_suspected_supervised',
+                    'iso_anomaly', 'iso_score', 'is_anomaly_suspected_UnSupervised']
+
+ADVISORY_OUTPUT_COLS = ["open_ai_anomaly", "anomaly_type", "classification", "explanation", "suggested_action",
+                        "anomaly_score"]
+# Finished advisories kept in memory for polling; the oldest are dropped first
+MAX_ADVISORIES = 1000
+# Prune idle keys from the in-memory velocity store every this many batches
+PRUNE_EVERY_BATCHES = 1000
+
+
+class RealtimeScorer:
+    """
+    Scores small batches in-process with the models fitted by the last processed file.
+
+    The models are reloaded whenever a newly processed file replaces them, together with a fresh view of the
+    feature store, which reads persisted keys on first use. The fingerprint index is a snapshot of the persisted
+    state, reloaded whenever it changes. Live traffic keeps updating the velocity windows in memory only; the S3
+    pipeline stays the owner of the persisted state. A batch that fails after updating the windows rolls them
+    back, so MicroBatcher's one-by-one retry does not count its rows twice.
+    """
+
+    def __init__(self, model_path=MODEL_PATH):
+        self.model_path = model_path
+        self.loaded_mtime = None
+        self.batches = 0
+        self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        mtime = os.path.getmtime(self.model_path) if os.path.exists(self.model_path) else None
+        if mtime is not None and mtime == self.loaded_mtime:
+            # A batch may add or compact segments without refitting; filter and segments are reloaded together
+            if self.fingerprints.is_stale():
+                self.fingerprints = FingerprintIndex.snapshot(FINGERPRINT_INDEX_DIR)
+            return
+        self.models = load_models(self.model_path)
+        self.store = FeatureStore(FEATURE_STORE_PATH)
+        self.fingerprints = FingerprintIndex.snapshot(FINGERPRINT_INDEX_DIR)
+        self.loaded_mtime = mtime
+        print(f"✅ Real-time scorer loaded models from: {self.model_path}")
+
+    def score(self, df):
+        self._reload_if_changed()
+        # The JSON API takes ISO 8601 timestamps; an explicit format skips pandas' per-call format inference
+        for col in ['timestamp_initiated', 'timestamp_completed']:
+            df[col] = pd.to_datetime(df[col], format='ISO8601')
+        df = build_features(df)
+        checkpoint = self.store.checkpoint(df)
+        try:
+            df = join_behavior(df, self.store.update_and_join(df))
+            previous = self.fingerprints.find_previous(df['fingerprint'].to_numpy(dtype=np.uint64),
+                                                       transaction_id_hash(df['transaction_id']))
+            df = add_supervised_label(flag_duplicates(df, previous))
+
+            scores = score_features(df, self.models)
+            for col in SCORE_COLUMNS:
+                df[col] = scores[col]
+            df = rescale_iso_score(df, self.models['iso_score_range'])
+        except Exception:
+            self.store.rollback(checkpoint)
+            raise
+
+        self.batches += 1
+        if self.batches % PRUNE_EVERY_BATCHES == 0:
+            self.store.prune()
+        return df
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent submissions into one scoring call.
+
+    A single background thread owns the scorer: it takes the first waiting request, keeps collecting
+    until max_wait_ms has passed or max_batch_size rows are queued, scores them as one frame and hands
+    each caller back its own rows. Under no concurrency a request waits at most max_wait_ms extra.
+    """
+
+    def __init__(self, score_fn, max_wait_ms=SCORE_MAX_WAIT_MS, max_batch_size=SCORE_MAX_BATCH_SIZE):
+        self.score_fn = score_fn
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.queue = Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, records):
+        """ Block until the records are scored; returns their scored rows in submission order """
+        return self.enqueue(records).result()
+
+    def enqueue(self, records):
+        """ Queue the records and return the Future of their scored rows, for callers that must not block """
+        future = Future()
+        self.queue.put((records, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self.queue.get()]
+            size = len(pending[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._flush(pending)
+
+    def _flush(self, pending):
+        try:
+            scored = self.score_fn(pd.DataFrame([record for records, _ in pending for record in records]))
+        except Exception as e:
+            if len(pending) > 1:
+                # Retry one by one so a bad payload only fails its own request (the scorer has rolled back
+                # whatever the failed batch changed)
+                for item in pending:
+                    self._flush([item])
+            else:
+                pending[0][1].set_exception(e)
+            return
+
+        start = 0
+        for records, future in pending:
+            future.set_result(scored.iloc[start:start + len(records)])
+            start += len(records)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+_advisory_pool = ThreadPoolExecutor(max_workers=4)
+_advisory_tasks = set()
+_advisories = OrderedDict()
+
+
+def get_batcher():
+    """ Created lazily so the scorer thread starts inside the serving process (after a gunicorn fork) """
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(RealtimeScorer().score)
+        return _batcher
+
+
+def _check_fields(records):
+    missing = sorted({field for record in records for field in REQUIRED_FIELDS if field not in record})
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+
+def score_transactions(records):
+    _check_fields(records)
+    return get_batcher().submit(records)
+
+
+async def score_transactions_async(records):
+    """ score_transactions for the event loop: awaits the micro-batch instead of parking a thread on it """
+    _check_fields(records)
+    return await asyncio.wrap_future(get_batcher().enqueue(records))
+
+
+def _advisory_result(scored, analyses):
+    scored = scored.copy()
+    scored[ADVISORY_OUTPUT_COLS] = analyses
+    results = scored[['transaction_id'] + ADVISORY_OUTPUT_COLS].to_dict(orient="records")
+    return {"status": "done", "results": results}
+
+
+def _run_advisory(advisory_id, scored):
+    try:
+        result = _advisory_result(scored, scored.apply(analyze_transaction, axis=1))
+    except Exception as e:
+        result = {"status": "error", "message": str(e)}
+    _advisories[advisory_id] = result
+
+
+async def _run_advisory_async(advisory_id, scored):
+    try:
+        analyses = await asyncio.gather(*(analyze_transaction_async(row) for _, row in scored.iterrows()))
+        result = _advisory_result(scored, pd.DataFrame(analyses, index=scored.index))
+    except Exception as e:
+        result = {"status": "error", "message": str(e)}
+    _advisories[advisory_id] = result
+
+
+def _new_advisory():
+    advisory_id = str(uuid.uuid4())
+    _advisories[advisory_id] = {"status": "pending"}
+    while len(_advisories) > MAX_ADVISORIES:
+        _advisories.popitem(last=False)
+    return advisory_id
+
+
+def request_advisory(scored):
+    """ Queue the LLM advisory for already-scored rows; poll get_advisory with the returned id """
+    advisory_id = _new_advisory()
+    _advisory_pool.submit(_run_advisory, advisory_id, scored)
+    return advisory_id
+
+
+def request_advisory_async(scored):
+    """ request_advisory as a task on the running event loop; the rows' LLM calls run concurrently """
+    advisory_id = _new_advisory()
+    task = asyncio.get_running_loop().create_task(_run_advisory_async(advisory_id, scored))
+    # The loop only keeps weak references to tasks
+    _advisory_tasks.add(task)
+    task.add_done_callback(_advisory_tasks.discard)
+    return advisory_id
+
+
+def get_advisory(advisory_id):
+    return _advisories.get(advisory_id)
@@ -0,0 +1,279 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from config.constatns import RESULTS_URI, RESULTS_ROW_GROUP_ROWS, QUERY_DEFAULT_LIMIT, QUERY_MAX_LIMIT
+from services.partitions import partition_of
+
+# Bumped whenever the layout of the result files or their index changes
+RESULTS_SCHEMA_VERSION = 1
+
+# Rows are stored sorted by this column so score filters skip whole row groups
+SORT_COLUMN = 'iso_score'
+# Columns with min/max kept per row group in the index (range filters and sort)
+NUMERIC_COLUMNS = ['iso_score', 'online_score', 'amount', 'geo_distance_km', 'duration_sec', 'retry_count',
+                   'iso_anomaly', 'online_anomaly']
+# Low-cardinality columns with their distinct values kept per row group (equality / IN filters)
+CATEGORY_COLUMNS = ['card_type', 'transaction_status', 'transaction_type', 'currency', 'ip_country']
+BOOLEAN_COLUMNS = ['is_anomaly_suspected_supervised', 'is_anomaly_suspected_UnSupervised', 'has_duplicate']
+# One boolean column per rule name found in rule_anomalies, e.g. rule_HIGH_AMOUNT
+RULE_PREFIX = 'rule_'
+
+RANGE_OPS = {'gt': pc.greater, 'gte': pc.greater_equal, 'lt': pc.less, 'lte': pc.less_equal, 'eq': pc.equal}
+
+DEFAULT_COLUMNS = ['transaction_id', 'card_type', 'amount', 'transaction_status', 'rule_anomalies', 'iso_score',
+                   'is_anomaly_suspected_supervised', 'is_anomaly_suspected_UnSupervised']
+
+
+def _filesystem(uri=RESULTS_URI):
+    """ (filesystem, root path) for an s3://bucket/prefix URI or a local directory """
+    if "://" not in uri:
+        return pafs.LocalFileSystem(), os.path.abspath(uri)
+    return pafs.FileSystem.from_uri(uri)
+
+
+def result_name(file_name):
+    """ Results are addressed by the report's file name, with or without its .csv/.parquet extension """
+    stem, ext = os.path.splitext(os.path.basename(file_name))
+    return stem if ext in ('.csv', '.parquet') else os.path.basename(file_name)
+
+
+def _stored_names(file_name):
+    """ Paths (under the results root, without extension) a report may be stored at: its partition, then flat """
+    name = result_name(file_name)
+    partition = partition_of(name)
+    return [f"{partition}/{name}", name] if partition else [name]
+
+
+def _rule_flags(rule_anomalies):
+    # Scatter (row, rule code) pairs into a boolean matrix; crosstab is ~100x slower on the same data
+    exploded = rule_anomalies.reset_index(drop=True).explode().dropna()
+    codes, names = pd.factorize(exploded)
+    flags = np.zeros((len(rule_anomalies), len(names)), dtype=bool)
+    flags[exploded.index.to_numpy(dtype=np.int64), codes] = True
+    return pd.DataFrame(flags, columns=[f"{RULE_PREFIX}{name}" for name in names], index=rule_anomalies.index)
+
+
+def _rule_columns(schema):
+    return [f.name for f in schema if f.name.startswith(RULE_PREFIX) and pa.types.is_boolean(f.type)]
+
+
+def _row_group_stats(table):
+    stats = {"rows": table.num_rows}
+    for col in NUMERIC_COLUMNS:
+        if col in table.column_names:
+            bounds = pc.min_max(table[col])
+            stats[col] = [bounds['min'].as_py(), bounds['max'].as_py()]
+    for col in CATEGORY_COLUMNS:
+        if col in table.column_names:
+            stats[col] = sorted(str(v) for v in pc.unique(table[col].cast(pa.string())).to_pylist() if v is not None)
+    for col in BOOLEAN_COLUMNS + _rule_columns(table.schema):
+        if col in table.column_names:
+            stats[col] = int(pc.sum(table[col].cast(pa.int64())).as_py() or 0)
+    return stats
+
+
+def write_results(df, file_name, uri=RESULTS_URI, row_group_rows=RESULTS_ROW_GROUP_ROWS):
+    """
+    Store a scored DataFrame as <name>.parquet plus a <name>.index.json sidecar under uri.
+
+    Rows are sorted by iso_score and keep their original position in row_number. Every rule becomes its own
+    boolean column. The index records, per row group, the row count, numeric min/max, category values and
+    flag counts, which is everything the query planner needs to skip groups without reading them.
+    """
+    fs, root = _filesystem(uri)
+    name = _stored_names(file_name)[0]
+    df = df.reset_index(drop=True)
+    df.insert(0, 'row_number', np.arange(len(df)))
+    if 'rule_anomalies' in df:
+        df = pd.concat([df, _rule_flags(df['rule_anomalies'])], axis=1)
+    if SORT_COLUMN in df:
+        df = df.sort_values(SORT_COLUMN, kind='stable')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    fs.create_dir(os.path.dirname(f"{root}/{name}"), recursive=True)
+    with fs.open_output_stream(f"{root}/{name}.parquet") as sink:
+        pq.write_table(table, sink, row_group_size=row_group_rows, compression='zstd')
+    index = {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "rows": table.num_rows,
+        "sort_column": SORT_COLUMN,
+        "columns": table.column_names,
+        "row_groups": [_row_group_stats(table.slice(start, row_group_rows))
+                       for start in range(0, table.num_rows, row_group_rows)],
+    }
+    with fs.open_output_stream(f"{root}/{name}.index.json") as sink:
+        sink.write(json.dumps(index).encode("utf-8"))
+    print(f"✅ Results stored: {root}/{name}.parquet ({table.num_rows} rows, {len(index['row_groups'])} row groups)")
+    return f"{name}.parquet"
+
+
+def scored_summary(df):
+    """ Row and anomaly counts of a scored DataFrame, for batch summaries and partition manifests """
+    return {
+        "rows": len(df),
+        "rule_anomaly_rows": int(df['rule_anomalies'].map(len).gt(0).sum()),
+        "suspected_supervised": int(df['is_anomaly_suspected_supervised'].sum()),
+        "suspected_unsupervised": int(df['is_anomaly_suspected_UnSupervised'].sum()),
+        "iso_anomalies": int((df['iso_anomaly'] == -1).sum()),
+        "online_anomalies": int((df['online_anomaly'] == -1).sum()),
+        "duplicates": int(df['has_duplicate'].sum()),
+    }
+
+
+def parse_query(args):
+    """
+    Query from request arguments:
+      columns=a,b,c        projection (default DEFAULT_COLUMNS)
+      rule=HIGH_AMOUNT,..  rows that triggered every listed rule
+      <numeric>_<op>=x     op in gt, gte, lt, lte, eq, e.g. iso_score_gt=80
+      <category>=A,B       e.g. card_type=VISA,AMEX
+      <flag>=true|false    e.g. has_duplicate=true
+      sort=[-]column       '-' for descending; limit=n
+    Raises ValueError on anything else.
+    """
+    query = {"columns": None, "filters": [], "sort": None, "descending": False, "limit": QUERY_DEFAULT_LIMIT}
+    for key, value in args.items():
+        if key == "columns":
+            query["columns"] = [c for c in value.split(",") if c]
+        elif key == "rule":
+            query["filters"] += [(f"{RULE_PREFIX}{rule}", "is", True) for rule in value.split(",") if rule]
+        elif key == "sort":
+            query["descending"] = value.startswith("-")
+            query["sort"] = value.lstrip("-")
+        elif key == "limit":
+            query["limit"] = int(value)
+            if not 0 < query["limit"] <= QUERY_MAX_LIMIT:
+                raise ValueError(f"limit must be between 1 and {QUERY_MAX_LIMIT}")
+        elif key in CATEGORY_COLUMNS:
+            query["filters"].append((key, "in", value.split(",")))
+        elif key in BOOLEAN_COLUMNS:
+            query["filters"].append((key, "is", value.lower() == "true"))
+        else:
+            column, _, op = key.rpartition("_")
+            if column not in NUMERIC_COLUMNS or op not in RANGE_OPS:
+                raise ValueError(f"Unsupported query parameter: {key}")
+            query["filters"].append((column, op, float(value)))
+    return query
+
+
+def _may_match(stats, filters):
+    """ False only when the row-group stats prove no row can pass every filter """
+    for column, op, value in filters:
+        stat = stats.get(column)
+        if stat is None:
+            if column.startswith(RULE_PREFIX) and value:
+                return False  # the rule never fired in this group
+            continue
+        if op == "is":
+            if (value and stat == 0) or (not value and stat == stats["rows"]):
+                return False
+        elif op == "in":
+            if not set(stat) & set(value):
+                return False
+        else:
+            lo, hi = stat
+            if lo is None or (op == "gt" and hi <= value) or (op == "gte" and hi < value) \
+                    or (op == "lt" and lo >= value) or (op == "lte" and lo > value) \
+                    or (op == "eq" and not lo <= value <= hi):
+                return False
+    return True
+
+
+def _filter_mask(table, filters):
+    mask = None
+    for column, op, value in filters:
+        if column not in table.column_names:
+            # Only a rule that never fired anywhere in the file is absent; nothing can match it
+            return pa.array(np.zeros(table.num_rows, dtype=bool))
+        if op == "is":
+            condition = pc.equal(table[column], value)
+        elif op == "in":
+            condition = pc.is_in(table[column].cast(pa.string()), value_set=pa.array(value, pa.string()))
+        else:
+            condition = RANGE_OPS[op](table[column], value)
+        condition = pc.fill_null(condition, False)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return mask
+
+
+def _to_records(table):
+    # Timestamps as ISO strings, the format the JSON API takes in
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, pc.strftime(table[field.name], format="%Y-%m-%dT%H:%M:%S"))
+    return table.to_pylist()
+
+
+def _find_index(fs, root, file_name):
+    """ (stored name, index) of a report; results written before partitioning are found at the flat path """
+    for name in _stored_names(file_name):
+        try:
+            with fs.open_input_stream(f"{root}/{name}.index.json") as source:
+                return name, json.loads(source.read())
+        except (FileNotFoundError, OSError):
+            continue
+    raise FileNotFoundError(f"No query results for {file_name}")
+
+
+def load_index(file_name, uri=RESULTS_URI):
+    fs, root = _filesystem(uri)
+    return _find_index(fs, root, file_name)[1]
+
+
+def query_results(file_name, query, uri=RESULTS_URI):
+    """
+    Run a parsed query against one stored result.
+
+    Row groups the index rules out are never read; the rest are read one at a time with only the projected,
+    filtered and sorted columns. Without a sort the scan stops once limit rows match; with one, a running
+    top-limit is kept. A sort on iso_score walks the groups in storage order (or reversed) and stops early too.
+    """
+    fs, root = _filesystem(uri)
+    name, index = _find_index(fs, root, file_name)
+
+    columns = query["columns"] or [c for c in DEFAULT_COLUMNS if c in index["columns"]]
+    unknown = [c for c in columns if c not in index["columns"]]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    sort, descending, limit = query["sort"], query["descending"], query["limit"]
+    if sort and sort not in index["columns"]:
+        raise ValueError(f"Unknown sort column: {sort}")
+    filters = query["filters"]
+    needed = list(dict.fromkeys(columns + [c for c, _, _ in filters if c in index["columns"]]
+                                + ([sort] if sort else [])))
+
+    groups = [i for i, stats in enumerate(index["row_groups"]) if _may_match(stats, filters)]
+    presorted = sort == index["sort_column"]
+    if presorted and descending:
+        groups.reverse()
+
+    result, scanned = None, 0
+    with fs.open_input_file(f"{root}/{name}.parquet") as source:
+        parquet = pq.ParquetFile(source)
+        for group in groups:
+            table = parquet.read_row_group(group, columns=needed)
+            scanned += 1
+            mask = _filter_mask(table, filters)
+            if mask is not None:
+                table = table.filter(mask)
+            result = table if result is None else pa.concat_tables([result, table])
+            if sort:
+                result = result.sort_by([(sort, "descending" if descending else "ascending")])
+            result = result.slice(0, limit)
+            if result.num_rows >= limit and (not sort or presorted):
+                break
+
+    return {
+        "file_name": file_name,
+        "rows": 0 if result is None else result.num_rows,
+        "row_groups_total": len(index["row_groups"]),
+        "row_groups_scanned": scanned,
+        "results": [] if result is None else _to_records(result.select(columns)),
+    }
@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.utils.class_weight import compute_class_weight
+
+
+def stratified_reservoir_sample(labels, max_rows, random_state=42):
+    """
+    Positions of a stratified uniform sample of at most max_rows rows, in their original order.
+
+    Each row gets a random key and, per class, the rows with the smallest keys are kept: the same
+    sample a per-class reservoir would hold after one pass. Rare classes are filled first, so the
+    minority is kept whole whenever it fits; nothing is duplicated.
+    """
+    labels = np.asarray(labels)
+    if max_rows is None or len(labels) <= max_rows:
+        return np.arange(len(labels))
+
+    keys = np.random.default_rng(random_state).random(len(labels))
+    classes, counts = np.unique(labels, return_counts=True)
+    remaining = max_rows
+    chosen = []
+    for i, c in enumerate(np.argsort(counts)):
+        quota = min(counts[c], remaining // (len(classes) - i))
+        members = np.flatnonzero(labels == classes[c])
+        if quota < len(members):
+            members = members[np.argpartition(keys[members], quota)[:quota]]
+        chosen.append(members)
+        remaining -= quota
+    return np.sort(np.concatenate(chosen))
+
+
+def fit_forest_within_budget(X, y, time_budget_sec=None, n_estimators=200, step=25, **params):
+    """
+    Fit a class-weighted RandomForestClassifier, growing it step trees at a time (warm start)
+    and stopping early once time_budget_sec has been spent. Always fits at least one step.
+    Balanced class weights are computed once from the training labels and passed explicitly, which is what
+    warm-start fitting needs (the 'balanced' preset is re-derived, with a warning, on every fit).
+    """
+    classes = np.unique(np.asarray(y))
+    weights = compute_class_weight('balanced', classes=classes, y=np.asarray(y))
+    rf_model = RandomForestClassifier(n_estimators=min(step, n_estimators), warm_start=True,
+                                      class_weight=dict(zip(classes.tolist(), weights.tolist())), **params)
+    start = time.perf_counter()
+    rf_model.fit(X, y)
+    while rf_model.n_estimators < n_estimators:
+        if time_budget_sec and time.perf_counter() - start > time_budget_sec:
+            print(f"⏱ Training budget reached, stopping at {rf_model.n_estimators} trees")
+            break
+        rf_model.n_estimators = min(rf_model.n_estimators + step, n_estimators)
+        rf_model.fit(X, y)
+    return rf_model
+
+
+def can_stratify(y, min_per_class=2):
+    """ train_test_split(stratify=y) needs at least two rows of every class """
+    counts = np.unique(np.asarray(y), return_counts=True)[1]
+    return len(counts) > 1 and counts.min() >= min_per_class
@@ -0,0 +1,160 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config.constatns import QUARANTINE_DATA_DIR, VALIDATION_MAX_AMOUNT, VALIDATION_MAX_RETRIES
+from services.partitions import partitioned_key, record_object
+
+# Columns the feature, rule, feature-store and fingerprint stages read; a file without one of them is rejected whole
+REQUIRED_COLUMNS = ['transaction_id', 'account_id', 'customer_id', 'merchant_name', 'device_id', 'card_type',
+                    'card_expire_date', 'transaction_type', 'transaction_status', 'amount', 'currency',
+                    'timestamp_initiated', 'timestamp_completed', 'retry_count', 'ip_address', 'geo_location']
+# Rows need a value in these to be identified or keyed
+NOT_NULL_COLUMNS = ['transaction_id', 'account_id', 'customer_id', 'device_id', 'transaction_status']
+
+# Reason codes, reported as <CODE>:<column>
+NULL = "NULL"
+UNPARSEABLE = "UNPARSEABLE"
+OUT_OF_RANGE = "OUT_OF_RANGE"
+
+TIMESTAMP_RANGE = (pd.Timestamp("2000-01-01"), pd.Timestamp("2100-01-01"))
+
+
+# Plain decimal or scientific notation, as written by the exporters
+_NUMBER = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+
+
+def _strings(values):
+    """ Column as an arrow string array, whatever pandas dtype ingest gave it """
+    return pa.array(values.astype('string[pyarrow]'))
+
+
+def _mask(array):
+    return array.to_numpy(zero_copy_only=False).astype(bool)
+
+
+def _timestamps(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, errors='coerce', format='ISO8601')
+
+
+def _geo(values):
+    """ (lat, lon) float arrays from "lat,lon" strings; NaN where the value does not parse """
+    parts = pc.split_pattern(_strings(values), ',', max_splits=1)
+    # Values without a comma have a single part; pad them so list_element(1) is null rather than an error
+    parts = pc.if_else(pc.greater(pc.list_value_length(parts), 1), parts, pa.scalar([None, None], parts.type))
+    coords = []
+    for i in (0, 1):
+        part = pc.utf8_trim_whitespace(pc.list_element(parts, i))
+        part = pc.if_else(pc.fill_null(pc.match_substring_regex(part, _NUMBER), False), part, None)
+        coords.append(pc.cast(part, pa.float64()).to_numpy(zero_copy_only=False))
+    return coords
+
+
+def _check(df):
+    """
+    {reason code: boolean mask of failing rows} plus the coerced columns, one vectorized pass per column.
+    Semantic oddities the rules look for (high amounts, far geo, negative durations, bad IPs) are not errors here.
+    """
+    checks, coerced = {}, {}
+    for col in NOT_NULL_COLUMNS:
+        values = _strings(df[col])
+        checks[f"{NULL}:{col}"] = _mask(pc.fill_null(pc.equal(pc.utf8_trim_whitespace(values), ''), True))
+
+    amount = pd.to_numeric(df['amount'], errors='coerce')
+    checks[f"{UNPARSEABLE}:amount"] = amount.isna() & df['amount'].notna()
+    checks[f"{NULL}:amount"] = df['amount'].isna()
+    checks[f"{OUT_OF_RANGE}:amount"] = ~np.isfinite(amount.fillna(0)) | (amount.abs() > VALIDATION_MAX_AMOUNT)
+    coerced['amount'] = amount.astype(float)
+
+    retries = pd.to_numeric(df['retry_count'], errors='coerce')
+    checks[f"{UNPARSEABLE}:retry_count"] = ((retries.isna() & df['retry_count'].notna())
+                                            | ((retries % 1).fillna(0) != 0))
+    checks[f"{OUT_OF_RANGE}:retry_count"] = (retries < 0) | (retries > VALIDATION_MAX_RETRIES)
+    coerced['retry_count'] = retries.fillna(0)
+
+    for col in ['timestamp_initiated', 'timestamp_completed']:
+        ts = _timestamps(df[col])
+        checks[f"{NULL}:{col}"] = df[col].isna()
+        checks[f"{UNPARSEABLE}:{col}"] = ts.isna() & df[col].notna()
+        checks[f"{OUT_OF_RANGE}:{col}"] = (ts < TIMESTAMP_RANGE[0]) | (ts >= TIMESTAMP_RANGE[1])
+        coerced[col] = ts
+
+    expiry = pd.to_datetime(df['card_expire_date'].astype('string'), format='%m/%Y', errors='coerce')
+    checks[f"{UNPARSEABLE}:card_expire_date"] = expiry.isna()
+
+    lat, lon = _geo(df['geo_location'])
+    checks[f"{UNPARSEABLE}:geo_location"] = np.isnan(lat) | np.isnan(lon)
+    checks[f"{OUT_OF_RANGE}:geo_location"] = (np.abs(lat) > 90) | (np.abs(lon) > 180)
+    return checks, coerced
+
+
+def validate_transactions(df):
+    """
+    Split an ingested transaction DataFrame into (valid rows, quarantined rows).
+
+    Every check is column-wise, so the cost is a handful of vectorized passes however many rows fail.
+    Quarantined rows keep their original values plus row_number (0-based position in the file) and
+    reject_reasons (comma-separated <CODE>:<column>). Valid rows come back with amount, retry_count and the
+    timestamps coerced to their declared types and a fresh index.
+    Raises ValueError when required columns are missing, since no row of such a file can be scored.
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Input is missing required columns: {', '.join(missing)}")
+
+    df = df.reset_index(drop=True)
+    checks, coerced = _check(df)
+    codes = np.array(list(checks))
+    failed = np.column_stack([pd.Series(mask).fillna(False).to_numpy(dtype=bool) for mask in checks.values()])
+    bad = failed.any(axis=1)
+
+    quarantine = df[bad].copy()
+    if len(quarantine):
+        quarantine.insert(0, 'reject_reasons', [",".join(codes[row]) for row in failed[bad]])
+        quarantine.insert(0, 'row_number', np.flatnonzero(bad))
+
+    valid = df[~bad].copy() if bad.any() else df.copy(deep=False)
+    for col, values in coerced.items():
+        valid[col] = values[~bad].to_numpy()
+    valid['retry_count'] = valid['retry_count'].astype(np.int64)
+    return valid.reset_index(drop=True), quarantine.reset_index(drop=True)
+
+
+def reason_counts(quarantine):
+    """ {reason code: rows}, for logs and summaries """
+    if quarantine.empty:
+        return {}
+    return quarantine['reject_reasons'].str.split(',').explode().value_counts().to_dict()
+
+
+def quarantine_key(key, timestamp=None):
+    timestamp = timestamp or datetime.now(timezone.utc).replace(microsecond=0).strftime("%Y-%m-%dT%H-%M-%S")
+    stem = os.path.splitext(os.path.basename(key))[0]
+    return partitioned_key(QUARANTINE_DATA_DIR, f"{stem}_quarantine_{timestamp}.csv")
+
+
+def write_quarantine(s3, bucket, key, quarantine, tmp_dir, timestamp=None):
+    """
+    Upload the quarantined rows of s3://bucket/key as a CSV to its quarantine/ partition and record it in the
+    partition manifest; returns the object key
+    """
+    output_key = quarantine_key(key, timestamp)
+    fd, path = tempfile.mkstemp(dir=tmp_dir, suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="") as sink:
+            quarantine.to_csv(sink, index=False)
+        s3.upload_file(path, bucket, output_key)
+        record_object(s3, bucket, output_key, "quarantine", rows=len(quarantine),
+                      anomalies=reason_counts(quarantine), size=os.path.getsize(path), columns=quarantine.columns)
+    finally:
+        os.remove(path)
+    print(f"🔍 {len(quarantine)} rows of s3://{bucket}/{key} quarantined to s3://{bucket}/{output_key}: "
+          f"{reason_counts(quarantine)}")
+    return output_key
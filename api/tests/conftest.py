@@ -0,0 +1,17 @@
+"""
+Tests run offline on the local backends against a throwaway state directory.
+
+Run from the api/ folder:
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules import both services.* (api/ on the path, as in the container) and api.* (its parent)
+sys.path[:0] = [API_DIR, os.path.dirname(API_DIR)]
+
+# config.constatns reads these at import time, so they are set before any test module imports it
+os.environ.update({"BACKEND": "local", "LLM_BACKEND": "stub", "LLM_STUB_LATENCY_MS": "0",
+                   "STATE_DIR": tempfile.mkdtemp(prefix="anomaly-tests-")})
@@ -0,0 +1,44 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from services.advisor_prompt import DEFAULT_FIELDS, FIELD_KEYS, SYSTEM_PROMPT, encode_transaction
+
+
+def _scored_row(**overrides):
+    row = {
+        'device_id': '0f8fad5b-d9cb-469f-a165-70867728950e', 'merchant_name': 'Acme', 'amount': 120.456,
+        'timestamp_initiated': pd.Timestamp('2026-01-01 10:00:00.123'), 'retry_count': np.int64(2),
+        'failure_description': None, 'rule_anomalies': ['HIGH_AMOUNT', 'ODD_HOUR', 'GEO_TOO_FAR'],
+        'is_anomaly_suspected_supervised': np.bool_(True), 'is_anomaly_suspected_UnSupervised': np.bool_(False),
+        'iso_anomaly': np.int64(-1), 'iso_score': 12.3456,
+    }
+    return pd.Series({**row, **overrides})
+
+
+def test_model_columns_map_to_the_keys_the_prompt_describes():
+    encoded = json.loads(encode_transaction(_scored_row()))
+    # The rules label, the forest's verdict and the Isolation Forest signal are kept apart
+    assert encoded['rules_flag'] is True
+    assert encoded['rf_model'] is False
+    assert encoded['iso_flag'] == -1
+    assert encoded['iso_score'] == 12.35
+    assert encoded['rules'] == 'HIGH_AMOUNT,ODD_HOUR,GEO_TOO_FAR'
+    assert "rules_flag (true when 3 or more rules fired)" in SYSTEM_PROMPT
+    assert "rf_model (random-forest verdict" in SYSTEM_PROMPT
+    assert "iso_flag (Isolation Forest" in SYSTEM_PROMPT
+
+
+def test_every_short_key_is_described_in_the_prompt():
+    for key in FIELD_KEYS.values():
+        assert key in SYSTEM_PROMPT
+
+
+def test_identifiers_and_empty_values_are_dropped():
+    encoded = json.loads(encode_transaction(_scored_row()))
+    assert 'device' not in encoded and 'failure_description' not in encoded
+    assert encoded['initiated'] == '2026-01-01T10:00:00'
+    assert encoded['amount'] == 120.46
+    assert encoded['retries'] == 2
+    assert set(encoded) <= {FIELD_KEYS[field] for field in DEFAULT_FIELDS}
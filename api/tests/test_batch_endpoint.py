@@ -0,0 +1,36 @@
+import pytest
+
+import app as flask_app
+
+BUCKET = "test-bucket"
+
+
+@pytest.fixture
+def client():
+    return flask_app.app.test_client()
+
+
+@pytest.mark.parametrize("body", [
+    {"bucket": BUCKET},
+    {"objects": [{"bucket": BUCKET}]},
+    {"objects": [{"bucket": BUCKET, "key": "input/a.csv"}], "concurrency": "many"},
+])
+def test_malformed_requests_are_client_errors(client, body):
+    response = client.post("/files/processAnomaly/batch", json=body)
+    assert response.status_code == 400
+
+
+def test_invalid_json_is_a_client_error(client):
+    response = client.post("/files/processAnomaly/batch", data="{not json", content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_processing_bugs_are_server_errors(client, monkeypatch):
+    def broken(objects, concurrency):
+        raise KeyError("iso_score")
+
+    monkeypatch.setattr(flask_app, "process_batch_from_s3", broken)
+    response = client.post("/files/processAnomaly/batch",
+                           json={"objects": [{"bucket": BUCKET, "key": "input/a.csv"}]})
+    assert response.status_code == 500
+    assert "iso_score" in response.get_json()["message"]
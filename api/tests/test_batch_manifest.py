@@ -0,0 +1,21 @@
+from backends.local_s3 import LocalObjectStore
+from services.batch_processing import resolve_manifest
+from services.partitions import MANIFEST_NAME, upload_partitioned
+
+BUCKET = "test-bucket"
+
+
+def test_prefix_listing_skips_partition_manifests(tmp_path):
+    s3 = LocalObjectStore(str(tmp_path / "s3"))
+    path = tmp_path / "transactions.csv"
+    path.write_text("transaction_id,amount\nt1,1.0\n")
+    partitioned = upload_partitioned(s3, BUCKET, "input", str(path), "input", rows=1,
+                                     partition="dt=2025-06-01/hour=13")
+    s3.upload_file(str(path), BUCKET, "input/legacy.csv")
+    s3.put_object(Bucket=BUCKET, Key="input/notes.txt", Body=b"not a transaction file")
+
+    keys = [obj["Key"] for obj in s3.list_objects_v2(Bucket=BUCKET, Prefix="input/")["Contents"]]
+    assert f"input/dt=2025-06-01/hour=13/{MANIFEST_NAME}" in keys
+
+    objects = resolve_manifest({"bucket": BUCKET, "prefix": "input/"}, s3)
+    assert sorted(objects) == [(BUCKET, partitioned), (BUCKET, "input/legacy.csv")]
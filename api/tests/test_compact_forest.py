@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from services.compact_forest import CompactForest, compact_within_tolerance, load_compact, save_compact
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 5)) * [1, 10, 100, 1e3, 1e-3]
+    y = (X[:, 0] + X[:, 1] / 10 > 1.2) | (X[:, 4] > 2e-3)
+    forest = RandomForestClassifier(n_estimators=40, random_state=0).fit(X[:1500], y[:1500])
+    return forest, X[1500:]
+
+
+def test_full_forest_matches_sklearn_exactly(data):
+    forest, X = data
+    compact = CompactForest.from_sklearn(forest)
+    assert compact.n_trees == 40
+    np.testing.assert_allclose(compact.predict_proba(X), forest.predict_proba(X), atol=1e-6)
+    assert (compact.predict(X) == forest.predict(X)).all()
+
+
+def test_smallest_forest_within_tolerance_is_chosen(data):
+    forest, X = data
+    compact, agreement = compact_within_tolerance(forest, X, max_depth=6, min_agreement=0.9, tree_counts=(10, 25))
+    assert agreement >= 0.9
+    assert compact.n_trees == 10 and compact.depth == 6
+
+    # An unreachable tolerance falls back to every tree at full depth, which is exact
+    compact, agreement = compact_within_tolerance(forest, X, max_depth=1, min_agreement=1.01)
+    assert compact.n_trees == 40 and agreement == 1.0
+
+
+def test_saved_forest_is_memory_mapped(data, tmp_path):
+    forest, X = data
+    path = str(tmp_path / "rf_compact.joblib")
+    assert save_compact(CompactForest.from_sklearn(forest), path) > 0
+    loaded = load_compact(path)
+    assert isinstance(loaded.children, np.memmap)
+    assert (loaded.predict(X) == forest.predict(X)).all()
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.drift_monitor import (CategorySketch, QuantileSketch, build_sketches, drift_report, feature_psi,
+                                    latest_drift, record_sketches, should_retrain)
+
+
+def _numeric(values):
+    return QuantileSketch().update(values)
+
+
+def test_same_distribution_has_near_zero_psi():
+    rng = np.random.default_rng(0)
+    assert feature_psi(_numeric(rng.normal(100, 10, 20_000)), _numeric(rng.normal(100, 10, 20_000))) < 0.01
+
+
+@pytest.mark.parametrize("shift, drifted", [(0.0, False), (0.1, False), (1.0, True)])
+def test_shifted_distribution_is_drifted_past_the_threshold(shift, drifted):
+    rng = np.random.default_rng(1)
+    reference = {'amount': _numeric(rng.normal(100, 10, 20_000))}
+    current = {'amount': _numeric(rng.normal(100 + 10 * shift, 10, 20_000))}
+    report = drift_report(current, reference, threshold=0.25)
+    assert (report['drifted'] == ['amount']) is drifted
+    assert should_retrain(report, mode="on_drift") is drifted
+
+
+def test_threshold_is_inclusive():
+    reference = {'amount': _numeric(np.arange(1, 1001))}
+    current = {'amount': _numeric(np.arange(500, 1500))}
+    psi = drift_report(current, reference)['features']['amount']
+    assert drift_report(current, reference, threshold=psi)['drifted'] == ['amount']
+    assert drift_report(current, reference, threshold=psi + 1e-3)['drifted'] == []
+
+
+def test_categorical_psi_compares_value_frequencies():
+    reference = CategorySketch().update(np.array([True] * 50 + [False] * 950))
+    assert feature_psi(CategorySketch().update(np.array([True] * 50 + [False] * 950)), reference) == 0
+    assert feature_psi(CategorySketch().update(np.array([True] * 500 + [False] * 500)), reference) > 0.25
+
+
+def test_missing_values_count_as_drift():
+    reference = _numeric(np.arange(1.0, 1001.0))
+    current = _numeric(np.r_[np.arange(1.0, 501.0), [np.nan] * 500])
+    assert feature_psi(current, reference) > 0.25
+
+
+def test_no_reference_always_retrains():
+    report = drift_report(build_sketches(pd.DataFrame({'amount': [1.0, 2.0]}), ['amount']), None)
+    assert not report['has_reference'] and should_retrain(report)
+    reference = build_sketches(pd.DataFrame({'amount': [1.0, 2.0]}), ['amount'])
+    assert should_retrain(drift_report(reference, reference), mode="always")
+
+
+@pytest.mark.parametrize("keep, expected", [(0, 1), (-3, 1), (2, 2), (10, 4)])
+def test_recorded_runs_are_pruned_but_the_newest_is_kept(tmp_path, keep, expected):
+    for rows in range(4):
+        record_sketches({}, {"drift_score": rows}, rows, sketch_dir=str(tmp_path), keep=keep)
+    assert len(list(tmp_path.glob("*.joblib"))) == expected
+    assert latest_drift(str(tmp_path))["rows"] == 3
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from services.feature_store import BEHAVIOR_COLUMNS, FeatureStore, apply_feature_store
+from services.features import FEATURES_BEHAVIOR
+
+
+def _events(times, account='a1', device='d1', customer='c1', geo='12.97,77.59', status='SUCCESS', amount=10.0):
+    return pd.DataFrame({
+        'timestamp_initiated': pd.to_datetime(times), 'amount': amount, 'transaction_status': status,
+        'retry_count': 1, 'geo_location': geo, 'account_id': account, 'device_id': device, 'customer_id': customer,
+    })
+
+
+def test_only_model_columns_are_emitted():
+    behavior = FeatureStore().update_and_join(_events(['2026-01-01 00:00']))
+    assert list(behavior.columns) == BEHAVIOR_COLUMNS == FEATURES_BEHAVIOR
+
+
+def test_events_leave_each_window_once_it_has_passed():
+    store = FeatureStore()
+    store.update_and_join(_events(['2026-01-01 00:00', '2026-01-01 00:30'], amount=100.0, status='FAILED'))
+    row = store.update_and_join(_events(['2026-01-01 01:15'], geo='40.71,-74.00')).iloc[0]
+    # The 00:00 event is out of the 1h window, both earlier events are still inside 24h and 7d
+    assert row['account_count_1h'] == 2
+    assert row['account_count_24h'] == 3
+    assert row['account_amount_sum_24h'] == 210.0
+    assert row['device_fail_ratio_24h'] == 2 / 3
+    assert row['device_retry_sum_24h'] == 3
+    assert row['device_distinct_geo_24h'] == 2
+
+    # The two failed events are out of 24h; 01:15 is still inside it
+    row = store.update_and_join(_events(['2026-01-02 01:00'])).iloc[0]
+    assert row['account_count_24h'] == 2
+    assert row['device_fail_ratio_24h'] == 0
+    assert row['device_distinct_geo_24h'] == 2
+    assert row['customer_count_7d'] == 4
+    assert row['customer_distinct_geo_7d'] == 2
+
+
+def test_prune_drops_keys_idle_past_their_longest_window():
+    store = FeatureStore()
+    store.update_and_join(_events(['2026-01-01 00:00'], account='idle', device='idle', customer='idle'))
+    store.update_and_join(_events(['2026-01-03 00:00'], account='active', device='active', customer='active'))
+    store.prune()
+    # Accounts and devices are only kept for 24h, customers for 7d
+    assert set(store.keys['account']) == set(store.keys['device']) == {'active'}
+    assert set(store.keys['customer']) == {'idle', 'active'}
+
+
+def test_persisted_store_matches_the_in_memory_one(tmp_path):
+    path = str(tmp_path / "feature_store.sqlite")
+    batches = [_events(['2026-01-01 00:00', '2026-01-01 00:20'], account='x'),
+               _events(['2026-01-01 00:40'], account='y'),
+               _events(['2026-01-01 00:50', '2026-01-02 12:00'], account='x')]
+    memory = FeatureStore()
+    for batch in batches:
+        expected = memory.update_and_join(batch)
+        assert_frame_equal(apply_feature_store(batch, path)[BEHAVIOR_COLUMNS], expected)
+
+    # Only keys with an event in the last 24h (accounts, devices) or 7d (customers) are still stored
+    with sqlite3.connect(path) as conn:
+        stored = set(conn.execute("SELECT prefix, key FROM windows"))
+    assert stored == {('account', 'x'), ('device', 'd1'), ('customer', 'c1')}
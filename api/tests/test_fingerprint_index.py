@@ -0,0 +1,53 @@
+import numpy as np
+
+from services.fingerprint_index import MAX_SEGMENTS, FingerprintIndex, _merge_sorted
+
+
+def _pairs(rng, n):
+    return rng.integers(0, 2 ** 63, n, dtype=np.uint64), rng.integers(0, 2 ** 63, n, dtype=np.uint64)
+
+
+def test_snapshot_survives_a_concurrent_compaction(tmp_path):
+    rng = np.random.default_rng(0)
+    writer = FingerprintIndex(str(tmp_path), capacity=10_000)
+    fingerprints, ids = _pairs(rng, 500)
+    writer.add(fingerprints, ids)
+
+    snapshot = FingerprintIndex.snapshot(str(tmp_path), capacity=10_000)
+    for _ in range(MAX_SEGMENTS):
+        writer.add(*_pairs(rng, 100))
+    assert len(list(tmp_path.glob("segment_*.npy"))) == 1
+
+    # Same fingerprints under other ids are duplicates; the segments the snapshot mapped are gone from disk
+    other_ids = ids + np.uint64(1)
+    assert snapshot.find_previous(fingerprints, other_ids).all()
+    assert not snapshot.find_previous(fingerprints, ids).any()
+    assert snapshot.is_stale()
+    assert FingerprintIndex.snapshot(str(tmp_path), capacity=10_000).find_previous(fingerprints, other_ids).all()
+
+
+def test_streamed_compaction_matches_an_in_memory_merge():
+    rng = np.random.default_rng(1)
+    # Few distinct fingerprints, so equal-fingerprint runs straddle merge steps
+    segments = [np.unique(np.column_stack([rng.integers(0, 50, n, dtype=np.uint64),
+                                           rng.integers(0, 20, n, dtype=np.uint64)]), axis=0)
+                for n in (300, 5, 120, 0, 400)]
+    expected = np.unique(np.concatenate(segments), axis=0)
+    merged = np.vstack([np.column_stack(block) for block in _merge_sorted(segments, chunk_rows=7)])
+    np.testing.assert_array_equal(merged, expected)
+
+
+def test_vectorized_lookup_matches_a_per_row_scan(tmp_path):
+    rng = np.random.default_rng(2)
+    index = FingerprintIndex(str(tmp_path), capacity=10_000)
+    for _ in range(3):
+        index.add(rng.integers(0, 300, 200, dtype=np.uint64), rng.integers(0, 4, 200, dtype=np.uint64))
+    stored = np.concatenate(index.segments)
+    fingerprints = rng.integers(0, 400, 1000, dtype=np.uint64)
+    ids = rng.integers(0, 4, 1000, dtype=np.uint64)
+
+    expected = []
+    for fingerprint, id_hash in zip(fingerprints, ids):
+        stored_ids = stored[stored[:, 0] == fingerprint, 1]
+        expected.append((stored_ids != id_hash).any() and not (stored_ids == id_hash).any())
+    np.testing.assert_array_equal(index.find_previous(fingerprints, ids), expected)
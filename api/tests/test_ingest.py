@@ -0,0 +1,53 @@
+import pandas as pd
+
+from services import ingest
+from services.ingest import read_transactions_csv
+
+ROWS = [
+    {'transaction_id': 't1', 'account_id': 'a1', 'card_type': 'VISA', 'transaction_status': 'SUCCESS',
+     'amount': '10.5', 'retry_count': '0', 'timestamp_initiated': '2026-01-01T10:00:00',
+     'failure_description': 'n/a', 'batch_tag': 'x'},
+    {'transaction_id': 't2', 'account_id': 'a2', 'card_type': 'AMEX', 'transaction_status': 'FAILED',
+     'amount': '99', 'retry_count': '3', 'timestamp_initiated': '2026-01-01T11:30:00',
+     'failure_description': 'declined', 'batch_tag': 'y'},
+]
+
+
+def _write(tmp_path, rows=ROWS):
+    path = tmp_path / "transactions.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def test_reads_the_declared_schema(tmp_path):
+    df = read_transactions_csv(_write(tmp_path))
+    assert df['timestamp_initiated'].dtype == 'datetime64[ns]'
+    assert df['amount'].dtype == 'float64'
+    assert df['retry_count'].dtype == 'int64'
+    assert isinstance(df['card_type'].dtype, pd.CategoricalDtype)
+    assert df['transaction_id'].tolist() == ['t1', 't2']
+
+
+def test_drop_columns_are_never_loaded_and_unknown_columns_are_kept(tmp_path):
+    df = read_transactions_csv(_write(tmp_path), drop_columns=['failure_description'])
+    assert 'failure_description' not in df.columns
+    assert df['batch_tag'].tolist() == ['x', 'y']
+
+
+def test_malformed_timestamp_falls_back_to_an_unparsed_column(tmp_path):
+    rows = [dict(ROWS[0]), dict(ROWS[1], timestamp_initiated='not-a-date')]
+    df = read_transactions_csv(_write(tmp_path, rows))
+    assert len(df) == 2
+    # Left as read, for validate_transactions to quarantine
+    assert df['timestamp_initiated'].tolist() == ['2026-01-01T10:00:00', 'not-a-date']
+
+
+def test_pandas_fallback_matches_arrow(tmp_path, monkeypatch):
+    path = _write(tmp_path)
+    arrow = read_transactions_csv(path)
+    monkeypatch.setattr(ingest, 'pa', None)
+    fallback = read_transactions_csv(path)
+    assert list(fallback.columns) == list(arrow.columns)
+    for col in ['timestamp_initiated', 'amount', 'retry_count']:
+        assert fallback[col].tolist() == arrow[col].tolist()
+    assert isinstance(fallback['card_type'].dtype, pd.CategoricalDtype)
@@ -0,0 +1,66 @@
+import ipaddress
+
+import numpy as np
+import pandas as pd
+
+from services.ip_ranges import IntervalIndex, IpRanges, classify_ips, parse_ips
+
+ADDRESSES = ['8.8.8.8', '10.1.2.3', '192.168.0.1', '2001:4860:4860::8888', '::ffff:8.8.8.8', 'fe80::1',
+             '256.1.1.1', '1.2.3', 'not-an-ip', None, '', '192.0.0.9', '203.0.113.7', '::1']
+
+
+def test_parse_matches_the_ipaddress_module():
+    keys, version = parse_ips(ADDRESSES)
+    for value, key, v in zip(ADDRESSES, keys, version):
+        try:
+            address = ipaddress.ip_address(value)
+        except ValueError:
+            assert v == 0 and key == b'', value
+            continue
+        assert v == address.version, value
+        # IPv4-mapped literals share the key of the IPv4 address
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        expected = int(address) | (0xffff << 32 if address.version == 4 else 0)
+        assert int.from_bytes(key.ljust(16, b'\0'), 'big') == expected, value
+
+
+def test_private_flag_and_parse_errors():
+    ips = classify_ips(pd.Series(ADDRESSES), ranges=IpRanges())
+    flags = dict(zip(ADDRESSES, ips['ip_is_private']))
+    assert not flags['8.8.8.8'] and not flags['2001:4860:4860::8888']
+    assert flags['10.1.2.3'] and flags['192.168.0.1'] and flags['fe80::1'] and flags['::1']
+    assert flags['203.0.113.7']
+    # An exception nested in 192.0.0.0/24 wins over the reserved block
+    assert not flags['192.0.0.9']
+    assert ips['ip_parse_error'].tolist() == [v is None or not _valid(v) for v in ADDRESSES]
+
+
+def _valid(value):
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+def test_most_specific_nested_range_wins():
+    index = IntervalIndex.from_networks(['10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24'], ['outer', 'middle', 'inner'])
+    keys, _ = parse_ips(['10.0.0.1', '10.1.0.1', '10.1.2.1', '10.1.3.1', '10.2.0.0', '11.0.0.0'])
+    assert index.lookup(keys, 'none').tolist() == ['outer', 'middle', 'inner', 'middle', 'outer', 'none']
+    # Flattened into disjoint ranges: the /8 is split around the /16, the /16 around the /24
+    assert len(index) == 5
+    assert (index.starts[1:] > index.ends[:-1]).all()
+
+
+def test_enrichment_table_attributes():
+    table = pd.DataFrame({'network': ['8.8.8.0/24', '2001:4860::/32', '52.0.0.0/8'],
+                          'country': ['US', 'US', ''], 'asn': ['15169', '15169', '16509'],
+                          'datacenter': ['', '', 'aws']})
+    ips = classify_ips(pd.Series(['8.8.8.8', '2001:4860:4860::8888', '52.1.2.3', '1.1.1.1', 'bad'],
+                                 index=[10, 11, 12, 13, 14]), ranges=IpRanges(table))
+    assert ips.index.tolist() == [10, 11, 12, 13, 14]
+    assert ips['ip_country'].tolist() == ['US', 'US', '', '', '']
+    assert ips['ip_asn'].tolist() == [15169, 15169, 16509, 0, 0]
+    assert ips['ip_datacenter'].tolist() == ['', '', 'aws', '', '']
+    assert ips['ip_asn'].dtype == np.int64
@@ -0,0 +1,19 @@
+import pandas as pd
+
+from backends.llm_stub import RULE_TYPES
+from benchmarks.parallel_scoring_bench import make_frame
+from services.OpenAIAdvisor import analyze_transaction
+from services.features import build_features, rule_masks
+
+
+def test_duplicate_rows_are_reported_as_duplicate_transactions():
+    row = pd.Series({"transaction_id": "t-1", "amount": 120.5, "rule_anomalies": ["DUPLICATE_TRANSACTION"],
+                     "is_anomaly_suspected_supervised": False, "is_anomaly_suspected_UnSupervised": False})
+    anomaly, anomaly_type = analyze_transaction(row)[[0, 1]]
+    assert anomaly
+    assert anomaly_type == "Duplicate Transactions"
+
+
+def test_stub_rule_names_are_rules_the_pipeline_emits():
+    emitted = set(rule_masks(build_features(make_frame(5))).columns) | {"DUPLICATE_TRANSACTION"}
+    assert set(RULE_TYPES) <= emitted
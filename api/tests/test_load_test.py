@@ -0,0 +1,64 @@
+import io
+import json
+import os
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from benchmarks.load_test import BUCKET, _error_cause, burst, seed_backends
+from benchmarks.parallel_scoring_bench import ID_COLUMNS
+
+
+def test_every_seeded_input_has_its_own_transactions(tmp_path):
+    input_keys, metric_ids = seed_backends(str(tmp_path), input_rows=50, n_inputs=3, download_mb=1, n_metrics=4)
+    frames = [pd.read_csv(tmp_path / "s3" / BUCKET / key) for key in input_keys]
+    assert len(metric_ids) == 4
+    for col in ID_COLUMNS:
+        # No id is shared between files
+        values = [set(frame[col]) for frame in frames]
+        assert len(set.union(*values)) == sum(map(len, values)), col
+    assert os.path.getsize(tmp_path / "s3" / BUCKET / "output" / "large.csv") == 1024 * 1024
+
+
+def _http_error(code, body):
+    return urllib.error.HTTPError("http://test", code, "error", {}, io.BytesIO(body))
+
+
+def test_error_cause_names_the_status_and_message():
+    assert _error_cause(_http_error(500, b'{"status": "error", "message": "boom"}')) == "HTTP 500: boom"
+    assert _error_cause(_http_error(503, b'{"detail": "busy"}')) == "HTTP 503: busy"
+    assert _error_cause(_http_error(502, b'<html>bad gateway</html>')) == "HTTP 502"
+    assert _error_cause(urllib.error.URLError(ConnectionRefusedError("refused"))) == "URLError: refused"
+    assert _error_cause(TimeoutError("timed out")) == "TimeoutError: timed out"
+
+
+@pytest.fixture
+def base_url():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, body = (200, {"ok": True}) if self.path == "/ok" else (500, {"message": f"no {self.path}"})
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_burst_groups_failures_by_cause(base_url):
+    requests = [("GET", "/ok", None)] * 3 + [("GET", "/a", None)] * 2 + [("GET", "/b", None)]
+    latencies, errors, _ = burst(base_url, requests, timeout=10)
+    assert len(latencies) == 3
+    assert errors == {"HTTP 500: no /a": 2, "HTTP 500: no /b": 1}
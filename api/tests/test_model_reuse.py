@@ -0,0 +1,36 @@
+from benchmarks.parallel_scoring_bench import make_frame
+from services.anomaly_models import save_models, schema_mismatch
+from services.features import FEATURES_SUP
+from services.parallel_scoring import featurize_and_score
+
+
+def _scored_twice(tamper):
+    """ Fit on one file, tamper with the saved artifact, then score a second, undrifted file """
+    _, models, _ = featurize_and_score(make_frame(400), digest=None)
+    save_models(tamper(models))
+    _, models, report = featurize_and_score(make_frame(400), digest=None)
+    return report, models
+
+
+def test_models_with_another_feature_version_are_refitted():
+    report, models = _scored_twice(lambda models: {**models, "feature_version": -1})
+    assert report["retrained"]
+    assert "feature version -1" in report["retrain_reason"]
+    assert schema_mismatch(models) is None
+
+
+def test_artifacts_without_a_stored_feature_set_fall_back_to_scaler_names():
+    def legacy(models):
+        models = {k: v for k, v in models.items() if not k.startswith("feature")}
+        models["sup_scaler"].feature_names_in_ = models["sup_scaler"].feature_names_in_[:-1]
+        return models
+
+    def tamper(models):
+        models = {**legacy(models), "feature_version": models["feature_version"]}
+        assert schema_mismatch(models) is not None
+        return models
+
+    report, models = _scored_twice(tamper)
+    assert report["retrained"]
+    assert "features_sup" in report["retrain_reason"]
+    assert models["features_sup"] == FEATURES_SUP
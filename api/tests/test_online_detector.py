@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from services.online_detector import HalfSpaceTrees, apply_online_detector
+from utils.state_utils import load_state
+
+
+def _transactions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'amount': rng.normal(50, 5, n).clip(0), 'duration_sec': rng.normal(30, 3, n).clip(0),
+        'hour': rng.integers(9, 18, n), 'day_of_week': rng.integers(0, 5, n),
+        'months_to_expiry': rng.integers(12, 36, n), 'geo_distance_km': rng.normal(5, 1, n).clip(0),
+    })
+
+
+def test_outliers_score_below_typical_points():
+    model = HalfSpaceTrees(window_size=500)
+    model.score_and_update(_transactions(1000))
+    outliers = _transactions(5, seed=1).assign(amount=9500.0, geo_distance_km=15000.0)
+    scores = model.score_and_update(pd.concat([_transactions(200, seed=2), outliers], ignore_index=True))
+    assert scores[-5:].max() < scores[:-5].min()
+    assert (model.is_anomaly(scores)[-5:] == -1).all()
+
+
+def test_windows_swap_once_full():
+    model = HalfSpaceTrees(window_size=300)
+    model.score_and_update(_transactions(250))
+    assert model.ref_total == 0 and model.threshold is None
+
+    # A batch crossing the window boundary closes the first window and starts filling the next one
+    model.score_and_update(_transactions(100, seed=1))
+    assert model.ref_total == 300
+    assert model.window_count == 50
+    assert model.latest_mass[:, 0].tolist() == [50] * model.n_trees
+    assert model.threshold is not None
+    assert model.n_seen == 350
+
+
+def test_state_size_does_not_grow_with_rows_seen():
+    model = HalfSpaceTrees(window_size=200)
+    shape = model.ref_mass.shape
+    for seed in range(5):
+        model.score_and_update(_transactions(170, seed=seed))
+    assert model.ref_mass.shape == model.latest_mass.shape == shape
+    assert len(model.window_scores) <= 2
+
+
+def test_persisted_model_keeps_learning_across_files(tmp_path):
+    path = str(tmp_path / "online_model.joblib")
+    first = apply_online_detector(_transactions(300), path)
+    second = apply_online_detector(_transactions(300, seed=1), path)
+    for scored in (first, second):
+        assert scored['online_score'].between(1, 100).all()
+        assert set(scored['online_anomaly']) <= {-1, 1}
+    # The second file was folded into the model the first one left behind
+    assert load_state(path, HalfSpaceTrees).n_seen == 600
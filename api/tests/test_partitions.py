@@ -0,0 +1,91 @@
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from botocore.exceptions import ClientError
+
+from backends.local_s3 import LocalObjectStore
+from services import partitions
+from services.partitions import read_manifest, record_object
+
+BUCKET = "test-bucket"
+PARTITION = "dt=2025-06-01/hour=13"
+
+
+def _key(name):
+    return f"output/{PARTITION}/{name}"
+
+
+def test_manifest_lists_every_object_with_per_kind_totals(tmp_path):
+    s3 = LocalObjectStore(str(tmp_path))
+    record_object(s3, BUCKET, _key("a.csv"), "scored", rows=10, anomalies={"Other": 2}, size=100)
+    record_object(s3, BUCKET, _key("b.csv"), "scored", rows=5, anomalies={"Other": 1, "None": 4}, size=50)
+    record_object(s3, BUCKET, _key("c.csv"), "advisory", rows=3, size=30, columns=["transaction_id"])
+    # Re-recording an object replaces its entry
+    record_object(s3, BUCKET, _key("a.csv"), "scored", rows=12, anomalies={"Other": 3}, size=120)
+
+    manifest = read_manifest(s3, BUCKET, "output", PARTITION)
+    assert sorted(manifest["files"]) == ["a.csv", "b.csv", "c.csv"]
+    assert manifest["totals"]["scored"] == {"files": 2, "rows": 17, "bytes": 170,
+                                            "anomalies": {"Other": 4, "None": 4}}
+    assert manifest["totals"]["advisory"]["files"] == 1
+    assert "schema" in manifest["files"]["c.csv"]
+
+
+def test_record_object_rejects_unpartitioned_keys(tmp_path):
+    with pytest.raises(ValueError):
+        record_object(LocalObjectStore(str(tmp_path)), BUCKET, "output/flat.csv", "scored")
+
+
+def test_local_store_honours_conditional_puts(tmp_path):
+    s3 = LocalObjectStore(str(tmp_path))
+    etag = s3.put_object(Bucket=BUCKET, Key="k", Body=b"v1", IfNoneMatch="*")["ETag"]
+    with pytest.raises(ClientError, match="PreconditionFailed"):
+        s3.put_object(Bucket=BUCKET, Key="k", Body=b"v2", IfNoneMatch="*")
+    s3.put_object(Bucket=BUCKET, Key="k", Body=b"v2", IfMatch=etag)
+    with pytest.raises(ClientError, match="PreconditionFailed"):
+        s3.put_object(Bucket=BUCKET, Key="k", Body=b"v3", IfMatch=etag)
+    assert s3.get_object(Bucket=BUCKET, Key="k")["Body"].read() == b"v2"
+
+
+class _RacingStore(LocalObjectStore):
+    """ Another host writes the manifest between this writer's read and its first PUT """
+
+    def __init__(self, root, foreign_key):
+        super().__init__(root)
+        self.foreign_key = foreign_key
+        self.raced = False
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        if Key.endswith(partitions.MANIFEST_NAME) and not self.raced:
+            self.raced = True
+            record_object(LocalObjectStore(self.root), Bucket, self.foreign_key, "scored", rows=1)
+        return super().put_object(Bucket, Key, Body, **kwargs)
+
+
+def test_update_lost_to_another_host_is_retried(tmp_path, monkeypatch):
+    # Writers on other hosts do not share the local lock
+    monkeypatch.setattr(partitions, "locked_state", lambda path: contextlib.nullcontext())
+    s3 = LocalObjectStore(str(tmp_path))
+    record_object(s3, BUCKET, _key("first.csv"), "scored", rows=1)
+
+    racing = _RacingStore(str(tmp_path), _key("foreign.csv"))
+    record_object(racing, BUCKET, _key("mine.csv"), "scored", rows=1)
+    assert racing.raced
+    assert sorted(read_manifest(s3, BUCKET, "output", PARTITION)["files"]) == ["first.csv", "foreign.csv", "mine.csv"]
+
+
+def test_concurrent_writers_without_a_shared_lock_keep_every_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(partitions, "locked_state", lambda path: contextlib.nullcontext())
+    monkeypatch.setattr(partitions, "MANIFEST_MAX_ATTEMPTS", 50)
+    names = [f"f{i}.csv" for i in range(16)]
+
+    def write(name):
+        # One client per writer, as separate hosts would have
+        record_object(LocalObjectStore(str(tmp_path)), BUCKET, _key(name), "scored", rows=1)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, names))
+    manifest = read_manifest(LocalObjectStore(str(tmp_path)), BUCKET, "output", PARTITION)
+    assert sorted(manifest["files"]) == sorted(names)
+    assert manifest["totals"]["scored"]["files"] == len(names)
@@ -0,0 +1,73 @@
+import json
+import threading
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from benchmarks.parallel_scoring_bench import make_frame
+from services import realtime_scoring
+from services.anomaly_models import save_models
+from services.feature_store import BEHAVIOR_COLUMNS
+from services.parallel_scoring import featurize_and_score
+from services.realtime_scoring import MicroBatcher, RealtimeScorer
+
+
+def _records(df):
+    """ Rows as the JSON API receives them """
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def test_concurrent_submissions_are_scored_as_one_batch():
+    calls, release = [], threading.Event()
+
+    def score(df):
+        release.wait(5)
+        calls.append(len(df))
+        return df.assign(doubled=df['value'] * 2)
+
+    batcher = MicroBatcher(score, max_wait_ms=200, max_batch_size=100)
+    futures = [batcher.enqueue([{"value": i}, {"value": 10 + i}]) for i in range(3)]
+    release.set()
+    results = [future.result(timeout=5) for future in futures]
+    assert calls == [6]
+    for i, result in enumerate(results):
+        assert result['doubled'].tolist() == [2 * i, 2 * (10 + i)]
+
+
+def test_a_failing_batch_only_fails_the_bad_request():
+    calls = []
+
+    def score(df):
+        calls.append(len(df))
+        if (df['value'] < 0).any():
+            raise ValueError("negative value")
+        return df
+
+    batcher = MicroBatcher(score, max_wait_ms=200, max_batch_size=100)
+    good, bad, other = (batcher.enqueue([{"value": v}]) for v in (1, -1, 2))
+    assert good.result(timeout=5)['value'].tolist() == [1]
+    assert other.result(timeout=5)['value'].tolist() == [2]
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    assert calls == [3, 1, 1, 1]
+
+
+def test_failed_batch_leaves_the_velocity_windows_unchanged(monkeypatch):
+    _, models, _ = featurize_and_score(make_frame(300))
+    save_models(models)
+    batch = make_frame(4)
+    batch['account_id'] = "realtime-account"
+
+    reference = RealtimeScorer().score(pd.DataFrame(_records(batch)))
+
+    scorer = RealtimeScorer()
+    score_features = realtime_scoring.score_features
+    monkeypatch.setattr(realtime_scoring, "score_features", lambda *args: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        scorer.score(pd.DataFrame(_records(batch)))
+    monkeypatch.setattr(realtime_scoring, "score_features", score_features)
+    retried = scorer.score(pd.DataFrame(_records(batch)))
+
+    assert (retried['account_count_24h'] <= len(batch)).all()
+    assert_frame_equal(retried[BEHAVIOR_COLUMNS], reference[BEHAVIOR_COLUMNS])
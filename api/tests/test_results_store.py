@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.results_store import load_index, parse_query, query_results, write_results
+
+FILE_NAME = "transactions_with_anomalies_2026-01-01T10-00-00.csv"
+
+
+@pytest.fixture
+def uri(tmp_path):
+    n = 100
+    df = pd.DataFrame({
+        'transaction_id': [f"t{i}" for i in range(n)],
+        'card_type': np.where(np.arange(n) % 2, 'VISA', 'AMEX'),
+        'amount': np.arange(n, dtype=float) * 10,
+        # Descending scores, so storage order (ascending iso_score) reverses the rows
+        'iso_score': np.linspace(100, 1, n),
+        'rule_anomalies': [['HIGH_AMOUNT'] if i >= 90 else [] for i in range(n)],
+        'has_duplicate': np.arange(n) == 5,
+    })
+    root = str(tmp_path / "results")
+    write_results(df, FILE_NAME, uri=root, row_group_rows=10)
+    return root
+
+
+def _query(uri, **args):
+    return query_results(FILE_NAME, parse_query(args), uri=uri)
+
+
+def test_results_are_stored_in_the_partition_of_the_report(uri, tmp_path):
+    assert (tmp_path / "results" / "dt=2026-01-01" / "hour=10" / f"{FILE_NAME[:-4]}.parquet").exists()
+    index = load_index(FILE_NAME, uri=uri)
+    assert index["rows"] == 100 and len(index["row_groups"]) == 10
+    assert 'rule_HIGH_AMOUNT' in index["columns"]
+
+
+def test_score_filter_only_reads_matching_row_groups(uri):
+    result = _query(uri, iso_score_gt="90", columns="transaction_id,iso_score", limit="100")
+    assert result["rows"] == 10
+    assert all(r["iso_score"] > 90 for r in result["results"])
+    # Rows are sorted by iso_score, so only the last row group holds scores above 90
+    assert result["row_groups_scanned"] == 1
+
+
+def test_rule_category_and_flag_filters(uri):
+    rows = _query(uri, rule="HIGH_AMOUNT", card_type="VISA", columns="transaction_id")["results"]
+    assert sorted(r["transaction_id"] for r in rows) == ["t91", "t93", "t95", "t97", "t99"]
+    rows = _query(uri, has_duplicate="true", columns="transaction_id")["results"]
+    assert rows == [{"transaction_id": "t5"}]
+    assert _query(uri, rule="NEVER_FIRED")["rows"] == 0
+
+
+def test_sort_and_limit(uri):
+    result = _query(uri, sort="-amount", limit="3", columns="transaction_id,amount")
+    assert [r["transaction_id"] for r in result["results"]] == ["t99", "t98", "t97"]
+    # Top scores are in the last row group, read first when sorting on the storage column descending
+    result = _query(uri, sort="-iso_score", limit="5", columns="transaction_id")
+    assert [r["transaction_id"] for r in result["results"]] == ["t0", "t1", "t2", "t3", "t4"]
+    assert result["row_groups_scanned"] == 1
+
+
+@pytest.mark.parametrize("args", [{"limit": "0"}, {"amount_between": "1"}, {"merchant_name": "x"}])
+def test_unsupported_queries_are_rejected(args):
+    with pytest.raises(ValueError):
+        parse_query(args)
+
+
+def test_unknown_columns_and_files(uri):
+    with pytest.raises(ValueError):
+        _query(uri, columns="transaction_id,nope")
+    with pytest.raises(FileNotFoundError):
+        query_results("missing_2026-01-01T10-00-00.csv", parse_query({}), uri=uri)
@@ -0,0 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+
+from services.anomaly_models import save_models
+
+
+def test_concurrent_model_saves_do_not_collide(tmp_path):
+    path = str(tmp_path / "models" / "latest.joblib")
+
+    def save(i):
+        for _ in range(10):
+            save_models({"worker": i, "weights": np.full(20_000, i)}, path)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(save, range(8)))
+
+    saved = joblib.load(path)
+    assert (saved["weights"] == saved["worker"]).all()
+    assert not list((tmp_path / "models").glob("*.tmp"))
@@ -0,0 +1,25 @@
+import warnings
+
+import numpy as np
+
+from services.training import fit_forest_within_budget, stratified_reservoir_sample
+
+
+def test_warm_start_fit_uses_balanced_weights_without_warnings():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 3))
+    y = np.r_[np.ones(40, dtype=bool), np.zeros(360, dtype=bool)]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        model = fit_forest_within_budget(X, y, n_estimators=50, step=10, random_state=0)
+    assert model.n_estimators == 50
+    # n / (classes * count): the minority class weighs 9x the majority
+    assert model.class_weight == {False: 400 / (2 * 360), True: 400 / (2 * 40)}
+
+
+def test_sample_keeps_the_minority_class_whole():
+    labels = np.r_[np.ones(30, dtype=bool), np.zeros(970, dtype=bool)]
+    rows = stratified_reservoir_sample(labels, 100)
+    assert len(rows) == 100
+    assert labels[rows].sum() == 30
+    assert (np.diff(rows) > 0).all()
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from services.validation import REQUIRED_COLUMNS, reason_counts, validate_transactions
+
+GOOD = {
+    'transaction_id': 't0', 'account_id': 'a', 'customer_id': 'c', 'merchant_name': 'm', 'device_id': 'd',
+    'card_type': 'VISA', 'card_expire_date': '05/2028', 'transaction_type': 'ONLINE',
+    'transaction_status': 'SUCCESS', 'amount': '12.5', 'currency': 'INR',
+    'timestamp_initiated': '2026-01-01T10:00:00', 'timestamp_completed': '2026-01-01T10:00:30',
+    'retry_count': '1', 'ip_address': '8.8.8.8', 'geo_location': '12.97,77.59',
+}
+
+
+def _frame(*overrides):
+    return pd.DataFrame([dict(GOOD, transaction_id=f"t{i}", **o) for i, o in enumerate(overrides)])
+
+
+def test_bad_rows_are_quarantined_with_their_reasons():
+    valid, quarantine = validate_transactions(_frame(
+        {}, {'amount': 'abc'}, {'account_id': ' '}, {'timestamp_initiated': 'yesterday', 'retry_count': '-1'},
+        {'geo_location': '95.0,10.0'}, {'card_expire_date': '2028-05'}, {},
+    ))
+    assert valid['transaction_id'].tolist() == ['t0', 't6']
+    assert quarantine['row_number'].tolist() == [1, 2, 3, 4, 5]
+    assert quarantine['reject_reasons'].tolist() == [
+        'UNPARSEABLE:amount', 'NULL:account_id', 'OUT_OF_RANGE:retry_count,UNPARSEABLE:timestamp_initiated',
+        'OUT_OF_RANGE:geo_location', 'UNPARSEABLE:card_expire_date',
+    ]
+    # Quarantined rows keep the values as read
+    assert quarantine['amount'][0] == 'abc'
+
+
+def test_valid_rows_are_coerced_to_their_types():
+    valid, quarantine = validate_transactions(_frame({}, {'amount': '1e3', 'retry_count': '2.0'}))
+    assert quarantine.empty
+    assert valid['amount'].tolist() == [12.5, 1000.0]
+    assert valid['retry_count'].dtype == 'int64' and valid['retry_count'].tolist() == [1, 2]
+    assert valid['timestamp_initiated'].dtype == 'datetime64[ns]'
+
+
+def test_missing_required_column_rejects_the_file():
+    with pytest.raises(ValueError, match="amount"):
+        validate_transactions(_frame({}).drop(columns=['amount']))
+    assert 'amount' in REQUIRED_COLUMNS
+
+
+def test_reason_counts():
+    _, quarantine = validate_transactions(_frame({'amount': 'x'}, {'amount': 'y', 'device_id': None}))
+    assert reason_counts(quarantine) == {'UNPARSEABLE:amount': 2, 'NULL:device_id': 1}
@@ -4,6 +4,7 @@ from io import BytesIO
 from botocore.exceptions import ClientError
 
 from  api.config.aws_config import AWSConfig
+from services.partitions import get_object, upload_partitioned
 
 
 class S3Utils:
@@ -28,6 +29,27 @@ class S3Utils:
             print(f"Error uploading to S3: {e}")
             return None
 
+    def send_file_to_partition(self, file_path, directory_name, kind, **entry):
+        """ send_file_to_s3 into the directory's date/hour partition, recorded in the partition manifest """
+        try:
+            key = upload_partitioned(self.s3, self.bucket, directory_name, file_path, kind, **entry)
+            print(f"Uploaded {file_path} to s3://{self.bucket}/{key}")
+            return os.path.basename(key)
+        except Exception as e:
+            print(f"Error uploading to S3: {e}")
+            return None
+
+    def download_partitioned(self, directory_name, file_name) -> BytesIO:
+        """ download_file_data of an object addressed by its name, in its partition or flat """
+        try:
+            body = get_object(self.s3, self.bucket, directory_name, file_name)["Body"]
+            try:
+                return BytesIO(body.read())
+            finally:
+                body.close()
+        except ClientError as e:
+            raise Exception(f"Failed to download {file_name} from S3: {e}")
+
     def download_file_data(self, file_name: str) -> BytesIO:
         s3_client = AWSConfig.get_s3_client()
         buffer = BytesIO()
@@ -0,0 +1,49 @@
+import fcntl
+import os
+import tempfile
+from contextlib import contextmanager
+
+import joblib
+
+
+@contextmanager
+def locked_state(path):
+    """
+    Hold an exclusive lock on <path>.lock for a load-update-save cycle of a local state file,
+    so concurrent requests (gunicorn workers, background threads) do not lose each other's updates.
+    """
+    ensure_parent_dir(path)
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_state(path, default_factory):
+    if os.path.exists(path):
+        return joblib.load(path)
+    return default_factory()
+
+
+def save_state(obj, path):
+    """
+    Write atomically: readers see either the previous or the new state, never a partial file.
+    Every save writes its own temporary file, so concurrent saves of one path never move each other's away
+    (the last replace wins; hold locked_state when updates must not be lost).
+    """
+    ensure_parent_dir(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.",
+                                    suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(obj, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def ensure_parent_dir(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)